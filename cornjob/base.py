@@ -2,10 +2,45 @@
 AI提供者抽象基类
 定义统一的接口规范，实现调用方和被调用方的解耦
 """
+import asyncio
+import json
 import logging
+import os
+import socket
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 from dataclasses import dataclass
+from pathlib import Path
+
+import requests
+
+# 处理导入路径，支持直接运行和作为模块导入
+try:
+    # 先尝试相对导入（作为模块导入时）
+    from .config import ConfigManager
+    from .http_pool import get_session, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+    from .cache import (
+        ResponseCache, get_response_cache,
+        DEFAULT_CACHE_PATH, DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES
+    )
+    from .retry import RetryPolicy, CircuitBreaker, CircuitOpenError, get_circuit_breaker, parse_retry_after
+    from .ratelimit import get_rate_limiter
+    from .tokens import estimate_tokens
+except (ImportError, ValueError):
+    # 相对导入失败时，使用绝对导入（直接运行时）
+    sys.path.insert(0, str(Path(__file__).parent))
+    from config import ConfigManager
+    from http_pool import get_session, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+    from cache import (
+        ResponseCache, get_response_cache,
+        DEFAULT_CACHE_PATH, DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES
+    )
+    from retry import RetryPolicy, CircuitBreaker, CircuitOpenError, get_circuit_breaker, parse_retry_after
+    from ratelimit import get_rate_limiter
+    from tokens import estimate_tokens
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -19,6 +54,63 @@ class AIResponse:
     error_message: Optional[str] = None  # 错误信息
     usage: Optional[Dict[str, Any]] = None  # 使用量信息（token等）
     model: Optional[str] = None  # 使用的模型
+    from_cache: bool = False  # 是否来自本地响应缓存
+    latency: Optional[float] = None  # 请求耗时（秒）
+    cached_tokens: int = 0  # 命中供应商提示词前缀缓存的输入 token 数
+    finish_reason: Optional[str] = None  # 结束原因（stop / length 等，length 表示被 max_tokens 截断）
+
+
+class StreamHandle:
+    """流式请求的取消句柄
+
+    提供者收到响应头后把响应登记到句柄上，其他线程调用 cancel() 即可关闭底层连接，
+    正阻塞在读取上的线程会立即结束；登记之前取消的请求在收到响应头时立即关闭
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._response: Optional[requests.Response] = None
+        self.cancelled = False
+
+    def attach(self, response: requests.Response) -> bool:
+        """
+        登记正在读取的响应
+
+        Returns:
+            bool: 是否继续读取（已被取消时关闭响应并返回 False）
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._response = response
+                return True
+        self._abort(response)
+        return False
+
+    def cancel(self) -> None:
+        """取消请求：关闭已登记的响应（可在任意线程调用，重复调用无副作用）"""
+        with self._lock:
+            self.cancelled = True
+            response, self._response = self._response, None
+        if response is not None:
+            self._abort(response)
+
+    @staticmethod
+    def _abort(response: requests.Response) -> None:
+        """先 shutdown 套接字唤醒阻塞在 recv 上的读取线程，再关闭响应（连接不放回连接池）"""
+        raw = response.raw
+        sock = getattr(getattr(raw, "_connection", None), "sock", None)
+        if sock is None:
+            # 服务端声明关闭连接时 http.client 已把套接字交给响应体，只能从底层文件对象取得
+            sock = getattr(getattr(getattr(getattr(raw, "_fp", None), "fp", None), "raw", None), "_sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        try:
+            response.close()
+        except Exception as e:
+            logger.debug(f"关闭已取消的流式响应时出错: {str(e)}")
 
 
 class AIProvider(ABC):
@@ -39,6 +131,219 @@ class AIProvider(ABC):
         self.base_url = base_url
         logger.info(f"初始化 {self.__class__.__name__}，base_url: {base_url}")
         self._validate_config()
+        # 连接池与请求头只在初始化时构建一次，所有 chat() 调用复用
+        self._pool_options = ConfigManager.get_provider_section(self.get_provider_name(), "http_pool")
+        self._headers = self._build_headers()
+        self.session = self._get_session()
+        self.response_cache = self._get_response_cache()
+        # 重试策略按实例编译；熔断器按提供者在进程内共享
+        provider_name = self.get_provider_name()
+        self.retry_policy = RetryPolicy.from_options(ConfigManager.get_provider_section(provider_name, "retry"))
+        self.circuit_breaker = get_circuit_breaker(
+            provider_name,
+            ConfigManager.get_provider_section(provider_name, "circuit_breaker")
+        )
+        # 客户端 RPM/TPM 限流器按提供者在进程内共享
+        self.rate_limiter = get_rate_limiter(
+            provider_name,
+            ConfigManager.get_provider_section(provider_name, "rate_limit")
+        )
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """构建请求头（初始化时调用一次）"""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        if not self._pool_options.get("keep_alive", True):
+            headers["Connection"] = "close"
+        return headers
+    
+    def _get_session(self) -> requests.Session:
+        """获取当前提供者的共享连接池 Session（进程内跨调用、跨 DataFetcher 复用）"""
+        options = self._pool_options
+        return get_session(
+            self.get_provider_name(),
+            pool_connections=int(options.get("pool_connections", DEFAULT_POOL_CONNECTIONS)),
+            pool_maxsize=int(options.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)),
+            pool_block=bool(options.get("pool_block", False))
+        )
+    
+    def count_tokens(self, text: str) -> int:
+        """估算文本的 token 数（可按模型使用更精确的分词器）"""
+        return estimate_tokens(text)
+    
+    def get_prompt_budget(self) -> Optional[int]:
+        """提示词可用的 token 预算（None 表示未声明上下文窗口）"""
+        return None
+    
+    def _estimate_request_tokens(self, payload: Dict[str, Any]) -> int:
+        """估算一次请求的 token 消耗：提示词长度 + max_tokens"""
+        prompt_tokens = sum(self.count_tokens(str(m.get("content", ""))) for m in payload.get("messages", []))
+        return prompt_tokens + int(payload.get("max_tokens") or 0)
+    
+    def _post_with_retry(
+        self,
+        payload: Dict[str, Any],
+        timeout: Any,
+        stream: bool = False,
+        estimated_tokens: int = 0,
+        deadline: Optional[float] = None
+    ) -> requests.Response:
+        """
+        通过共享连接池向 base_url 发送 JSON POST 请求（见 _request_with_retry）
+        
+        Args:
+            payload: 请求体
+            timeout: 请求超时（秒或 (连接, 读取) 元组）
+            stream: 是否以流式读取响应
+            estimated_tokens: 本次请求预计消耗的 token 数（用于 TPM 限流）
+            deadline: 截止时间（time.monotonic() 时刻），含重试在内不超过该时刻
+        
+        Returns:
+            requests.Response: 成功（2xx）的响应
+        """
+        return self._request_with_retry(
+            "POST",
+            self.base_url,
+            timeout,
+            stream=stream,
+            estimated_tokens=estimated_tokens,
+            deadline=deadline,
+            headers=self._headers,
+            json=payload
+        )
+    
+    def _request_with_retry(
+        self,
+        method: str,
+        url: str,
+        timeout: Any,
+        stream: bool = False,
+        estimated_tokens: int = 0,
+        rate_limited: bool = True,
+        deadline: Optional[float] = None,
+        **request_kwargs
+    ) -> requests.Response:
+        """
+        通过共享连接池发送请求
+        
+        每次发送前先检查熔断器与截止时间，再经过客户端限流（首次请求预扣 estimated_tokens，重试只占用请求配额，
+        等待不超过截止时间前的剩余时间）；
+        连接错误与可重试状态码（429/5xx 等）按重试策略退避重试，429/503 优先采纳 Retry-After；
+        每次结果都会更新熔断器状态，熔断打开时直接拒绝
+        
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            timeout: 请求超时（秒或 (连接, 读取) 元组）
+            stream: 是否以流式读取响应
+            estimated_tokens: 本次请求预计消耗的 token 数（用于 TPM 限流）
+            rate_limited: 是否经过客户端限流（批处理的上传/轮询等管理请求不占用对话配额）
+            deadline: 截止时间（time.monotonic() 时刻）：每次尝试的超时收缩到剩余时间，
+                剩余时间不足以等待下一次重试时直接放弃
+            **request_kwargs: 传给 Session.request 的其他参数（headers / json / files 等）
+        
+        Returns:
+            requests.Response: 成功（2xx）的响应
+        
+        Raises:
+            CircuitOpenError: 熔断器处于打开状态
+            requests.exceptions.Timeout: 已超过截止时间，或截止时间前拿不到限流配额
+            requests.exceptions.RequestException: 重试耗尽或不可重试的错误
+        """
+        policy = self.retry_policy
+        name = self.__class__.__name__
+        attempt = 0
+        while True:
+            # 熔断与截止时间先于限流检查：注定不会发出的请求不占用 RPM/TPM 配额
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError(f"{self.get_provider_name()} 熔断中，跳过请求")
+            left = None if deadline is None else deadline - time.monotonic()
+            if left is not None and left <= 0:
+                self.circuit_breaker.release()
+                raise requests.exceptions.Timeout(f"{self.get_provider_name()} 已超过请求截止时间")
+            if rate_limited:
+                if self.rate_limiter.acquire(estimated_tokens if attempt == 0 else 0, timeout=left) is None:
+                    self.circuit_breaker.release()
+                    raise requests.exceptions.Timeout(f"{self.get_provider_name()} 截止时间前拿不到限流配额")
+                if deadline is not None:
+                    left = deadline - time.monotonic()
+            attempt_timeout = timeout if left is None else self._shrink_timeout(timeout, max(left, 0.001))
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    timeout=attempt_timeout,
+                    stream=stream,
+                    **request_kwargs
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.circuit_breaker.record_failure()
+                retryable = policy.retry_on_timeout or not isinstance(e, requests.exceptions.ReadTimeout)
+                if not retryable or attempt >= policy.max_retries:
+                    raise
+                delay = policy.compute_delay(attempt)
+                logger.warning(f"{name} 请求异常: {str(e)}，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+            else:
+                if response.status_code not in policy.retry_statuses:
+                    # 非可重试的 4xx 属于请求问题，不计入服务故障
+                    self.circuit_breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                self.circuit_breaker.record_failure()
+                if attempt >= policy.max_retries:
+                    response.raise_for_status()
+                retry_after = None
+                if response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                delay = policy.compute_delay(attempt, retry_after)
+                response.close()
+                logger.warning(
+                    f"{name} 响应状态码 {response.status_code}，{delay:.1f} 秒后第 {attempt + 1} 次重试"
+                )
+            if self.circuit_breaker.state == CircuitBreaker.OPEN:
+                raise CircuitOpenError(f"{self.get_provider_name()} 连续失败已熔断，停止重试")
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise requests.exceptions.Timeout(f"{self.get_provider_name()} 剩余时间不足以重试，停止重试")
+            time.sleep(delay)
+            attempt += 1
+    
+    @staticmethod
+    def _shrink_timeout(timeout: Any, limit: float) -> Any:
+        """把请求超时（秒或 (连接, 读取) 元组）收缩到不超过 limit 秒"""
+        if isinstance(timeout, tuple):
+            return tuple(min(float(t), limit) for t in timeout)
+        return limit if timeout is None else min(float(timeout), limit)
+    
+    def _get_response_cache(self) -> Optional[ResponseCache]:
+        """
+        按配置获取响应缓存（未启用时返回None）
+        
+        环境变量 RESPONSE_CACHE 可覆盖 config.yaml：
+        true/false 对所有提供者生效，或填写逗号分隔的提供者名称列表只对这些提供者启用
+        """
+        provider_name = self.get_provider_name()
+        options = ConfigManager.get_provider_section(provider_name, "response_cache")
+        enabled = bool(options.get("enabled", False))
+        env_value = os.getenv("RESPONSE_CACHE", "").strip().lower()
+        if env_value in {"1", "true", "yes", "y", "on"}:
+            enabled = True
+        elif env_value in {"0", "false", "no", "n", "off"}:
+            enabled = False
+        elif env_value:
+            enabled = provider_name in {p.strip() for p in env_value.split(",")}
+        if not enabled:
+            return None
+        path = Path(options.get("path", DEFAULT_CACHE_PATH))
+        if not path.is_absolute():
+            path = Path(__file__).parent / path
+        return get_response_cache(
+            path,
+            ttl_seconds=options.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+            max_entries=options.get("max_entries", DEFAULT_MAX_ENTRIES),
+            max_bytes=options.get("max_bytes", DEFAULT_MAX_BYTES)
+        )
     
     @abstractmethod
     def _validate_config(self) -> None:
@@ -59,6 +364,92 @@ class AIProvider(ABC):
         """
         pass
     
+    def chat_stream(self, prompt: str, handle: Optional[StreamHandle] = None, **kwargs) -> Iterator[str]:
+        """
+        以流式方式发送聊天请求，逐段产出内容
+        
+        默认实现退化为一次性调用 chat()；支持 SSE 的提供者应覆盖此方法。
+        请求失败时抛出异常（而不是静默结束），调用方据此把这次请求计为错误
+        
+        Args:
+            prompt: 提示词
+            handle: 取消句柄（默认实现无法中断进行中的 chat()，只在返回后检查是否已取消）
+            **kwargs: 其他参数（同 chat）
+        
+        Yields:
+            str: 增量返回的内容片段
+        
+        Raises:
+            RuntimeError: 请求失败
+        """
+        response = self.chat(prompt, **kwargs)
+        if handle is not None and handle.cancelled:
+            return
+        if not response.success:
+            raise RuntimeError(response.error_message or f"{self.get_provider_name()} 请求失败")
+        if response.content:
+            yield response.content
+    
+    def chat_batch(self, prompts: List[str], **kwargs) -> List[AIResponse]:
+        """
+        批量发送聊天请求，按输入顺序返回响应
+        
+        默认实现逐个调用 chat()；支持离线批处理接口的提供者应覆盖此方法
+        
+        Args:
+            prompts: 提示词列表
+            **kwargs: 其他参数（同 chat）
+        
+        Returns:
+            List[AIResponse]: 与 prompts 一一对应的响应列表
+        """
+        return [self.chat(prompt, **kwargs) for prompt in prompts]
+    
+    def _iter_sse_content(self, response: requests.Response) -> Iterator[str]:
+        """
+        解析 OpenAI 兼容的 SSE 响应流，逐段产出 choices[0].delta.content
+        
+        Args:
+            response: 以 stream=True 发出的请求响应
+        
+        Yields:
+            str: 增量返回的内容片段
+        """
+        # text/event-stream 通常不带 charset，显式按 UTF-8 解码
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except json.JSONDecodeError:
+                logger.debug(f"跳过无法解析的SSE事件: {data[:200]}")
+                continue
+            choices = event.get("choices") or []
+            if choices:
+                piece = (choices[0].get("delta") or {}).get("content")
+                if piece:
+                    yield piece
+    
+    async def achat(self, prompt: str, **kwargs) -> AIResponse:
+        """
+        异步发送聊天请求
+        
+        默认在线程池中执行整个 chat()，供没有自己异步实现的提供者使用；
+        OpenAICompatibleProvider 覆盖此方法，只把阻塞的 HTTP 请求放到线程池中
+        
+        Args:
+            prompt: 提示词
+            **kwargs: 其他参数（同 chat）
+        
+        Returns:
+            AIResponse: 响应对象
+        """
+        return await asyncio.to_thread(self.chat, prompt, **kwargs)
+    
     @abstractmethod
     def get_provider_name(self) -> str:
         """获取提供者名称"""
@@ -78,11 +469,35 @@ class AIProvider(ABC):
             error_message=error_message
         )
     
+    @staticmethod
+    def _extract_cached_tokens(usage: Optional[Dict[str, Any]]) -> int:
+        """
+        从 usage 中读取供应商的前缀缓存命中 token 数
+        
+        兼容 DeepSeek 的 prompt_cache_hit_tokens、OpenAI 风格的 prompt_tokens_details.cached_tokens
+        以及 Kimi 的 cached_tokens 字段
+        """
+        if not isinstance(usage, dict):
+            return 0
+        details = usage.get("prompt_tokens_details")
+        for value in (
+            usage.get("prompt_cache_hit_tokens"),
+            details.get("cached_tokens") if isinstance(details, dict) else None,
+            usage.get("cached_tokens"),
+        ):
+            if value:
+                try:
+                    return int(value)
+                except (TypeError, ValueError):
+                    continue
+        return 0
+    
     def _create_success_response(
         self, 
         content: str, 
         usage: Optional[Dict[str, Any]] = None,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        finish_reason: Optional[str] = None
     ) -> AIResponse:
         """创建成功响应"""
         logger.info(
@@ -96,5 +511,7 @@ class AIProvider(ABC):
             content=content,
             success=True,
             usage=usage,
-            model=model or self.get_default_model()
+            model=model or self.get_default_model(),
+            cached_tokens=self._extract_cached_tokens(usage),
+            finish_reason=finish_reason
         )
@@ -0,0 +1,65 @@
+"""
+离线批处理模块
+构建 OpenAI 兼容 /v1/batches 接口的 JSONL 请求文件，并解析批处理输出文件
+"""
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 批处理任务的终止状态
+BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# 单个请求的 custom_id 前缀（按序号匹配输出）
+CUSTOM_ID_PREFIX = "request-"
+
+
+class BatchError(RuntimeError):
+    """批处理任务失败、过期或等待超时"""
+
+
+def build_batch_jsonl(payloads: List[Dict[str, Any]], endpoint: str) -> bytes:
+    """
+    构建批处理输入文件
+
+    Args:
+        payloads: 对话请求体列表
+        endpoint: 批处理中每个请求调用的接口路径（如 /v1/chat/completions）
+
+    Returns:
+        bytes: UTF-8 编码的 JSONL 内容，每行一个请求，custom_id 为 request-<序号>
+    """
+    lines = [
+        json.dumps(
+            {"custom_id": f"{CUSTOM_ID_PREFIX}{i}", "method": "POST", "url": endpoint, "body": payload},
+            ensure_ascii=False
+        )
+        for i, payload in enumerate(payloads)
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def parse_batch_output(text: str) -> Dict[int, Dict[str, Any]]:
+    """
+    解析批处理输出（或错误）文件
+
+    Args:
+        text: JSONL 文本
+
+    Returns:
+        Dict[int, Dict[str, Any]]: 请求序号 -> 输出行（含 response / error）；无法识别的行会被跳过
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            index = int(str(item.get("custom_id", "")).replace(CUSTOM_ID_PREFIX, "", 1))
+        except (ValueError, TypeError, AttributeError):
+            logger.warning(f"无法解析的批处理输出行: {line[:200]}")
+            continue
+        results[index] = item
+    return results
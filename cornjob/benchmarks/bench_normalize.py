@@ -0,0 +1,128 @@
+"""
+规范化微基准
+在合成的工具目录（默认 10 万条）上对比两种做法：
+- 旧做法：每个调用点（提示词去重、排除集合、upsert、合并重复记录、favicon 地址、图标文件名）各自重新计算名称键与规范化 URL
+- 新做法：key_records 每条记录只算一次并随记录传递，其余零散调用命中 LRU 缓存
+
+用法：python cornjob/benchmarks/bench_normalize.py [--size 100000] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from normalize import canonical_url, clear_cache, key_records, name_key  # noqa: E402
+
+
+def legacy_name_key(name: str) -> str:
+    """旧版 _normalize_name_key（每次调用都重新编译查找正则）"""
+    if not isinstance(name, str):
+        return ""
+    value = name.strip().lower()
+    if not value:
+        return ""
+    return re.sub(r"[\s\-_·•\.\,，/\\\(\)\[\]\{\}<>:：;；'\"“”‘’`~!@#$%^&*+=?|]+", "", value)
+
+
+def legacy_canonical_url(url: str) -> str:
+    """旧版 _canonicalize_url"""
+    if not isinstance(url, str):
+        return ""
+    raw = url.strip()
+    if not raw:
+        return ""
+    try:
+        parsed = urllib.parse.urlparse(raw)
+        if not parsed.scheme or not parsed.netloc:
+            return raw.rstrip("/")
+        return urllib.parse.urlunparse((parsed.scheme, parsed.netloc.lower(), parsed.path.rstrip("/"), "", parsed.query, ""))
+    except Exception:
+        return raw.rstrip("/")
+
+
+def make_catalog(size: int, seed: int = 7) -> list:
+    """合成工具目录：约 10% 的名称为全角/中文变体，约 5% 的记录与前面的记录 URL 重复"""
+    rng = random.Random(seed)
+    words = ["AI", "Chat", "Image", "Video", "Code", "Writer", "Voice", "Agent", "Studio", "Pro", "绘画", "助手", "翻译"]
+    catalog = []
+    for i in range(size):
+        name = f"{rng.choice(words)} {rng.choice(words)}-{i}"
+        if rng.random() < 0.1:
+            name = name.replace("AI", "ＡＩ").replace(" ", "　")
+        url = f"https://{'www.' if rng.random() < 0.5 else ''}tool{i}.example.com/{rng.choice(['', 'app/', 'ai'])}"
+        if catalog and rng.random() < 0.05:
+            url = rng.choice(catalog)["url"]
+        catalog.append({"name": name, "url": url, "description": "", "tags": []})
+    return catalog
+
+
+def run_legacy(catalog: list) -> int:
+    """旧做法：各调用点分别计算"""
+    seen = set()
+    for t in catalog:  # 提示词中的名称去重
+        seen.add(legacy_name_key(t["name"]))
+    exclusion = {legacy_name_key(t["name"]) for t in catalog}  # 排除集合
+    by_url = {}
+    for t in catalog:  # upsert
+        url_key = legacy_canonical_url(t["url"])
+        legacy_name_key(t["name"])
+        if url_key in by_url:
+            # 合并重复记录时再算两次 URL
+            legacy_canonical_url(by_url[url_key]["url"])
+            legacy_canonical_url(t["url"])
+        else:
+            by_url[url_key] = t
+    for t in by_url.values():  # favicon 地址与图标文件名
+        legacy_canonical_url(t["url"])
+        legacy_name_key(t["name"])
+    return len(by_url) + len(exclusion) + len(seen)
+
+
+def run_keyed(catalog: list) -> int:
+    """新做法：批量计算一次，键随记录传递；零散调用走 LRU 缓存"""
+    seen = {name_key(t["name"]) for t in catalog}  # 提示词中的名称去重
+    exclusion = {name_key(t["name"]) for t in catalog}  # 排除集合（缓存命中）
+    by_url = {}
+    for item in key_records(catalog):  # upsert 与合并规则（merge_engine.absorb_record）复用随记录携带的键
+        if item.url_key not in by_url:
+            by_url[item.url_key] = item
+    for item in by_url.values():  # favicon 地址与图标文件名（缓存命中）
+        canonical_url(item.record["url"])
+        name_key(item.record["name"])
+    return len(by_url) + len(exclusion) + len(seen)
+
+
+def timed(func, catalog: list, repeat: int, cold: bool) -> float:
+    """取多次运行的最短耗时（cold 为 True 时每次运行前清空 LRU 缓存）"""
+    best = float("inf")
+    for _ in range(repeat):
+        if cold:
+            clear_cache()
+        started = time.perf_counter()
+        func(catalog)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="规范化微基准")
+    parser.add_argument("--size", type=int, default=100000, help="合成目录的记录数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.size)
+    legacy = timed(run_legacy, catalog, args.repeat, cold=True)
+    keyed_cold = timed(run_keyed, catalog, args.repeat, cold=True)
+    keyed_warm = timed(run_keyed, catalog, args.repeat, cold=False)
+    print(f"记录数: {len(catalog)}")
+    print(f"旧做法（逐调用点重算）: {legacy:.3f} 秒")
+    print(f"新做法（冷缓存）: {keyed_cold:.3f} 秒，加速 {legacy / keyed_cold:.2f}x")
+    print(f"新做法（热缓存，同进程第二次整合）: {keyed_warm:.3f} 秒，加速 {legacy / keyed_warm:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+运行预算模块
+为一次爬取运行设定全局截止时间与 token 总量上限：请求超时按剩余时间收缩，
+剩余时间不足以完成一次请求时直接跳过，并为整合、图标下载与保存阶段预留时间
+"""
+import logging
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RunBudget:
+    """运行级预算（截止时间 + token 总量）
+
+    deadline_seconds 与 max_tokens 为 0 表示不限；
+    提取阶段可用时间 = 剩余时间 - reserve_seconds，图标下载可用时间 = 剩余时间 - save_margin_seconds
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: float = 0,
+        max_tokens: int = 0,
+        reserve_seconds: float = 120,
+        min_request_seconds: float = 30,
+        save_margin_seconds: float = 15,
+        token_counter: Optional[Callable[[], int]] = None
+    ):
+        """
+        初始化运行预算
+
+        Args:
+            deadline_seconds: 从 start() 起算的总时长（秒），0 表示不限
+            max_tokens: 本次运行的 token 总量上限，0 表示不限
+            reserve_seconds: 为整合/图标/保存阶段预留的时间（秒）
+            min_request_seconds: 提取阶段剩余时间低于该值时不再发起新请求
+            save_margin_seconds: 图标下载需为写文件预留的时间（秒）
+            token_counter: 返回当前已消耗 token 数的函数
+        """
+        self.deadline_seconds = max(0.0, float(deadline_seconds or 0))
+        self.max_tokens = max(0, int(max_tokens or 0))
+        self.reserve_seconds = max(0.0, float(reserve_seconds))
+        self.min_request_seconds = max(0.0, float(min_request_seconds))
+        self.save_margin_seconds = max(0.0, float(save_margin_seconds))
+        self.token_counter = token_counter
+        self.skipped_requests = 0
+        self.start()
+
+    def start(self) -> None:
+        """重新开始计时"""
+        self.started_at = time.monotonic()
+        self.skipped_requests = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否设置了任何预算"""
+        return bool(self.deadline_seconds or self.max_tokens)
+
+    def remaining(self) -> Optional[float]:
+        """距离截止时间的剩余秒数（未设置截止时间时为None）"""
+        if not self.deadline_seconds:
+            return None
+        return self.deadline_seconds - (time.monotonic() - self.started_at)
+
+    def extraction_remaining(self) -> Optional[float]:
+        """提取阶段可用的剩余秒数（扣除预留时间，未设置截止时间时为None）"""
+        remaining = self.remaining()
+        return None if remaining is None else remaining - self.reserve_seconds
+
+    def tokens_exhausted(self) -> bool:
+        """token 总量是否已用完"""
+        if not self.max_tokens or self.token_counter is None:
+            return False
+        return self.token_counter() >= self.max_tokens
+
+    def exhausted(self) -> bool:
+        """提取阶段的时间或 token 预算是否已用完"""
+        remaining = self.extraction_remaining()
+        if remaining is not None and remaining < self.min_request_seconds:
+            return True
+        return self.tokens_exhausted()
+
+    def request_timeout(self) -> Optional[float]:
+        """
+        本次请求可用的最长时间（秒）
+
+        Returns:
+            Optional[float]: 剩余的提取时间；未设置截止时间时为None；预算已用完时为0
+        """
+        if self.exhausted():
+            return 0.0
+        return self.extraction_remaining()
+
+    def try_start_request(self, label: str = "") -> Optional[float]:
+        """
+        判断能否发起一次新请求
+
+        Args:
+            label: 日志中显示的请求名称
+
+        Returns:
+            Optional[float]: 可以发起时返回超时（None 表示不限）；预算不足时返回 0 并计入跳过数
+        """
+        timeout = self.request_timeout()
+        if timeout == 0.0:
+            self.skipped_requests += 1
+            logger.warning(f"运行预算不足，跳过请求{f'：{label}' if label else ''}")
+        return timeout
+
+    def icon_timeout(self, default: float) -> float:
+        """
+        图标下载的超时（秒）：不超过 default，且保证写文件的时间；返回 0 表示应跳过下载
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return max(0.0, min(default, remaining - self.save_margin_seconds))
@@ -0,0 +1,226 @@
+"""
+AI响应缓存模块
+将 AIProvider.chat 的成功响应持久化到本地 SQLite，重跑时相同请求直接命中，
+支持 TTL 过期与按条数/体积的 LRU 淘汰
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 缓存默认参数（config.yaml 中 crawler.response_cache / providers.<name>.response_cache 可覆盖）
+DEFAULT_CACHE_PATH = ".cache/ai_responses.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT,
+    content TEXT NOT NULL,
+    usage TEXT,
+    finish_reason TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class ResponseCache:
+    """基于 SQLite 的响应缓存
+
+    同一个缓存文件在进程内共享一个实例（见 get_response_cache），读写由锁串行化
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        初始化响应缓存
+
+        Args:
+            path: SQLite 文件路径
+            ttl_seconds: 条目有效期（秒），<=0 表示不过期
+            max_entries: 最大条目数，超出时淘汰最久未访问的条目
+            max_bytes: 内容总字节数上限，超出时淘汰最久未访问的条目
+        """
+        self.path = Path(path)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.executescript(_SCHEMA)
+        # 兼容旧版本创建的缓存文件：补充后来新增的列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "finish_reason" not in columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN finish_reason TEXT")
+        self._conn.commit()
+        logger.info(
+            f"启用响应缓存: {self.path}，ttl: {self.ttl_seconds} 秒，"
+            f"最大条目: {self.max_entries}，最大体积: {self.max_bytes} 字节"
+        )
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, params: Dict[str, Any]) -> str:
+        """
+        生成缓存键：提供者 + 模型 + 提示词哈希 + 采样参数
+
+        Args:
+            provider: 提供者名称
+            model: 模型名称
+            prompt: 提示词（或序列化后的 messages）
+            params: 其余请求参数（temperature、max_tokens 等）
+
+        Returns:
+            str: 缓存键
+        """
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = json.dumps(
+            {"provider": provider, "model": model, "prompt": prompt_hash, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存条目（命中时刷新访问时间）
+
+        Returns:
+            Optional[Dict[str, Any]]: {"content", "usage", "model", "finish_reason"}，未命中或已过期返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, usage, model, created_at, finish_reason FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds > 0 and now - row[3] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return {
+            "content": row[0],
+            "usage": json.loads(row[1]) if row[1] else None,
+            "model": row[2],
+            "finish_reason": row[4]
+        }
+
+    def put(
+        self,
+        key: str,
+        provider: str,
+        model: Optional[str],
+        content: str,
+        usage: Optional[Dict[str, Any]] = None,
+        finish_reason: Optional[str] = None
+    ) -> None:
+        """写入缓存条目，并按上限淘汰"""
+        now = time.time()
+        usage_text = json.dumps(usage, ensure_ascii=False) if usage else None
+        size = len(content.encode("utf-8")) + len(usage_text or "")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, provider, model, content, usage, finish_reason, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, content, usage_text, finish_reason, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """删除过期条目，再按最久未访问顺序淘汰到条数/体积上限以内（调用方持有锁）"""
+        if self.ttl_seconds > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            removed += 1
+        self.evictions += removed
+        logger.debug(f"响应缓存淘汰 {removed} 条，剩余: {count} 条 / {total} 字节")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# 进程级共享：同一缓存文件只打开一个连接
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path: Path, **options) -> ResponseCache:
+    """
+    获取（或创建）指定路径的共享缓存实例
+
+    Args:
+        path: SQLite 文件路径
+        **options: ResponseCache 的其他构造参数（只在首次创建时生效）
+
+    Returns:
+        ResponseCache: 缓存实例
+    """
+    resolved = str(Path(path).resolve())
+    with _caches_lock:
+        cache = _caches.get(resolved)
+        if cache is None:
+            cache = ResponseCache(Path(resolved), **options)
+            _caches[resolved] = cache
+        return cache
+
+
+def log_cache_stats() -> None:
+    """输出所有已启用缓存的命中统计"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        stats = cache.stats()
+        logger.info(
+            f"响应缓存统计 {stats['path']}：命中 {stats['hits']}，未命中 {stats['misses']}，"
+            f"命中率 {stats['hit_rate']:.2%}，淘汰 {stats['evictions']}"
+        )
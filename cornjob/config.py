@@ -21,6 +21,7 @@ class ProviderConfig:
     model: Optional[str] = None  # 默认模型
     temperature: float = 0.7
     max_tokens: int = 2000
+    require_api_key: bool = True  # 本地推理服务等无鉴权后端可设为 False
 
 
 class ConfigManager:
@@ -124,6 +125,45 @@ class ConfigManager:
         crawler_config = config_data.get("crawler", {})
         return crawler_config.get(key, default)
     
+    @classmethod
+    def get_provider_section(cls, provider_name: str, section: str) -> Dict:
+        """
+        获取提供者的某个配置分组
+
+        以 crawler.<section> 作为全局默认值，再用 providers.<name>.<section> 覆盖
+
+        Args:
+            provider_name: 提供者名称
+            section: 配置分组名（如 http_pool）
+
+        Returns:
+            Dict: 合并后的配置字典（不存在时为空字典）
+        """
+        config_data = cls._load_config_file()
+        defaults = config_data.get("crawler", {}).get(section)
+        merged = dict(defaults) if isinstance(defaults, dict) else {}
+        provider_yaml_config = cls._get_provider_config_from_yaml(provider_name) or {}
+        override = provider_yaml_config.get(section)
+        if isinstance(override, dict):
+            merged.update(override)
+        return merged
+
+    @classmethod
+    def get_provider_pricing(cls) -> Dict[str, Dict]:
+        """
+        获取所有提供者的单价配置（providers.<name>.pricing）
+        
+        Returns:
+            Dict[str, Dict]: 提供者名称到 {模型名或 default -> {input, output}} 的映射
+        """
+        config_data = cls._load_config_file()
+        providers = config_data.get("providers", {})
+        pricing = {}
+        for provider_name, provider_config in providers.items():
+            if isinstance(provider_config, dict) and isinstance(provider_config.get("pricing"), dict):
+                pricing[provider_name] = provider_config["pricing"]
+        return pricing
+
     @classmethod
     def get_data_config(cls, key: str, default=None):
         """
@@ -160,16 +200,19 @@ class ConfigManager:
             return None
         
         # 从环境变量获取API密钥（优先使用环境变量）
+        require_api_key = bool(provider_yaml_config.get("require_api_key", True))
         env_key = provider_yaml_config.get("env_key")
         if not env_key:
-            logger.warning(f"{provider_name_lower} 配置中未找到 env_key")
-            return None
+            if require_api_key:
+                logger.warning(f"{provider_name_lower} 配置中未找到 env_key")
+                return None
+            env_key = ""
 
         # env_key 应该是“环境变量名”。如果误把真实 key 写进了 env_key，这里做兼容处理。
         # 规则：如果 env_key 看起来不像环境变量名（包含非大写/下划线/数字），且长度较长，
         # 则把它当作“直接的 api_key”使用，并输出警告。
-        api_key = os.getenv(env_key)
-        if not api_key:
+        api_key = os.getenv(env_key) if env_key else ""
+        if not api_key and require_api_key:
             looks_like_env_name = bool(env_key) and all(
                 (c.isupper() or c.isdigit() or c == "_") for c in str(env_key)
             )
@@ -193,7 +236,8 @@ class ConfigManager:
             base_url=base_url,
             model=model,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            require_api_key=require_api_key
         )
     
     @classmethod
@@ -2,28 +2,59 @@
 数据爬取模块
 使用AI提供者工厂来提取AI工具信息，并与已有数据进行整合去重
 """
+import asyncio
 import json
 import logging
 import os
+import queue
 import sys
 import re
+import threading
+import time
 import urllib.parse
 import urllib.request
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
 
 # 处理导入路径，支持直接运行和作为模块导入
 try:
     # 先尝试相对导入（作为模块导入时）
     from .factory import AIProviderFactory
-    from .base import AIProvider, AIResponse
+    from .base import AIProvider, AIResponse, StreamHandle
     from .config import ConfigManager
+    from .json_stream import JSONObjectStream
+    from .cache import log_cache_stats
+    from .metering import UsageMeter
+    from .journal import RunJournal, prune_journals
+    from .budget import RunBudget
+    from .router import ProviderRouter, ProviderScoreboard, assign_weighted
+    from .near_dup import NearDuplicateIndex
+    from .domain import domain_key
+    from .merge_engine import MergeEngine
+    from .normalize import canonical_url, name_key
+    from .tags import TagVocabulary
+    from .prompt_builder import PromptBuilder
+    from .tokens import estimate_tokens
 except (ImportError, ValueError):
     # 相对导入失败时，使用绝对导入（直接运行时）
     sys.path.insert(0, str(Path(__file__).parent))
     from factory import AIProviderFactory
-    from base import AIProvider, AIResponse
+    from base import AIProvider, AIResponse, StreamHandle
     from config import ConfigManager
+    from json_stream import JSONObjectStream
+    from cache import log_cache_stats
+    from metering import UsageMeter
+    from journal import RunJournal, prune_journals
+    from budget import RunBudget
+    from router import ProviderRouter, ProviderScoreboard, assign_weighted
+    from near_dup import NearDuplicateIndex
+    from domain import domain_key
+    from merge_engine import MergeEngine
+    from normalize import canonical_url, name_key
+    from tags import TagVocabulary
+    from prompt_builder import PromptBuilder
+    from tokens import estimate_tokens
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -32,6 +63,7 @@ logger = logging.getLogger(__name__)
 _data_dir = ConfigManager.get_data_config("data_dir", "/code/data")
 _tools_file = ConfigManager.get_data_config("tools_file", "tools.json")
 _categories_file = ConfigManager.get_data_config("categories_file", "categories.json")
+_tags_file = ConfigManager.get_data_config("tags_file", "tags.json")
 # 处理相对路径和绝对路径
 if Path(_data_dir).is_absolute():
     DATA_DIR = Path(_data_dir)
@@ -39,10 +71,79 @@ else:
     DATA_DIR = Path(__file__).parent.parent / _data_dir
 TOOLS_FILE = DATA_DIR / _tools_file
 CATEGORIES_FILE = DATA_DIR / _categories_file
+TAGS_FILE = DATA_DIR / _tags_file
 
 # 配置常量（从配置文件读取，环境变量可覆盖）
 MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(ConfigManager.get_crawler_config("max_content_length", 15000))))
 
+# 排除列表的名称数硬上限（0 表示不设上限，按模型 token 预算填充；模型未声明上下文窗口时默认 300）
+EXISTING_TOOL_NAMES_LIMIT = int(os.getenv("EXISTING_TOOL_NAMES_LIMIT") or ConfigManager.get_crawler_config("existing_tool_names_limit", 0))
+
+# 提取模式：sequential（逐个调用提供者）/ concurrent（异步并发调用提供者）/ stream（流式调用，逐个产出工具）
+# / race（多个提供者对冲竞速，先达到最少工具数者获胜）/ sharded（按分类拆分提示词并行提取）
+# / batch（按分类拆分的提示词通过离线批处理接口一次性提交）
+EXTRACT_MODE = (os.getenv("CRAWL_MODE") or ConfigManager.get_crawler_config("extract_mode", "sequential")).strip().lower()
+# race 模式：后一个提供者相对前一个的对冲延迟（秒），以及获胜所需的最少有效工具数
+RACE_HEDGE_DELAY = float(os.getenv("CRAWL_HEDGE_DELAY") or ConfigManager.get_crawler_config("race_hedge_delay", 10))
+RACE_MIN_TOOLS = int(os.getenv("CRAWL_RACE_MIN_TOOLS") or ConfigManager.get_crawler_config("race_min_tools", 10))
+RACE_JOIN_TIMEOUT = float(os.getenv("CRAWL_RACE_JOIN_TIMEOUT") or ConfigManager.get_crawler_config("race_join_timeout", 5))
+# concurrent 模式下同时进行的提供者请求数上限
+PROVIDER_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY") or ConfigManager.get_crawler_config("provider_concurrency", 4))
+# sharded 模式：分片方式（category - 每个分类一个提示词，轮流分配提供者；category_provider - 每个 分类×提供者 一个提示词）
+SHARD_BY = (os.getenv("CRAWL_SHARD_BY") or ConfigManager.get_crawler_config("shard_by", "category")).strip().lower()
+# sharded 模式下同时进行的分片请求数上限
+SHARD_CONCURRENCY = int(os.getenv("CRAWL_SHARD_CONCURRENCY") or ConfigManager.get_crawler_config("shard_concurrency", 4))
+
+# 响应被 max_tokens 截断时的最多续写次数（0 表示不续写），环境变量 CRAWL_MAX_CONTINUATIONS 可覆盖
+MAX_CONTINUATIONS = int(os.getenv("CRAWL_MAX_CONTINUATIONS") or ConfigManager.get_crawler_config("max_continuations", 2))
+
+# 多轮提取：最多轮数（1 表示单轮）、新工具目标数（0 表示不设目标）、单轮最低产出（低于该值即停止）、
+# 时间预算（秒）与 token 预算（0 表示不限）
+MAX_ROUNDS = int(os.getenv("CRAWL_MAX_ROUNDS") or ConfigManager.get_crawler_config("max_rounds", 1))
+TARGET_NEW_TOOLS = int(os.getenv("CRAWL_TARGET_NEW_TOOLS") or ConfigManager.get_crawler_config("target_new_tools", 0))
+MIN_ROUND_YIELD = int(os.getenv("CRAWL_MIN_ROUND_YIELD") or ConfigManager.get_crawler_config("min_round_yield", 3))
+ROUND_TIME_BUDGET = float(os.getenv("CRAWL_TIME_BUDGET") or ConfigManager.get_crawler_config("round_time_budget", 0))
+ROUND_TOKEN_BUDGET = int(os.getenv("CRAWL_TOKEN_BUDGET") or ConfigManager.get_crawler_config("round_token_budget", 0))
+
+# 计量报告（每次运行的 token / 延迟 / 费用 / 新工具产出），相对路径相对于 cornjob 目录
+_report_file = os.getenv("CRAWL_REPORT_FILE") or ConfigManager.get_crawler_config("report_file", "crawl_report.json")
+REPORT_FILE = Path(_report_file) if Path(_report_file).is_absolute() else Path(__file__).parent / _report_file
+
+# 运行日志（提示词 / 原始响应 / 解析结果 / 阶段完成情况），使用相同的 CRAWL_RUN_ID 重跑时从日志恢复
+_journal_options = ConfigManager.get_crawler_config("journal", {}) or {}
+JOURNAL_ENABLED = (os.getenv("CRAWL_JOURNAL") or str(_journal_options.get("enabled", True))).strip().lower() in {"1", "true", "yes", "y", "on"}
+_journal_dir = os.getenv("CRAWL_JOURNAL_DIR") or _journal_options.get("dir", ".runs")
+JOURNAL_DIR = Path(_journal_dir) if Path(_journal_dir).is_absolute() else Path(__file__).parent / _journal_dir
+# 保留最近的运行日志个数（0 表示不清理）
+JOURNAL_KEEP = int(_journal_options.get("keep", 20))
+
+# 运行预算：全局截止时间（秒，从 run() 开始计时）与 token 总量上限（0 表示不限），
+# 请求超时按剩余时间收缩，并为整合/图标/保存阶段预留时间
+_budget_options = ConfigManager.get_crawler_config("budget", {}) or {}
+RUN_DEADLINE = float(os.getenv("CRAWL_DEADLINE") or _budget_options.get("deadline_seconds", 0))
+RUN_MAX_TOKENS = int(os.getenv("CRAWL_MAX_TOKENS") or _budget_options.get("max_tokens", 0))
+
+# 提供者路由：按跨运行持久化的计分板（延迟分位数 / 错误率 / 解析成功率 / 每千 token 新工具数）选择提供者并分配权重
+# 策略 adaptive（按得分排序与加权）/ static（保持配置顺序），环境变量 CRAWL_ROUTING 可覆盖
+_router_options = ConfigManager.get_crawler_config("router", {}) or {}
+ROUTING_POLICY = (os.getenv("CRAWL_ROUTING") or _router_options.get("policy", "adaptive")).strip().lower()
+_scoreboard_file = os.getenv("CRAWL_SCOREBOARD_FILE") or _router_options.get("scoreboard_file", "state/provider_scoreboard.json")
+SCOREBOARD_FILE = Path(_scoreboard_file) if Path(_scoreboard_file).is_absolute() else Path(__file__).parent / _scoreboard_file
+
+# 近似重复检测（MinHash/LSH，名称字符 n-gram + URL 主机名）：off（关闭）/ flag（只记录到日志与报告）/ merge（自动合并），
+# threshold 为精确 Jaccard 相似度下限；环境变量 CRAWL_NEAR_DUP / CRAWL_NEAR_DUP_THRESHOLD 可覆盖
+_near_dup_options = ConfigManager.get_crawler_config("near_dup", {}) or {}
+NEAR_DUP_MODE = (os.getenv("CRAWL_NEAR_DUP") or _near_dup_options.get("mode", "flag")).strip().lower()
+NEAR_DUP_THRESHOLD = float(os.getenv("CRAWL_NEAR_DUP_THRESHOLD") or _near_dup_options.get("threshold", 0.8))
+
+# 注册域名（eTLD+1）二级去重：新工具与已有目录中 URL 不同但注册域名相同、且产品相同或一方无产品的记录合并
+# （www.wps.cn 与 wps.cn/ai；已有目录内部不按域名合并），默认关闭，环境变量 CRAWL_DOMAIN_DEDUPE 可覆盖
+DOMAIN_DEDUPE = (os.getenv("CRAWL_DOMAIN_DEDUPE") or str(ConfigManager.get_crawler_config("domain_dedupe", False))).strip().lower() in {"1", "true", "yes", "y", "on"}
+
+# 标签别名：规范名称 -> 别名列表（别名在解析、合并与保存时折叠为规范名称，如 AI绘画 -> 图像生成；
+# 保存时已有工具的标签也会被改写，见 config.yaml 中 tag_aliases 的说明）
+TAG_ALIASES = ConfigManager.get_crawler_config("tag_aliases", {}) or {}
+
 # 工具图标保存目录（写到 Next.js public 下）
 PUBLIC_DIR = Path(__file__).parent.parent / "code" / "public"
 TOOL_ICON_DIR = PUBLIC_DIR / "assets" / "images" / "tools"
@@ -51,6 +152,8 @@ TOOL_ICON_DIR = PUBLIC_DIR / "assets" / "images" / "tools"
 FAVICON_SIZE = int(os.getenv("FAVICON_SIZE", "128"))
 FETCH_ICONS = os.getenv("FETCH_ICONS", "true").strip().lower() in {"1", "true", "yes", "y", "on"}
 REFRESH_ICONS = os.getenv("REFRESH_ICONS", "false").strip().lower() in {"1", "true", "yes", "y", "on"}
+# 图标文件名中不允许的字符（保留小写字母数字与中文）
+_ICON_NAME_INVALID = re.compile(r"[^a-z0-9\u4e00-\u9fff]+")
 
 
 class DataFetcher:
@@ -60,8 +163,10 @@ class DataFetcher:
     支持多个AI提供者并行调用，并自动去重合并结果
     """
     
-    # AI提取提示词模板 - 用于生成工具数据
-    EXTRACT_PROMPT_TEMPLATE = """
+    # AI提取提示词的固定指令前缀 - 用于生成工具数据
+    # 前缀在所有请求间逐字节相同（不做任何格式化），内容与已有工具列表等可变部分由 PromptBuilder 追加在其后，
+    # 以便命中供应商的提示词前缀缓存（更低的首 token 延迟和输入单价）
+    EXTRACT_PROMPT_PREFIX = """
 # Background (背景)
 你是一个专业的AI工具数据抓取器，负责抓取和整理AI相关工具的信息。
 
@@ -89,7 +194,7 @@ class DataFetcher:
 # Expected Output (期望输出)
 请以JSON格式返回生成的数据。请生成多个工具（至少20个），返回一个JSON数组，格式如下：
 [
-  {{
+  {
     "name": "ChatGPT",
     "description": "由OpenAI开发的对话式AI助手，支持自然语言交互，可用于写作、编程、学习、客服等多种场景。",
     "url": "https://chatgpt.com",
@@ -99,8 +204,8 @@ class DataFetcher:
       "自然语言处理",
       "多场景应用"
     ]
-  }},
-  {{
+  },
+  {
     "name": "Midjourney",
     "description": "AI图像生成工具，通过自然语言描述生成高质量的艺术作品和图像。",
     "url": "https://www.midjourney.com",
@@ -110,7 +215,7 @@ class DataFetcher:
       "AI艺术",
       "创意设计"
     ]
-  }}
+  }
 ]
 
 注意：
@@ -119,69 +224,142 @@ class DataFetcher:
 - categoryId必须是1-9之间的整数，对应categories.json中的分类ID
 - tags必须是字符串数组，至少包含2个标签
 - 不要返回logo字段（logo会在本地根据url自动下载favicon并生成）
-
-# Content (内容)
-{content}
 """
     
+    # 续写指令：响应被 max_tokens 截断后，接着最后一个完整工具继续生成
+    CONTINUE_PROMPT = (
+        "上面的输出因长度限制被截断，已保留到最后一个完整的工具。"
+        "请继续生成更多工具，不要重复已经输出过的工具，仍然只返回一个有效的JSON数组。"
+    )
+    
     # 注意：整合去重不使用 AI（按工具名/URL 本地规则合并）
     
-    def __init__(self, providers: Optional[List[str]] = None, max_content_length: Optional[int] = None):
+    def __init__(
+        self,
+        providers: Optional[List[str]] = None,
+        max_content_length: Optional[int] = None,
+        extract_mode: Optional[str] = None,
+        concurrency: Optional[int] = None
+    ):
         """
         初始化数据获取器
         
         Args:
             providers: 要使用的AI提供者列表，如果为None则使用所有可用的提供者
             max_content_length: 最大内容长度，如果为None则使用模块级常量MAX_CONTENT_LENGTH
+            extract_mode: 提取模式（sequential / concurrent），如果为None则使用模块级常量EXTRACT_MODE
+            concurrency: concurrent 模式下的并发上限，如果为None则使用模块级常量PROVIDER_CONCURRENCY
         """
         self.providers = providers or AIProviderFactory.get_available_providers()
         self.max_content_length = max_content_length or MAX_CONTENT_LENGTH
-        logger.info(f"初始化DataFetcher，提供者: {self.providers}, 最大内容长度: {self.max_content_length}")
+        self.extract_mode = (extract_mode or EXTRACT_MODE).strip().lower()
+        self.concurrency = max(1, int(concurrency or PROVIDER_CONCURRENCY))
+        # 提供者实例缓存：配置只在创建时编译一次，同一次运行内的多次调用复用
+        self._provider_instances: Dict[str, AIProvider] = {}
+        self._provider_lock = threading.Lock()
+        # 用量计量：按 提供者/模型 汇总，run() 结束时写入报告
+        self.meter = UsageMeter(
+            pricing=ConfigManager.get_provider_pricing(),
+            currency=ConfigManager.get_crawler_config("currency", "CNY")
+        )
+        # 新工具来源：name_key -> (提供者, 模型)，用于把最终保留的新工具归属到提供者
+        self._tool_origins: Dict[str, Tuple[str, str]] = {}
+        # 多轮提取的逐轮产出统计（写入计量报告）
+        self.round_stats: List[Dict[str, Any]] = []
+        # 运行日志（仅在 run() 期间启用）
+        self.journal: Optional[RunJournal] = None
+        # 运行预算（run() 开始时重新计时）
+        self.budget = RunBudget(
+            deadline_seconds=RUN_DEADLINE,
+            max_tokens=RUN_MAX_TOKENS,
+            reserve_seconds=_budget_options.get("reserve_seconds", 120),
+            min_request_seconds=_budget_options.get("min_request_seconds", 30),
+            save_margin_seconds=_budget_options.get("save_margin_seconds", 15),
+            token_counter=lambda: self.meter.total_tokens
+        )
+        # 提供者路由：use_all_providers -> 选中的提供者及权重（每次运行只决定一次）
+        self.router = ProviderRouter(
+            ProviderScoreboard(SCOREBOARD_FILE, decay=_router_options.get("decay", 0.8)),
+            policy=ROUTING_POLICY,
+            min_requests=_router_options.get("min_requests", 3),
+            latency_target=_router_options.get("latency_target", 60),
+            min_weight=_router_options.get("min_weight", 0.05),
+            drop_below=_router_options.get("drop_below", 0.0)
+        )
+        self._routes: Dict[bool, Dict[str, float]] = {}
+        # 本次运行的整合引擎：已有目录写入一次，之后每批提取结果增量写入（见 _start_merge / _finish_extraction）
+        self.merge_engine: Optional[MergeEngine] = None
+        # 最近一次整合的统计与近似重复检测结果（写入计量报告）
+        self.merge_stats: Dict[str, Any] = {}
+        self.near_dup_stats: Dict[str, Any] = {}
+        # favicon 下载结果：注册域名+产品 -> 图片内容（下载失败为None），同域名的工具只下载一次
+        self._favicon_cache: Dict[str, Optional[bytes]] = {}
+        # 标签词表：驻留标签 ID 与别名折叠，沿用 tags.json 中已有的 ID
+        self.tags = TagVocabulary.load(TAGS_FILE, aliases=TAG_ALIASES)
+        logger.info(
+            f"初始化DataFetcher，提供者: {self.providers}, 最大内容长度: {self.max_content_length}, "
+            f"提取模式: {self.extract_mode}, 并发上限: {self.concurrency}"
+        )
     
-    def _create_extract_prompt(self, content: str = "", existing_tool_names: Optional[List[str]] = None) -> str:
+    def _create_extract_prompt(
+        self,
+        content: str = "",
+        existing_tool_names: Optional[List[str]] = None,
+        provider: Optional[AIProvider] = None
+    ) -> str:
         """
         创建AI提取提示词
         
+        布局为 固定指令前缀 + 内容 + 已有工具列表：前缀逐字节稳定，可变部分依次在后，
+        已有工具名称保持 tools.json 中的顺序（新工具追加在末尾），多轮/多次运行间的公共前缀尽量长
+        
+        按提供者模型的 token 预算组装：内容截断到 max_content_length 及预算以内，
+        已有工具名称按剩余预算尽量多地放入（模型未声明上下文窗口时最多 300 个）
+        
         Args:
             content: 可选的内容参数
             existing_tool_names: 已有工具名称列表（用于让模型过滤/避开已存在的工具）
+            provider: 目标提供者（用于确定 token 预算和分词器），为None时不按预算裁剪
             
         Returns:
             str: 格式化后的提示词
         """
-        existing_block = ""
+        deduped = []
         if existing_tool_names:
             # 只传名称给大模型用于过滤，避免重复生成
-            # 做长度保护，防止提示词过长
             names = [n.strip() for n in existing_tool_names if isinstance(n, str) and n.strip()]
             # 去重（保持顺序）
             seen = set()
-            deduped = []
             for n in names:
                 key = self._normalize_name_key(n)
                 if key and key not in seen:
                     seen.add(key)
                     deduped.append(n)
-            # 控制数量，避免 prompt 过长（默认最多 300 个名称）
-            max_names = int(os.getenv("EXISTING_TOOL_NAMES_LIMIT", "300"))
-            clipped = deduped[:max_names]
-            existing_block = (
-                "\n\n# Existing Tools (已有工具名称列表)\n"
-                "下面这些工具已经存在于 tools.json 中，请【不要】重复返回（name 相同或非常相似也算重复）：\n"
-                + "\n".join([f"- {n}" for n in clipped])
-                + "\n"
-            )
 
-        return self.EXTRACT_PROMPT_TEMPLATE.format(content=content) + existing_block
+        builder = PromptBuilder(
+            count_tokens=provider.count_tokens if provider else estimate_tokens,
+            max_prompt_tokens=provider.get_prompt_budget() if provider else None,
+            max_content_chars=self.max_content_length,
+            max_names=EXISTING_TOOL_NAMES_LIMIT or None
+        )
+        return builder.build(self.EXTRACT_PROMPT_PREFIX, content=content, names=deduped)
     
     # _create_merge_prompt 已废弃：不再使用 AI 做 merge
     
-    def _parse_ai_response(self, response: AIResponse) -> List[Dict[str, Any]]:
+    def _parse_ai_response(
+        self,
+        response: AIResponse,
+        scanner: Optional[JSONObjectStream] = None
+    ) -> List[Dict[str, Any]]:
         """
         解析AI响应，提取工具信息
         
+        单遍扫描响应文本中的每个完整顶层对象：代码块标记、前后说明文字和数组括号都被跳过，
+        响应在 max_tokens 处被截断时，截断点之前的完整工具仍会保留
+        
         Args:
             response: AI响应对象
+            scanner: 可选的扫描器实例（用于在解析后读取恢复/丢弃的对象数）
             
         Returns:
             List[Dict[str, Any]]: 工具信息列表
@@ -190,170 +368,128 @@ class DataFetcher:
             logger.warning(f"AI响应失败: {response.error_message}")
             return []
         
+        scanner = scanner or JSONObjectStream()
         try:
-            content = response.content.strip()
-            # 移除可能的markdown代码块标记
-            if content.startswith("```"):
-                lines = content.split("\n")
-                # 移除第一行和最后一行（代码块标记）
-                if len(lines) > 2:
-                    # 检查是否有语言标识（如 ```json）
-                    if lines[0].strip().startswith("```"):
-                        content = "\n".join(lines[1:-1])
-                    else:
-                        content = "\n".join(lines[1:-1])
-            
-            # 尝试解析JSON
-            data = json.loads(content)
-            
-            # 如果是单个对象，转换为列表
-            if isinstance(data, dict):
-                data = [data]
-            
-            # 验证数据格式
             tools = []
-            for item in data:
-                if isinstance(item, dict) and "name" in item:
-                    # 提取categoryId，如果没有则尝试从category字段获取
-                    category_id = item.get("categoryId")
-                    if category_id is None:
-                        # 尝试从category字段解析（可能是字符串或数字）
-                        category = item.get("category", "")
-                        if isinstance(category, int):
-                            category_id = category
-                        elif isinstance(category, str) and category.strip().isdigit():
-                            category_id = int(category.strip())
-                        else:
-                            logger.warning(f"工具 {item.get('name')} 缺少有效的categoryId")
-                            continue
-                    
-                    # 验证categoryId是否在有效范围内（1-9）
-                    if not isinstance(category_id, int) or category_id < 1 or category_id > 9:
-                        logger.warning(f"工具 {item.get('name')} 的categoryId无效: {category_id}")
-                        continue
-                    
-                    # 新提取的工具不包含id，id会在保存时自动分配（自增）
-                    tool = {
-                        "name": item.get("name", "").strip(),
-                        "description": item.get("description", "").strip(),
-                        "url": item.get("url", "").strip(),
-                        "categoryId": category_id,
-                        "rating": 0,
-                        "ratingCount": 0,
-                        "isActive": True,
-                        "isFeatured": False,
-                        "tags": item.get("tags", []) if isinstance(item.get("tags"), list) else [],
-                        "developer": item.get("developer", "").strip() if isinstance(item.get("developer"), str) else "",
-                        "pricing": item.get("pricing", "").strip() if isinstance(item.get("pricing"), str) else ""
-                    }
-                    
-                    # 验证必填字段
-                    if not tool["name"] or not tool["description"] or not tool["url"]:
-                        logger.warning(f"工具数据不完整，跳过: {tool.get('name', '未知')}")
-                        continue
-                    
+            for item in scanner.feed(response.content or ""):
+                tool = self._normalize_tool_item(item)
+                if tool is not None:
                     tools.append(tool)
-            
-            logger.info(f"成功解析 {len(tools)} 个工具")
-            return tools
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"解析AI响应JSON失败: {str(e)}")
-            logger.debug(f"响应内容: {response.content[:500]}")
-            return []
+            truncated = scanner.pending
+            scanner.close()
         except Exception as e:
             logger.exception(f"解析AI响应时出错: {str(e)}")
             return []
+        
+        if scanner.dropped:
+            logger.warning(
+                f"解析AI响应：恢复 {scanner.recovered} 个对象，丢弃 {scanner.dropped} 个"
+                f"{'（响应被截断）' if truncated else ''}"
+            )
+            logger.debug(f"响应内容: {response.content[:500]}")
+        if not scanner.recovered:
+            logger.error("解析AI响应失败：未找到完整的JSON对象")
+            logger.debug(f"响应内容: {response.content[:500]}")
+        logger.info(f"成功解析 {len(tools)} 个工具")
+        return tools
     
+    def _normalize_tool_item(self, item: Any) -> Optional[Dict[str, Any]]:
+        """
+        校验并规范化模型返回的单个工具对象
+        
+        Args:
+            item: 模型返回的原始对象
+            
+        Returns:
+            Optional[Dict[str, Any]]: 规范化后的工具；数据无效时返回None
+        """
+        if not isinstance(item, dict) or "name" not in item:
+            return None
+        # 提取categoryId，如果没有则尝试从category字段获取
+        category_id = item.get("categoryId")
+        if category_id is None:
+            # 尝试从category字段解析（可能是字符串或数字）
+            category = item.get("category", "")
+            if isinstance(category, int):
+                category_id = category
+            elif isinstance(category, str) and category.strip().isdigit():
+                category_id = int(category.strip())
+            else:
+                logger.warning(f"工具 {item.get('name')} 缺少有效的categoryId")
+                return None
+        
+        # 验证categoryId是否在有效范围内（1-9）
+        if not isinstance(category_id, int) or category_id < 1 or category_id > 9:
+            logger.warning(f"工具 {item.get('name')} 的categoryId无效: {category_id}")
+            return None
+        
+        # 新提取的工具不包含id，id会在保存时自动分配（自增）
+        tool = {
+            "name": item.get("name", "").strip(),
+            "description": item.get("description", "").strip(),
+            "url": item.get("url", "").strip(),
+            "categoryId": category_id,
+            "rating": 0,
+            "ratingCount": 0,
+            "isActive": True,
+            "isFeatured": False,
+            "tags": self.tags.normalize(item.get("tags")),
+            "developer": item.get("developer", "").strip() if isinstance(item.get("developer"), str) else "",
+            "pricing": item.get("pricing", "").strip() if isinstance(item.get("pricing"), str) else ""
+        }
+        
+        # 验证必填字段
+        if not tool["name"] or not tool["description"] or not tool["url"]:
+            logger.warning(f"工具数据不完整，跳过: {tool.get('name', '未知')}")
+            return None
+        
+        return tool
+
+    def iter_tools_from_stream(
+        self,
+        chunks: Iterable[str],
+        scanner: Optional[JSONObjectStream] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        增量解析流式响应，每当一个工具对象闭合就立即产出
+        
+        即使响应在中途被截断，截断点之前的完整工具也会被保留
+        
+        Args:
+            chunks: 流式响应的内容片段
+            scanner: 可选的扫描器实例（用于在解析后读取恢复/丢弃的对象数）
+            
+        Yields:
+            Dict[str, Any]: 规范化后的工具
+        """
+        scanner = scanner or JSONObjectStream()
+        for chunk in chunks:
+            for item in scanner.feed(chunk):
+                tool = self._normalize_tool_item(item)
+                if tool is not None:
+                    yield tool
+        scanner.close()
+        logger.info(f"流式解析完成，解析对象: {scanner.recovered}, 丢弃对象: {scanner.dropped}")
+
     def _normalize_name_key(self, name: str) -> str:
         """
-        将工具名规范化为稳定去重键（用于“按工具名去重”）
+        将工具名规范化为稳定去重键（用于“按工具名去重”，见 normalize.name_key）
 
         策略：
+        - NFKC 折叠（全角转半角）
         - 小写
         - 去除空白与常见标点符号
-        - 合并连续空白
         """
-        if not isinstance(name, str):
-            return ""
-        value = name.strip().lower()
-        if not value:
-            return ""
-        # 保留字母数字与中文，其余视为分隔符
-        value = re.sub(r"[\s\-_·•\.\,，/\\\(\)\[\]\{\}<>:：;；'\"“”‘’`~!@#$%^&*+=?|]+", "", value)
-        return value
+        return name_key(name)
 
     def _canonicalize_url(self, url: str) -> str:
         """
-        URL 规范化，用于更稳定地比较 URL：
+        URL 规范化，用于更稳定地比较 URL（见 normalize.canonical_url）：
         - 补全 scheme 的情况不在这里处理（上游要求必须 https）
         - host 小写
-        - 去掉末尾 /
+        - 去掉末尾 / 与 fragment
         """
-        if not isinstance(url, str):
-            return ""
-        raw = url.strip()
-        if not raw:
-            return ""
-        try:
-            parsed = urllib.parse.urlparse(raw)
-            if not parsed.scheme or not parsed.netloc:
-                return raw.rstrip("/")
-            netloc = parsed.netloc.lower()
-            path = parsed.path.rstrip("/")
-            # 保留 query（有些产品页区分 query），但去掉 fragment
-            rebuilt = urllib.parse.urlunparse((parsed.scheme, netloc, path, "", parsed.query, ""))
-            return rebuilt
-        except Exception:
-            return raw.rstrip("/")
-
-    def _choose_better_tool(self, existing: Dict[str, Any], incoming: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        合并同一工具的两条记录，尽量保留更完整的信息。
-        """
-        merged = existing.copy()
-
-        # 描述：更长者优先
-        if len(str(incoming.get("description", "")).strip()) > len(str(existing.get("description", "")).strip()):
-            merged["description"] = incoming.get("description", "")
-
-        # URL：优先选择更像“官方 HTTPS”的（同时做 canonicalize）
-        existing_url = self._canonicalize_url(str(existing.get("url", "")))
-        incoming_url = self._canonicalize_url(str(incoming.get("url", "")))
-        if incoming_url and (not existing_url or len(incoming_url) >= len(existing_url)):
-            merged["url"] = incoming.get("url", "")
-
-        # categoryId：若现有缺失/非法，使用新的
-        try:
-            existing_cat = int(existing.get("categoryId")) if existing.get("categoryId") is not None else None
-        except Exception:
-            existing_cat = None
-        try:
-            incoming_cat = int(incoming.get("categoryId")) if incoming.get("categoryId") is not None else None
-        except Exception:
-            incoming_cat = None
-        if existing_cat is None or not (1 <= existing_cat <= 9):
-            if incoming_cat is not None and 1 <= incoming_cat <= 9:
-                merged["categoryId"] = incoming_cat
-
-        # tags：合并去重，保持顺序
-        existing_tags = existing.get("tags", []) if isinstance(existing.get("tags"), list) else []
-        incoming_tags = incoming.get("tags", []) if isinstance(incoming.get("tags"), list) else []
-        merged_tags: List[str] = []
-        for tag in existing_tags + incoming_tags:
-            if isinstance(tag, str):
-                t = tag.strip()
-                if t and t not in merged_tags:
-                    merged_tags.append(t)
-        merged["tags"] = merged_tags
-
-        # developer / pricing：有值则补齐（不覆盖已有非空）
-        if not str(merged.get("developer", "")).strip() and str(incoming.get("developer", "")).strip():
-            merged["developer"] = incoming.get("developer", "")
-        if not str(merged.get("pricing", "")).strip() and str(incoming.get("pricing", "")).strip():
-            merged["pricing"] = incoming.get("pricing", "")
-
-        return merged
+        return canonical_url(url)
 
     def merge_datasets_locally(
         self,
@@ -361,62 +497,68 @@ class DataFetcher:
         new_data: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """
-        本地整合去重（不使用AI）
+        本地整合去重（不使用AI），由 MergeEngine 单遍完成
 
         去重优先级：
         - 先用 URL 规范化后去重（如果两条都有 URL 且相同）
+        - URL 不同时新工具按注册域名 + 产品匹配已有目录（DOMAIN_DEDUPE，见 domain.DomainIndex）
         - 再用“工具名规范化 key”去重（满足你说的：可通过工具名去除，不需要使用AI）
-        """
-        if not new_data:
-            return existing_data
-        if not existing_data:
-            return new_data
+        - 最后按近似重复检测（NEAR_DUP_MODE 为 merge 时合并，flag 时只记录）
 
-        by_url: Dict[str, Dict[str, Any]] = {}
-        by_name: Dict[str, str] = {}  # name_key -> url_key (或 name_key 自身占位)
-
-        def upsert(tool: Dict[str, Any]) -> None:
-            url_key = self._canonicalize_url(str(tool.get("url", "")))
-            name_key = self._normalize_name_key(str(tool.get("name", "")))
-
-            # 1) URL 命中
-            if url_key:
-                if url_key in by_url:
-                    by_url[url_key] = self._choose_better_tool(by_url[url_key], tool)
-                else:
-                    by_url[url_key] = tool.copy()
-                if name_key and name_key not in by_name:
-                    by_name[name_key] = url_key
-                return
+        传入的记录会被就地合并修改；整合统计写入 self.merge_stats（run 使用运行级引擎，不经过这里）
+        """
+        engine = self._create_merge_engine(NEAR_DUP_MODE)
+        engine.ingest(existing_data, catalog=True)
+        engine.ingest(new_data)
+        return self._collect_merge(engine, len(existing_data), len(new_data))
 
-            # 2) 无 URL 时，按 name_key 命中
-            if name_key:
-                mapped = by_name.get(name_key)
-                if mapped and mapped in by_url:
-                    by_url[mapped] = self._choose_better_tool(by_url[mapped], tool)
-                    return
-                # 没映射：用 name_key 作为临时“伪 URL key”
-                pseudo_key = f"name:{name_key}"
-                if pseudo_key in by_url:
-                    by_url[pseudo_key] = self._choose_better_tool(by_url[pseudo_key], tool)
-                else:
-                    by_url[pseudo_key] = tool.copy()
-                by_name[name_key] = pseudo_key
-                return
+    def _start_merge(self, existing_data: List[Dict[str, Any]]) -> MergeEngine:
+        """创建本次运行的整合引擎并写入已有目录（每次运行只写入一次）"""
+        self.merge_engine = self._create_merge_engine(NEAR_DUP_MODE)
+        self.merge_engine.ingest(existing_data, catalog=True)
+        return self.merge_engine
 
-            # 3) 既没 URL 也没 name_key：丢弃
-            logger.warning("跳过无效工具（无可用URL且名称不可用）")
+    def _collect_merge(self, engine: MergeEngine, existing_count: int, new_count: int) -> List[Dict[str, Any]]:
+        """取出整合结果，记录整合统计与近似重复检测结果"""
+        merged = engine.records()
+        self.merge_stats = engine.stats()
+        self.near_dup_stats = engine.near_dup_stats()
+        for sample in self.near_dup_stats.get("samples", [])[:10]:
+            logger.info(f"近似重复: {sample['kept']} ~ {sample['duplicate']}（相似度 {sample['similarity']}）")
+        if self.near_dup_stats:
+            logger.info(
+                f"近似重复检测（{self.near_dup_stats['mode']}）：发现 {self.near_dup_stats['pairs']} 条，"
+                f"合并 {self.near_dup_stats['removed']} 条"
+            )
+        logger.info(
+            f"本地整合去重完成，已有: {existing_count}, 新增: {new_count}, 合并后: {len(merged)}，"
+            f"按规则合并: {self.merge_stats['merged']}，丢弃: {self.merge_stats['dropped']}，"
+            f"耗时 {self.merge_stats['seconds']} 秒"
+        )
+        return merged
 
-        for t in existing_data:
-            if isinstance(t, dict):
-                upsert(t)
-        for t in new_data:
-            if isinstance(t, dict):
-                upsert(t)
+    def _create_merge_engine(self, near_dup_mode: str = "off") -> MergeEngine:
+        """
+        创建整合引擎（身份规则与本次运行的配置一致）
 
-        merged = list(by_url.values())
-        logger.info(f"本地整合去重完成，已有: {len(existing_data)}, 新增: {len(new_data)}, 合并后: {len(merged)}")
-        return merged
+        Args:
+            near_dup_mode: off / flag / merge
+        """
+        near_dup_index = None
+        if near_dup_mode in {"flag", "merge"}:
+            near_dup_index = NearDuplicateIndex(
+                threshold=NEAR_DUP_THRESHOLD,
+                num_perm=int(_near_dup_options.get("num_perm", 24)),
+                bands=int(_near_dup_options.get("bands", 6)),
+                ngram=int(_near_dup_options.get("ngram", 3)),
+                max_bucket=int(_near_dup_options.get("max_bucket", 64))
+            )
+        return MergeEngine(
+            tags=self.tags,
+            domain_dedupe=DOMAIN_DEDUPE,
+            near_dup_mode=near_dup_mode,
+            near_dup_index=near_dup_index
+        )
 
     def _favicon_fetch_url(self, tool_url: str) -> Tuple[str, str]:
         """
@@ -435,9 +577,8 @@ class DataFetcher:
         """
         生成稳定的本地图标文件名（png）。
         """
-        name_key = self._normalize_name_key(str(tool.get("name", "")))
-        base = name_key or domain or "tool"
-        base = re.sub(r"[^a-z0-9\u4e00-\u9fff]+", "-", base.lower()).strip("-")
+        base = self._normalize_name_key(str(tool.get("name", ""))) or domain or "tool"
+        base = _ICON_NAME_INVALID.sub("-", base.lower()).strip("-")
         if not base:
             base = "tool"
         return f"{base}.png"
@@ -465,32 +606,444 @@ class DataFetcher:
             if target_path.exists() and not REFRESH_ICONS:
                 return f"/assets/images/tools/{filename}"
 
+            # 同一注册域名 + 产品的工具共用一次下载结果（失败也只尝试一次）
+            icon_key = str(domain_key(url) or domain)
+            if icon_key in self._favicon_cache:
+                body = self._favicon_cache[icon_key]
+            else:
+                # 下载超时受运行预算约束，剩余时间只够保存时跳过下载
+                timeout = self.budget.icon_timeout(20)
+                if timeout <= 0:
+                    logger.debug(f"运行预算不足，跳过下载favicon，工具: {tool.get('name')}")
+                    return None
+                body = self._download_favicon(fetch_url, timeout, tool, url)
+                self._favicon_cache[icon_key] = body
+            if body is None:
+                return None
+
+            with open(target_path, "wb") as f:
+                f.write(body)
+            return f"/assets/images/tools/{filename}"
+        except Exception as e:
+            logger.warning(f"下载favicon异常，工具: {tool.get('name')}, url: {url}, err: {e}")
+            return None
+
+    def _download_favicon(self, fetch_url: str, timeout: float, tool: Dict[str, Any], url: str) -> Optional[bytes]:
+        """
+        下载并校验 favicon
+
+        Returns:
+            Optional[bytes]: 图片内容（下载失败、内容过小或非图片时为None）
+        """
+        try:
             req = urllib.request.Request(
                 fetch_url,
                 headers={
                     "User-Agent": "Mozilla/5.0 (compatible; XuCrawler/1.0; +https://example.com)"
                 }
             )
-            with urllib.request.urlopen(req, timeout=20) as resp:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
                 content_type = resp.headers.get("Content-Type", "")
                 body = resp.read()
+        except Exception as e:
+            logger.warning(f"下载favicon异常，工具: {tool.get('name')}, url: {url}, err: {e}")
+            return None
 
-            if not body or len(body) < 100:
-                logger.warning(f"下载favicon失败（内容过小），工具: {tool.get('name')}, url: {url}")
-                return None
+        if not body or len(body) < 100:
+            logger.warning(f"下载favicon失败（内容过小），工具: {tool.get('name')}, url: {url}")
+            return None
 
-            # 简单校验：期望 png 或 ico（S2 一般返回 png）
-            if "image" not in content_type:
-                logger.warning(f"下载favicon失败（非图片响应: {content_type}），工具: {tool.get('name')}, url: {url}")
-                return None
+        # 简单校验：期望 png 或 ico（S2 一般返回 png）
+        if "image" not in content_type:
+            logger.warning(f"下载favicon失败（非图片响应: {content_type}），工具: {tool.get('name')}, url: {url}")
+            return None
+        return body
 
-            with open(target_path, "wb") as f:
-                f.write(body)
-            return f"/assets/images/tools/{filename}"
+    def _get_provider(self, provider_name: str) -> Optional[AIProvider]:
+        """获取（或创建并缓存）提供者实例"""
+        with self._provider_lock:
+            provider = self._provider_instances.get(provider_name)
+            if provider is None:
+                provider = AIProviderFactory.create_provider(provider_name)
+                if provider is not None:
+                    self._provider_instances[provider_name] = provider
+            return provider
+
+    def _route_providers(self, use_all_providers: bool) -> Dict[str, float]:
+        """按路由策略确定本次要使用的提供者及其流量权重（同一次运行内保持不变）"""
+        route = self._routes.get(use_all_providers)
+        if route is None:
+            route = self.router.route(list(self.providers or []), use_all_providers)
+            self._routes[use_all_providers] = route
+            if route:
+                logger.info(
+                    f"提供者路由（{self.router.policy}）: "
+                    + ", ".join(f"{name}={weight:.2f}" for name, weight in route.items())
+                )
+        return route
+
+    def _resolve_providers(self, use_all_providers: bool) -> List[str]:
+        """确定本次要使用的提供者列表（按路由权重从高到低）"""
+        return list(self._route_providers(use_all_providers))
+
+    def _update_scoreboard(self) -> None:
+        """把本次运行的用量合并进提供者计分板并写回文件"""
+        usage = self.meter.provider_usage()
+        self.router.scoreboard.update(usage, {name: self.meter.latency_samples(name) for name in usage})
+        self.router.scoreboard.save()
+
+    def _build_existing_name_keys(self, existing_tool_names: Optional[List[str]]) -> set:
+        """构建本地兜底过滤集合（防止模型仍返回重复）"""
+        existing_name_keys = set()
+        if existing_tool_names:
+            for n in existing_tool_names:
+                key = self._normalize_name_key(str(n))
+                if key:
+                    existing_name_keys.add(key)
+        return existing_name_keys
+
+    def _collect_provider_tools(
+        self,
+        provider_name: str,
+        response: AIResponse,
+        existing_name_keys: set
+    ) -> List[Dict[str, Any]]:
+        """
+        解析单个提供者的响应，并过滤掉已存在的工具
+        
+        Args:
+            provider_name: 提供者名称
+            response: AI响应对象
+            existing_name_keys: 已有工具名规范化 key 集合
+            
+        Returns:
+            List[Dict[str, Any]]: 该提供者贡献的工具列表
+        """
+        self.meter.record_response(provider_name, response)
+        scanner = JSONObjectStream()
+        tools = self._parse_ai_response(response, scanner)
+        self.meter.record_tools(provider_name, response.model, len(tools), dropped=scanner.dropped)
+        if not tools:
+            logger.warning(f"{provider_name} 未提取到工具")
+            return []
+        # 本地兜底过滤：如果工具名已存在，则跳过
+        if existing_name_keys:
+            filtered = []
+            skipped = 0
+            for t in tools:
+                key = self._normalize_name_key(str(t.get("name", "")))
+                if key and key in existing_name_keys:
+                    skipped += 1
+                    continue
+                filtered.append(t)
+            if skipped:
+                logger.info(f"{provider_name} 返回 {skipped} 条已存在工具，已过滤")
+            tools = filtered
+        self._remember_origins(tools, provider_name, response.model)
+        if self.journal is not None:
+            self.journal.record_tools(provider_name, tools)
+        logger.info(f"{provider_name} 提取到 {len(tools)} 个工具")
+        return tools
+
+    def _replay_response(self, entry: Dict[str, Any]) -> AIResponse:
+        """用运行日志中的响应记录构造 AIResponse（按缓存命中计量，不重复计费）"""
+        return AIResponse(
+            content=entry.get("content") or "",
+            success=True,
+            usage=entry.get("usage"),
+            model=entry.get("model"),
+            from_cache=True,
+            latency=0.0,
+            finish_reason=entry.get("finish_reason")
+        )
+
+    def _chat(self, provider: AIProvider, prompt: str, **kwargs) -> AIResponse:
+        """
+        发送对话请求：启用运行日志时，已应答的请求直接从日志重放，新请求的提示词与响应写入日志
+        
+        Args:
+            provider: 提供者实例
+            prompt: 提示词
+            **kwargs: 其他参数（同 chat）
+            
+        Returns:
+            AIResponse: 响应对象
+        """
+        key, timeout, replayed = self._begin_chat(provider, prompt, kwargs)
+        if replayed is not None:
+            return replayed
+        response = provider.chat(prompt, timeout=timeout, **kwargs)
+        return self._end_chat(provider, key, response)
+
+    async def _achat(self, provider: AIProvider, prompt: str, **kwargs) -> AIResponse:
+        """异步对话请求：经 provider.achat 发出，运行日志与预算语义同 _chat"""
+        key, timeout, replayed = self._begin_chat(provider, prompt, kwargs)
+        if replayed is not None:
+            return replayed
+        response = await provider.achat(prompt, timeout=timeout, **kwargs)
+        return self._end_chat(provider, key, response)
+
+    def _begin_chat(
+        self, provider: AIProvider, prompt: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[float], Optional[AIResponse]]:
+        """
+        对话请求发出前的处理：查运行日志、占用预算、记录提示词
+
+        Returns:
+            Tuple: (运行日志键，请求可用时长，无需发出请求时直接返回的响应)
+        """
+        journal = self.journal
+        name = provider.get_provider_name()
+        key = None
+        if journal is not None:
+            key = journal.make_key(name, prompt, kwargs)
+            entry = journal.get_response(key)
+            if entry is not None:
+                logger.info(f"{name} 的请求已在运行日志中应答，直接重放")
+                return key, None, self._replay_response(entry)
+        timeout = self.budget.try_start_request(name)
+        if timeout == 0.0:
+            return key, None, AIResponse(content="", success=False, error_message="运行预算不足，跳过请求")
+        if journal is not None:
+            journal.record_prompt(key, name, prompt)
+        return key, timeout, None
+
+    def _end_chat(self, provider: AIProvider, key: Optional[str], response: AIResponse) -> AIResponse:
+        """对话请求返回后的处理：把响应写入运行日志"""
+        if self.journal is not None:
+            self.journal.record_response(key, provider.get_provider_name(), response)
+        return response
+
+    def _chat_stream(
+        self, provider: AIProvider, prompt: str, handle: Optional[StreamHandle] = None
+    ) -> Iterator[str]:
+        """
+        流式对话请求（运行日志语义同 _chat；被提前关闭、经 handle 取消或因预算耗尽而中断的流不写入日志）
+
+        提供者抛出的异常先作为失败响应写入运行日志，再原样抛给调用方（由调用方计入流式请求错误）
+        """
+        journal = self.journal
+        name = provider.get_provider_name()
+        key = None
+        if journal is not None:
+            key = journal.make_key(name, prompt, {"stream": True})
+            entry = journal.get_response(key)
+            if entry is not None:
+                logger.info(f"{name} 的流式请求已在运行日志中应答，直接重放")
+                if entry.get("content"):
+                    yield entry["content"]
+                return
+        if handle is not None and handle.cancelled:
+            return
+        timeout = self.budget.try_start_request(name)
+        if timeout == 0.0:
+            return
+        if journal is not None:
+            journal.record_prompt(key, name, prompt)
+        parts: List[str] = []
+        stream_kwargs: Dict[str, Any] = {"timeout": timeout}
+        if handle is not None:
+            stream_kwargs["handle"] = handle
+        try:
+            for chunk in provider.chat_stream(prompt, **stream_kwargs):
+                if self.budget.exhausted():
+                    logger.warning(f"运行预算耗尽，中断 {name} 的流式请求")
+                    return
+                parts.append(chunk)
+                yield chunk
         except Exception as e:
-            logger.warning(f"下载favicon异常，工具: {tool.get('name')}, url: {url}, err: {e}")
+            if journal is not None and not (handle is not None and handle.cancelled):
+                journal.record_response(key, name, AIResponse(
+                    content="".join(parts),
+                    success=False,
+                    error_message=str(e),
+                    model=provider.get_default_model()
+                ))
+            raise
+        if journal is None or (handle is not None and handle.cancelled):
+            return
+        content = "".join(parts)
+        journal.record_response(key, name, AIResponse(
+            content=content,
+            success=bool(content),
+            model=provider.get_default_model()
+        ))
+
+    def _chat_batch(self, provider: AIProvider, prompts: List[str]) -> List[AIResponse]:
+        """批处理对话请求：只提交运行日志中尚未应答的提示词"""
+        journal = self.journal
+        name = provider.get_provider_name()
+        if journal is None:
+            timeout = self.budget.try_start_request(name)
+            if timeout == 0.0:
+                return [
+                    AIResponse(content="", success=False, error_message="运行预算不足，跳过请求")
+                    for _ in prompts
+                ]
+            return provider.chat_batch(prompts, timeout=timeout)
+        keys = [journal.make_key(name, prompt, {"batch": True}) for prompt in prompts]
+        responses: List[Optional[AIResponse]] = []
+        pending: List[int] = []
+        for i, key in enumerate(keys):
+            entry = journal.get_response(key)
+            responses.append(self._replay_response(entry) if entry is not None else None)
+            if entry is None:
+                pending.append(i)
+        if len(pending) < len(prompts):
+            logger.info(f"{name} 批处理中 {len(prompts) - len(pending)} 个请求已在运行日志中应答，直接重放")
+        timeout = self.budget.try_start_request(name) if pending else None
+        if timeout == 0.0:
+            for i in pending:
+                responses[i] = AIResponse(content="", success=False, error_message="运行预算不足，跳过请求")
+        elif pending:
+            for i in pending:
+                journal.record_prompt(keys[i], name, prompts[i])
+            batch_responses = provider.chat_batch([prompts[i] for i in pending], timeout=timeout)
+            for i, response in zip(pending, batch_responses):
+                journal.record_response(keys[i], name, response)
+                responses[i] = response
+        return responses
+
+    def _open_journal(self) -> Optional[RunJournal]:
+        """按 CRAWL_RUN_ID 打开（或创建）运行日志；未设置时为本次运行生成新的 ID"""
+        if not JOURNAL_ENABLED:
+            return None
+        run_id = os.getenv("CRAWL_RUN_ID") or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        safe_id = re.sub(r"[^\w.-]", "_", run_id)
+        try:
+            prune_journals(JOURNAL_DIR, JOURNAL_KEEP)
+            return RunJournal(JOURNAL_DIR / f"{safe_id}.jsonl", run_id)
+        except OSError as e:
+            logger.warning(f"无法打开运行日志，本次运行不记录: {str(e)}")
             return None
 
+    def _collect_responses(
+        self,
+        provider_name: str,
+        responses: List[AIResponse],
+        existing_name_keys: set
+    ) -> List[Dict[str, Any]]:
+        """解析同一提示词的首个响应及其续写响应，拼接工具列表"""
+        tools = []
+        for response in responses:
+            tools.extend(self._collect_provider_tools(provider_name, response, existing_name_keys))
+        return tools
+
+    def _continue_response(
+        self,
+        provider: AIProvider,
+        prompt: str,
+        response: AIResponse,
+        max_continuations: Optional[int] = None
+    ) -> List[AIResponse]:
+        """
+        响应被 max_tokens 截断（finish_reason 为 length）时发起续写请求
+        
+        续写请求的对话为：原提示词 -> 助手（到目前为止所有完整工具组成的 JSON 数组）-> 继续指令，
+        即从最后一个完整工具之后接着生成；直到响应未被截断、没有新的完整工具或达到续写上限
+        
+        Args:
+            provider: 提供者实例
+            prompt: 原提示词
+            response: 首个响应
+            max_continuations: 最多续写次数，如果为None则使用模块级常量MAX_CONTINUATIONS
+            
+        Returns:
+            List[AIResponse]: 首个响应及各续写响应（按顺序）
+        """
+        limit = MAX_CONTINUATIONS if max_continuations is None else max(0, int(max_continuations))
+        responses = [response]
+        items: List[Dict[str, Any]] = []
+        while True:
+            messages = self._next_continuation(provider, prompt, responses, items, limit)
+            if messages is None:
+                return responses
+            responses.append(self._chat(provider, prompt, messages=messages))
+
+    async def _acontinue_response(
+        self,
+        provider: AIProvider,
+        prompt: str,
+        response: AIResponse,
+        max_continuations: Optional[int] = None
+    ) -> List[AIResponse]:
+        """_continue_response 的异步版本（续写请求经 _achat 发出）"""
+        limit = MAX_CONTINUATIONS if max_continuations is None else max(0, int(max_continuations))
+        responses = [response]
+        items: List[Dict[str, Any]] = []
+        while True:
+            messages = self._next_continuation(provider, prompt, responses, items, limit)
+            if messages is None:
+                return responses
+            responses.append(await self._achat(provider, prompt, messages=messages))
+
+    def _next_continuation(
+        self,
+        provider: AIProvider,
+        prompt: str,
+        responses: List[AIResponse],
+        items: List[Dict[str, Any]],
+        limit: int
+    ) -> Optional[List[Dict[str, str]]]:
+        """根据最后一个响应决定是否续写：需要续写时把新的完整对象并入 items 并返回续写对话，否则返回 None"""
+        response = responses[-1]
+        if not (response.success and response.finish_reason == "length" and len(responses) <= limit):
+            return None
+        new_items = JSONObjectStream().feed(response.content or "")
+        if not new_items:
+            logger.warning(f"{provider.get_provider_name()} 响应被截断且没有完整工具，停止续写")
+            return None
+        items.extend(new_items)
+        logger.info(
+            f"{provider.get_provider_name()} 响应被截断，已有 {len(items)} 个完整对象，"
+            f"第 {len(responses)} 次续写"
+        )
+        return [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": json.dumps(items, ensure_ascii=False)},
+            {"role": "user", "content": self.CONTINUE_PROMPT}
+        ]
+
+    def _remember_origins(self, tools: List[Dict[str, Any]], provider_name: str, model: Optional[str]) -> None:
+        """记录新工具由哪个 提供者/模型 首先给出（用于计量新工具产出）"""
+        for t in tools:
+            key = self._normalize_name_key(str(t.get("name", "")))
+            if key:
+                self._tool_origins.setdefault(key, (provider_name, model or "unknown"))
+
+    def _record_kept_tools(self, merged_data: List[Dict[str, Any]]) -> int:
+        """
+        统计整合去重后最终保留的新工具（尚未分配 id 的记录），按来源计入计量
+        
+        Returns:
+            int: 新工具数量
+        """
+        kept = 0
+        for t in merged_data:
+            if isinstance(t, dict) and t.get("id") is None:
+                kept += 1
+                origin = self._tool_origins.get(self._normalize_name_key(str(t.get("name", ""))))
+                if origin:
+                    self.meter.record_kept(origin[0], origin[1])
+        return kept
+
+    def _finish_extraction(self, all_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        把所有提供者的结果写入本次运行的整合引擎（去重与并入已有目录在引擎中一次完成）
+
+        不经过 run 单独调用提取方法时，引擎在这里按空目录创建
+
+        Returns:
+            List[Dict[str, Any]]: 本批提取结果（原样返回，写入运行日志；整合结果见 self.merge_engine）
+        """
+        if not all_tools:
+            logger.warning("所有提供者都未能提取到工具")
+            return []
+        engine = self.merge_engine if self.merge_engine is not None else self._start_merge([])
+        inserted = engine.ingest(all_tools)
+        logger.info(f"提取完成，共提取到 {len(all_tools)} 个工具，其中新工具 {inserted} 个")
+        return all_tools
+
     def extract_tools_with_ai(
         self, 
         content: str = "",
@@ -503,15 +1056,13 @@ class DataFetcher:
         Args:
             content: 可选的内容参数
             use_all_providers: 是否使用所有可用的提供者
+            existing_tool_names: 已有工具名称列表（用于提示词过滤和本地兜底过滤）
             
         Returns:
             List[Dict[str, Any]]: 提取并去重后的工具列表
         """
-        # 创建提示词（带已有工具名过滤）
-        prompt = self._create_extract_prompt(content=content, existing_tool_names=existing_tool_names)
-        
         # 确定要使用的提供者
-        providers_to_use = self.providers if use_all_providers else [self.providers[0]] if self.providers else []
+        providers_to_use = self._resolve_providers(use_all_providers)
         
         if not providers_to_use:
             logger.warning("没有可用的AI提供者")
@@ -519,101 +1070,639 @@ class DataFetcher:
         
         logger.info(f"使用 {len(providers_to_use)} 个AI提供者提取工具信息")
         
-        # 构建本地兜底过滤集合（防止模型仍返回重复）
-        existing_name_keys = set()
-        if existing_tool_names:
-            for n in existing_tool_names:
-                key = self._normalize_name_key(str(n))
-                if key:
-                    existing_name_keys.add(key)
+        existing_name_keys = self._build_existing_name_keys(existing_tool_names)
 
         # 调用所有提供者进行多次提取
         all_tools = []
         for provider_name in providers_to_use:
+            if self.budget.exhausted():
+                logger.warning("运行预算已用完，跳过剩余提供者")
+                break
             try:
                 logger.info(f"正在使用 {provider_name} 提取工具信息...")
-                provider = AIProviderFactory.create_provider(provider_name)
+                provider = self._get_provider(provider_name)
                 if provider is None:
                     logger.warning(f"无法创建 {provider_name} 提供者")
                     continue
                 
-                response = provider.chat(prompt)
-                tools = self._parse_ai_response(response)
-                if tools:
-                    # 本地兜底过滤：如果工具名已存在，则跳过
-                    if existing_name_keys:
-                        filtered = []
-                        skipped = 0
-                        for t in tools:
-                            key = self._normalize_name_key(str(t.get("name", "")))
-                            if key and key in existing_name_keys:
-                                skipped += 1
-                                continue
-                            filtered.append(t)
-                        if skipped:
-                            logger.info(f"{provider_name} 返回 {skipped} 条已存在工具，已过滤")
-                        tools = filtered
-                    all_tools.extend(tools)  # 直接扩展列表，后续统一去重
-                    logger.info(f"{provider_name} 提取到 {len(tools)} 个工具")
-                else:
-                    logger.warning(f"{provider_name} 未提取到工具")
+                # 按提供者的 token 预算创建提示词（带已有工具名过滤）
+                prompt = self._create_extract_prompt(content, existing_tool_names, provider)
+                responses = self._continue_response(provider, prompt, self._chat(provider, prompt))
+                # 直接扩展列表，后续统一去重
+                all_tools.extend(self._collect_responses(provider_name, responses, existing_name_keys))
                     
             except Exception as e:
                 logger.exception(f"使用 {provider_name} 提取工具时出错: {str(e)}")
                 continue
         
-        # 基础去重（基于URL或名称）
-        if all_tools:
-            deduplicated = self._simple_deduplicate(all_tools)
-            logger.info(f"提取完成，共提取到 {len(deduplicated)} 个工具（去重后）")
-            return deduplicated
-        else:
-            logger.warning("所有提供者都未能提取到工具")
-            return []
-    
-    def _simple_deduplicate(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._finish_extraction(all_tools)
+
+    async def aextract_tools_with_ai(
+        self,
+        content: str = "",
+        use_all_providers: bool = True,
+        existing_tool_names: Optional[List[str]] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        简单去重（基于URL或名称）
+        使用AI提供者并发提取工具信息（异步）
+        
+        所有提供者同时发起请求（受并发上限约束），总耗时取决于最慢的提供者而不是所有提供者之和；
+        结果按提供者顺序合并
         
         Args:
-            tools: 工具列表
+            content: 可选的内容参数
+            use_all_providers: 是否使用所有可用的提供者
+            existing_tool_names: 已有工具名称列表（用于提示词过滤和本地兜底过滤）
+            concurrency: 并发上限，如果为None则使用 self.concurrency
             
         Returns:
-            List[Dict[str, Any]]: 去重后的工具列表
+            List[Dict[str, Any]]: 提取并去重后的工具列表
+        """
+        providers_to_use = self._resolve_providers(use_all_providers)
+        
+        if not providers_to_use:
+            logger.warning("没有可用的AI提供者")
+            return []
+        
+        limit = max(1, int(concurrency or self.concurrency))
+        logger.info(f"并发使用 {len(providers_to_use)} 个AI提供者提取工具信息，并发上限: {limit}")
+        
+        existing_name_keys = self._build_existing_name_keys(existing_tool_names)
+        semaphore = asyncio.Semaphore(limit)
+
+        async def extract_one(provider_name: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    logger.info(f"正在使用 {provider_name} 提取工具信息...")
+                    provider = self._get_provider(provider_name)
+                    if provider is None:
+                        logger.warning(f"无法创建 {provider_name} 提供者")
+                        return []
+                    prompt = self._create_extract_prompt(content, existing_tool_names, provider)
+                    response = await self._achat(provider, prompt)
+                    responses = await self._acontinue_response(provider, prompt, response)
+                    return self._collect_responses(provider_name, responses, existing_name_keys)
+                except Exception as e:
+                    logger.exception(f"使用 {provider_name} 提取工具时出错: {str(e)}")
+                    return []
+
+        # 按提供者顺序合并（而非完成先后），保证去重结果与后续提示词稳定，便于运行日志重放
+        all_tools = []
+        for tools in await asyncio.gather(*(extract_one(name) for name in providers_to_use)):
+            all_tools.extend(tools)
+        
+        return self._finish_extraction(all_tools)
+
+    def stream_extract_tools(
+        self,
+        provider_name: str,
+        content: str = "",
+        existing_tool_names: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        使用单个提供者流式提取工具信息，每解析出一个工具就立即产出
+        
+        Args:
+            provider_name: 提供者名称
+            content: 可选的内容参数
+            existing_tool_names: 已有工具名称列表（用于提示词过滤和本地兜底过滤）
+            
+        Yields:
+            Dict[str, Any]: 未与已有工具重复的新工具
+        """
+        existing_name_keys = self._build_existing_name_keys(existing_tool_names)
+        provider = self._get_provider(provider_name)
+        if provider is None:
+            logger.warning(f"无法创建 {provider_name} 提供者")
+            return
+        prompt = self._create_extract_prompt(content, existing_tool_names, provider)
+        
+        model = provider.get_default_model()
+        started = time.monotonic()
+        parsed = 0
+        emitted = 0
+        skipped = 0
+        failed = False
+        scanner = JSONObjectStream()
+        try:
+            for tool in self.iter_tools_from_stream(self._chat_stream(provider, prompt), scanner):
+                parsed += 1
+                key = self._normalize_name_key(str(tool.get("name", "")))
+                if key and key in existing_name_keys:
+                    skipped += 1
+                    continue
+                if emitted == 0:
+                    logger.info(f"{provider_name} 首个工具耗时: {time.monotonic() - started:.2f} 秒")
+                emitted += 1
+                self._remember_origins([tool], provider_name, model)
+                yield tool
+        except Exception:
+            # 请求失败或读取中断：已产出的工具保留，这次请求计为错误
+            failed = True
+            raise
+        finally:
+            self.meter.record_stream(provider_name, model, time.monotonic() - started, parsed > 0 and not failed)
+            self.meter.record_tools(provider_name, model, parsed, dropped=scanner.dropped)
+        if skipped:
+            logger.info(f"{provider_name} 返回 {skipped} 条已存在工具，已过滤")
+        logger.info(f"{provider_name} 流式提取到 {emitted} 个工具，耗时: {time.monotonic() - started:.2f} 秒")
+
+    def race_extract_tools(
+        self,
+        content: str = "",
+        existing_tool_names: Optional[List[str]] = None,
+        hedge_delay: Optional[float] = None,
+        min_tools: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        tools_dict: Dict[str, Dict[str, Any]] = {}
+        竞速提取：同一提示词依次（按对冲延迟错开）发给多个提供者，
+        第一个流式解析出至少 min_tools 个有效新工具的提供者获胜，其余进行中的请求被取消
         
-        for tool in tools:
-            # 确定唯一标识（优先使用URL）
-            identifier = tool.get("url", "").strip()
-            if not identifier:
-                identifier = tool.get("name", "").strip().lower()
+        前一个提供者提前失败或结束时，立即启动下一个提供者而不等待对冲延迟；
+        没有提供者达到 min_tools 时，合并所有已完成提供者的结果。
+        产生胜者后立即关闭落后请求的连接，返回前最多等待 RACE_JOIN_TIMEOUT 秒让工作线程退出，
+        用量统计在返回前全部记录完毕
+        
+        Args:
+            content: 可选的内容参数
+            existing_tool_names: 已有工具名称列表（用于提示词过滤和本地兜底过滤）
+            hedge_delay: 对冲延迟（秒），如果为None则使用模块级常量RACE_HEDGE_DELAY；0 表示同时发出
+            min_tools: 获胜所需的最少有效工具数，如果为None则使用模块级常量RACE_MIN_TOOLS
             
-            if not identifier:
-                logger.warning("跳过无效工具（无URL和名称）")
+        Returns:
+            List[Dict[str, Any]]: 获胜提供者（或所有提供者合并）的去重后工具列表
+        """
+        # 按路由权重排序：得分最高的提供者最先发出，后续提供者依次对冲
+        providers_to_use = self._resolve_providers(True)
+        if not providers_to_use:
+            logger.warning("没有可用的AI提供者")
+            return []
+        hedge_delay = RACE_HEDGE_DELAY if hedge_delay is None else max(0.0, float(hedge_delay))
+        min_tools = max(1, int(RACE_MIN_TOOLS if min_tools is None else min_tools))
+        existing_name_keys = self._build_existing_name_keys(existing_tool_names)
+        logger.info(
+            f"竞速提取：{len(providers_to_use)} 个提供者，对冲延迟: {hedge_delay} 秒，获胜阈值: {min_tools} 个工具"
+        )
+        
+        started = time.monotonic()
+        events: "queue.Queue[Tuple[str, str, List[Dict[str, Any]]]]" = queue.Queue()
+        state: Dict[str, Optional[str]] = {"winner": None}
+        state_lock = threading.Lock()
+        # 每个已启动提供者的状态：取消句柄、线程与用量统计所需的计数
+        slots: Dict[str, Dict[str, Any]] = {}
+
+        def lost(provider_name: str) -> bool:
+            winner = state["winner"]
+            return winner is not None and winner != provider_name
+
+        def finish(slot: Dict[str, Any]) -> None:
+            # 记录一次请求的用量统计（工作线程结束时或协调线程等待超时后调用，只生效一次）
+            with state_lock:
+                if slot["recorded"]:
+                    return
+                slot["recorded"] = True
+            if slot["model"] is None:
+                return
+            provider_name, model = slot["name"], slot["model"]
+            self.meter.record_stream(
+                provider_name, model, time.monotonic() - slot["started"], slot["parsed"] > 0 and not slot["failed"]
+            )
+            self.meter.record_tools(provider_name, model, slot["parsed"], dropped=slot["scanner"].dropped)
+            self._remember_origins(list(slot["tools"]), provider_name, model)
+
+        def race_one(slot: Dict[str, Any]) -> None:
+            provider_name = slot["name"]
+            tools: List[Dict[str, Any]] = slot["tools"]
+            try:
+                provider = self._get_provider(provider_name)
+                if provider is None:
+                    logger.warning(f"无法创建 {provider_name} 提供者")
+                    return
+                prompt = self._create_extract_prompt(content, existing_tool_names, provider)
+                slot["started"] = time.monotonic()
+                slot["model"] = provider.get_default_model()
+                stream = self._chat_stream(provider, prompt, slot["handle"])
+
+                def guarded() -> Iterator[str]:
+                    # 连接被协调线程关闭前已到达的内容不再解析
+                    for chunk in stream:
+                        if lost(provider_name):
+                            return
+                        yield chunk
+
+                try:
+                    for tool in self.iter_tools_from_stream(guarded(), slot["scanner"]):
+                        slot["parsed"] += 1
+                        key = self._normalize_name_key(str(tool.get("name", "")))
+                        if key and key in existing_name_keys:
+                            continue
+                        tools.append(tool)
+                        if len(tools) == min_tools:
+                            with state_lock:
+                                if state["winner"] is None:
+                                    state["winner"] = provider_name
+                                    events.put(("won", provider_name, []))
+                except Exception:
+                    slot["failed"] = True
+                    raise
+                finally:
+                    stream.close()
+                    finish(slot)
+            except Exception as e:
+                logger.exception(f"使用 {provider_name} 竞速提取时出错: {str(e)}")
+            finally:
+                events.put(("done", provider_name, tools))
+
+        def launch(provider_name: str) -> None:
+            slot: Dict[str, Any] = {
+                "name": provider_name,
+                "handle": StreamHandle(),
+                "scanner": JSONObjectStream(),
+                "tools": [],
+                "parsed": 0,
+                "failed": False,
+                "model": None,
+                "started": time.monotonic(),
+                "recorded": False,
+            }
+            slot["thread"] = threading.Thread(
+                target=race_one, args=(slot,), name=f"race-{provider_name}", daemon=True
+            )
+            slots[provider_name] = slot
+            slot["thread"].start()
+
+        def cancel_losers() -> None:
+            for provider_name, slot in slots.items():
+                if provider_name != state["winner"] and not slot["handle"].cancelled:
+                    slot["handle"].cancel()
+
+        pending = list(providers_to_use)
+        running = 0
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            launch(pending.pop(0))
+            running += 1
+            while running:
+                timeout = hedge_delay if pending and state["winner"] is None else None
+                try:
+                    kind, provider_name, tools = events.get(timeout=timeout)
+                except queue.Empty:
+                    # 对冲：当前提供者迟迟未达标，启动下一个
+                    launch(pending.pop(0))
+                    running += 1
+                    continue
+                if kind == "won":
+                    logger.info(f"竞速获胜: {provider_name}，耗时: {time.monotonic() - started:.2f} 秒，取消其余请求")
+                    pending.clear()
+                    cancel_losers()
+                    continue
+                running -= 1
+                results[provider_name] = tools
+                if state["winner"] == provider_name:
+                    break
+                if pending and state["winner"] is None:
+                    # 提前结束但未达标：立即启动下一个
+                    launch(pending.pop(0))
+                    running += 1
+        finally:
+            cancel_losers()
+            join_deadline = time.monotonic() + RACE_JOIN_TIMEOUT
+            for provider_name, slot in slots.items():
+                slot["thread"].join(max(0.0, join_deadline - time.monotonic()))
+                if slot["thread"].is_alive():
+                    # 线程仍未退出：在此记录用量，之后该线程不再写入统计与运行日志
+                    logger.warning(f"{provider_name} 的竞速请求在 {RACE_JOIN_TIMEOUT} 秒内未能退出")
+                    slot["handle"].cancel()
+                    finish(slot)
+        
+        winner = state["winner"]
+        if winner is not None:
+            logger.info(f"竞速提取完成，采用 {winner} 的 {len(results[winner])} 个工具")
+            return self._finish_extraction(results[winner])
+        logger.warning(f"没有提供者达到 {min_tools} 个工具，合并所有已完成提供者的结果")
+        return self._finish_extraction([t for tools in results.values() for t in tools])
+
+    def _create_shard_content(self, category: Dict[str, Any], content: str = "") -> str:
+        """为单个分类分片生成内容参数：限定分类，附加原始内容"""
+        category_id = category.get("id")
+        description = str(category.get("description") or "").strip()
+        shard_content = (
+            f"本次只生成分类 {category_id}「{category.get('name', '')}」"
+            f"{'（' + description + '）' if description else ''}下的 AI 工具，"
+            f"所有工具的 categoryId 均为 {category_id}。"
+        )
+        if content:
+            shard_content += "\n" + content
+        return shard_content
+
+    def _group_names_by_category(self, existing_tools: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+        """按分类分组已有工具名称（用于分片提示词的排除列表）"""
+        names_by_category: Dict[int, List[str]] = {}
+        for t in existing_tools:
+            if not isinstance(t, dict) or not isinstance(t.get("name"), str) or not t["name"].strip():
+                continue
+            try:
+                category_id = int(t.get("categoryId"))
+            except (TypeError, ValueError):
                 continue
+            names_by_category.setdefault(category_id, []).append(t["name"].strip())
+        return names_by_category
+
+    def sharded_extract_tools(
+        self,
+        content: str = "",
+        use_all_providers: bool = True,
+        existing_tools: Optional[List[Dict[str, Any]]] = None,
+        shard_by: Optional[str] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        分片提取：按 categories.json 的分类拆分提示词，在有界线程池中并行请求
+        
+        每个分片只要求一个分类的工具，排除列表只包含该分类的已有工具名称，
+        单次响应更小、不易被 max_tokens 截断；本地兜底过滤仍使用全部已有工具名称
+        
+        Args:
+            content: 可选的内容参数（附加到每个分片的提示词中）
+            use_all_providers: 是否使用所有可用的提供者
+            existing_tools: 已有工具数据（用于按分类构建排除列表）
+            shard_by: 分片方式（category / category_provider），如果为None则使用模块级常量SHARD_BY
+            concurrency: 并发上限，如果为None则使用模块级常量SHARD_CONCURRENCY
             
-            # 如果已存在，保留信息更完整的
-            if identifier in tools_dict:
-                existing = tools_dict[identifier]
-                # 如果新工具的描述更长，使用新工具
-                if len(tool.get("description", "")) > len(existing.get("description", "")):
-                    tools_dict[identifier] = tool.copy()
-                # 合并标签（去重）
-                existing_tags = existing.get("tags", [])
-                new_tags = tool.get("tags", [])
-                # 合并标签并去重，保持顺序
-                merged_tags = existing_tags + [tag for tag in new_tags if tag not in existing_tags]
-                tools_dict[identifier]["tags"] = merged_tags
-                # 如果新工具的categoryId更合理，更新它
-                if tool.get("categoryId") and not existing.get("categoryId"):
-                    tools_dict[identifier]["categoryId"] = tool.get("categoryId")
-            else:
-                tools_dict[identifier] = tool.copy()
+        Returns:
+            List[Dict[str, Any]]: 所有分片合并去重后的工具列表
+        """
+        existing_tools = existing_tools or []
+        existing_tool_names = [
+            t["name"].strip() for t in existing_tools
+            if isinstance(t, dict) and isinstance(t.get("name"), str) and t["name"].strip()
+        ]
+        providers_to_use = self._resolve_providers(use_all_providers)
+        if not providers_to_use:
+            logger.warning("没有可用的AI提供者")
+            return []
+        categories = [c for c in self.load_categories() if isinstance(c, dict) and c.get("id") is not None]
+        if not categories:
+            logger.warning("没有可用的分类，改用 sequential 提取")
+            return self.extract_tools_with_ai(content, use_all_providers, existing_tool_names)
+        names_by_category = self._group_names_by_category(existing_tools)
+
+        shard_by = (shard_by or SHARD_BY).strip().lower()
+        if shard_by not in {"category", "category_provider"}:
+            logger.warning(f"未知的分片方式: {shard_by}，使用 category")
+            shard_by = "category"
+        if shard_by == "category_provider":
+            shards = [(c, p) for c in categories for p in providers_to_use]
+        else:
+            # 按路由权重分配分片（权重相同时即轮流分配）
+            route = self._route_providers(use_all_providers)
+            shards = list(zip(categories, assign_weighted(len(categories), route)))
         
-        result = list(tools_dict.values())
-        logger.info(f"简单去重完成，原始工具数: {len(tools)}, 去重后: {len(result)}")
-        return result
+        limit = max(1, int(concurrency or SHARD_CONCURRENCY))
+        logger.info(f"分片提取：{len(shards)} 个分片（{shard_by}），并发上限: {limit}")
+        existing_name_keys = self._build_existing_name_keys(existing_tool_names)
+
+        def extract_shard(category: Dict[str, Any], provider_name: str) -> List[Dict[str, Any]]:
+            label = f"{provider_name}/分类{category.get('id')}"
+            try:
+                provider = self._get_provider(provider_name)
+                if provider is None:
+                    logger.warning(f"无法创建 {provider_name} 提供者")
+                    return []
+                prompt = self._create_extract_prompt(
+                    self._create_shard_content(category, content),
+                    names_by_category.get(int(category["id"]), []),
+                    provider
+                )
+                responses = self._continue_response(provider, prompt, self._chat(provider, prompt))
+                return self._collect_responses(provider_name, responses, existing_name_keys)
+            except Exception as e:
+                logger.exception(f"分片 {label} 提取工具时出错: {str(e)}")
+                return []
+
+        all_tools = []
+        with ThreadPoolExecutor(max_workers=limit, thread_name_prefix="shard") as pool:
+            futures = [pool.submit(extract_shard, c, p) for c, p in shards]
+            # 按分片顺序合并，保证去重结果稳定
+            for future in futures:
+                all_tools.extend(future.result())
+        
+        return self._finish_extraction(all_tools)
+
+    def batch_extract_tools(
+        self,
+        content: str = "",
+        use_all_providers: bool = True,
+        existing_tools: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        离线批处理提取：为每个提供者构建按分类拆分的提示词，一次性提交到批处理接口
+        
+        适用于不需要交互延迟的大批量回填：不长时间占用连接，通常单价更低；
+        各提供者的批处理任务并行提交与轮询，结果经过与其他模式相同的解析、过滤和去重
+        （未启用 batch.enabled 的提供者逐个调用 chat()）
+        
+        Args:
+            content: 可选的内容参数（附加到每个提示词中）
+            use_all_providers: 是否使用所有可用的提供者
+            existing_tools: 已有工具数据（用于按分类构建排除列表和本地兜底过滤）
+            
+        Returns:
+            List[Dict[str, Any]]: 所有提供者合并去重后的工具列表
+        """
+        existing_tools = existing_tools or []
+        existing_tool_names = [
+            t["name"].strip() for t in existing_tools
+            if isinstance(t, dict) and isinstance(t.get("name"), str) and t["name"].strip()
+        ]
+        providers_to_use = self._resolve_providers(use_all_providers)
+        if not providers_to_use:
+            logger.warning("没有可用的AI提供者")
+            return []
+        categories = [c for c in self.load_categories() if isinstance(c, dict) and c.get("id") is not None]
+        names_by_category = self._group_names_by_category(existing_tools)
+        existing_name_keys = self._build_existing_name_keys(existing_tool_names)
+
+        def extract_batch(provider_name: str) -> List[Dict[str, Any]]:
+            try:
+                provider = self._get_provider(provider_name)
+                if provider is None:
+                    logger.warning(f"无法创建 {provider_name} 提供者")
+                    return []
+                if categories:
+                    prompts = [
+                        self._create_extract_prompt(
+                            self._create_shard_content(c, content),
+                            names_by_category.get(int(c["id"]), []),
+                            provider
+                        )
+                        for c in categories
+                    ]
+                else:
+                    prompts = [self._create_extract_prompt(content, existing_tool_names, provider)]
+                logger.info(f"{provider_name} 批处理提交 {len(prompts)} 个提示词")
+                tools = []
+                for prompt, response in zip(prompts, self._chat_batch(provider, prompts)):
+                    # 被截断的批处理结果以同步请求续写
+                    responses = self._continue_response(provider, prompt, response)
+                    tools.extend(self._collect_responses(provider_name, responses, existing_name_keys))
+                return tools
+            except Exception as e:
+                logger.exception(f"使用 {provider_name} 批处理提取工具时出错: {str(e)}")
+                return []
+
+        all_tools = []
+        with ThreadPoolExecutor(max_workers=len(providers_to_use), thread_name_prefix="batch") as pool:
+            for tools in pool.map(extract_batch, providers_to_use):
+                all_tools.extend(tools)
+        
+        return self._finish_extraction(all_tools)
+
+    def iterative_extract_tools(
+        self,
+        content: str = "",
+        use_all_providers: bool = True,
+        existing_tools: Optional[List[Dict[str, Any]]] = None,
+        max_rounds: Optional[int] = None,
+        target_new_tools: Optional[int] = None,
+        min_round_yield: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        token_budget: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        多轮提取：每轮把上一轮接受的新工具加入排除列表，再按当前提取模式请求更多工具
+        
+        满足以下任一条件即停止：达到 max_rounds；累计新工具达到 target_new_tools；
+        某一轮的新工具数低于 min_round_yield；时间或 token 预算耗尽（在轮次之间检查）
+        
+        Args:
+            content: 可选的内容参数
+            use_all_providers: 是否使用所有可用的提供者
+            existing_tools: 已有工具数据
+            max_rounds: 最多轮数，如果为None则使用模块级常量MAX_ROUNDS
+            target_new_tools: 新工具目标数（0 表示不设目标），如果为None则使用模块级常量TARGET_NEW_TOOLS
+            min_round_yield: 单轮最低新工具数，如果为None则使用模块级常量MIN_ROUND_YIELD
+            time_budget: 时间预算（秒，0 表示不限），如果为None则使用模块级常量ROUND_TIME_BUDGET
+            token_budget: token 预算（0 表示不限），如果为None则使用模块级常量ROUND_TOKEN_BUDGET
+            
+        Returns:
+            List[Dict[str, Any]]: 各轮返回的工具（已逐批写入 self.merge_engine；与已有工具相同的记录用于补全已有数据）
+        """
+        max_rounds = max(1, int(MAX_ROUNDS if max_rounds is None else max_rounds))
+        target_new_tools = int(TARGET_NEW_TOOLS if target_new_tools is None else target_new_tools)
+        min_round_yield = int(MIN_ROUND_YIELD if min_round_yield is None else min_round_yield)
+        time_budget = float(ROUND_TIME_BUDGET if time_budget is None else time_budget)
+        token_budget = int(ROUND_TOKEN_BUDGET if token_budget is None else token_budget)
+
+        # 已有目录只在这里写入一次；每轮的结果由 _finish_extraction 写入同一个引擎，引擎插入的记录即新工具
+        engine = self.merge_engine
+        if engine is None:
+            engine = self._start_merge([t for t in (existing_tools or []) if isinstance(t, dict)])
+
+        started = time.monotonic()
+        collected: List[Dict[str, Any]] = []
+        new_total = 0
+        self.round_stats = []
+        for round_no in range(1, max_rounds + 1):
+            round_started = time.monotonic()
+            tokens_before = self.meter.total_tokens
+            known_tools = engine.records()
+            existing_tool_names = [
+                t["name"].strip() for t in known_tools
+                if isinstance(t.get("name"), str) and t["name"].strip()
+            ]
+            returned = self._extract_new_tools(
+                content=content,
+                use_all_providers=use_all_providers,
+                existing_tool_names=existing_tool_names,
+                existing_tools=known_tools
+            )
+            # 只统计引擎新插入的记录，与已有目录或前几轮重复的不算产出
+            fresh = len(engine) - len(known_tools)
+            collected.extend(returned)
+            new_total += fresh
+
+            stats = {
+                "round": round_no,
+                "returned": len(returned),
+                "new_tools": fresh,
+                "tokens": self.meter.total_tokens - tokens_before,
+                "elapsed_seconds": round(time.monotonic() - round_started, 3)
+            }
+            self.round_stats.append(stats)
+            logger.info(
+                f"第 {round_no} 轮：返回 {stats['returned']} 个工具，新工具 {stats['new_tools']} 个，"
+                f"token {stats['tokens']}，耗时 {stats['elapsed_seconds']} 秒，累计新工具 {new_total} 个"
+            )
+
+            if round_no >= max_rounds:
+                break
+            if target_new_tools and new_total >= target_new_tools:
+                logger.info(f"已达到新工具目标数 {target_new_tools}，停止提取")
+                break
+            if fresh < min_round_yield:
+                logger.info(f"第 {round_no} 轮新工具数低于 {min_round_yield}，停止提取")
+                break
+            if time_budget and time.monotonic() - started >= time_budget:
+                logger.info(f"时间预算 {time_budget} 秒已用完，停止提取")
+                break
+            if token_budget and self.meter.total_tokens >= token_budget:
+                logger.info(f"token 预算 {token_budget} 已用完，停止提取")
+                break
+            if self.budget.exhausted():
+                logger.info("运行预算已用完，停止提取")
+                break
+        
+        return collected
+
+    def _extract_new_tools(
+        self,
+        content: str,
+        use_all_providers: bool,
+        existing_tool_names: List[str],
+        existing_tools: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """按提取模式分发到对应的提取流程"""
+        if self.extract_mode == "batch":
+            return self.batch_extract_tools(
+                content=content,
+                use_all_providers=use_all_providers,
+                existing_tools=existing_tools
+            )
+        if self.extract_mode == "sharded":
+            return self.sharded_extract_tools(
+                content=content,
+                use_all_providers=use_all_providers,
+                existing_tools=existing_tools
+            )
+        if self.extract_mode == "concurrent":
+            return asyncio.run(self.aextract_tools_with_ai(
+                content=content,
+                use_all_providers=use_all_providers,
+                existing_tool_names=existing_tool_names
+            ))
+        if self.extract_mode == "race":
+            return self.race_extract_tools(content=content, existing_tool_names=existing_tool_names)
+        if self.extract_mode == "stream":
+            all_tools = []
+            for provider_name in self._resolve_providers(use_all_providers):
+                try:
+                    all_tools.extend(self.stream_extract_tools(
+                        provider_name,
+                        content=content,
+                        existing_tool_names=existing_tool_names
+                    ))
+                except Exception as e:
+                    logger.exception(f"使用 {provider_name} 流式提取工具时出错: {str(e)}")
+            return self._finish_extraction(all_tools)
+        if self.extract_mode != "sequential":
+            logger.warning(f"未知的提取模式: {self.extract_mode}，使用 sequential")
+        return self.extract_tools_with_ai(
+            content=content,
+            use_all_providers=use_all_providers,
+            existing_tool_names=existing_tool_names
+        )
     
     # merge_with_ai 已废弃：不再使用 AI 做 merge
     
@@ -774,8 +1863,8 @@ class DataFetcher:
                     processed_tool["isActive"] = True
                 if "isFeatured" not in processed_tool:
                     processed_tool["isFeatured"] = False
-                if "tags" not in processed_tool:
-                    processed_tool["tags"] = []
+                # 标签折叠别名并去重（已有工具同样改写，见 config.yaml 的 tag_aliases；仍保存为字符串数组）
+                processed_tool["tags"] = self.tags.normalize(processed_tool.get("tags"))
                 if "developer" not in processed_tool:
                     processed_tool["developer"] = ""
                 if "pricing" not in processed_tool:
@@ -794,6 +1883,9 @@ class DataFetcher:
                 json.dump(processed_data, f, ensure_ascii=False, indent=2)
             
             logger.info(f"成功保存 {len(processed_data)} 条数据到 {TOOLS_FILE}")
+
+            # 标签词表写在 tools.json 旁边，失败不影响工具数据保存
+            self.tags.save(TAGS_FILE, processed_data)
             
             # 保存完成后，自动更新categories.json中的toolCount字段
             logger.info("开始更新categories.json中的toolCount字段...")
@@ -820,37 +1912,67 @@ class DataFetcher:
         Returns:
             bool: 是否执行成功
         """
+        self.budget.start()
+        self.journal = journal = self._open_journal()
+        merged = False
         try:
+            if journal is not None and journal.is_stage_complete("save"):
+                logger.info(f"运行 {journal.run_id} 已完成保存，无需重跑")
+                return True
+            
+            # 路由决定写入运行日志，恢复时使用相同的提供者（保证请求可重放）；
+            # 日志中的路由为空（当时没有可用提供者）时重新计算，否则恢复的运行不会发出任何请求
+            stored_route = journal.stage_data("route") if journal is not None else None
+            if stored_route:
+                self._routes[use_all_providers] = stored_route
+            else:
+                route = self._route_providers(use_all_providers)
+                if journal is not None and route:
+                    journal.complete_stage("route", route)
+            
             # 1. 加载已有数据
             logger.info("步骤1: 加载已有数据...")
             existing_data = self.load_tools()
             logger.info(f"已加载 {len(existing_data)} 条已有数据")
+            engine = self._start_merge(existing_data)
 
-            # 提取已有工具名称，用于让大模型侧过滤（避免重复生成）
-            existing_tool_names: List[str] = []
-            for t in existing_data:
-                if isinstance(t, dict) and isinstance(t.get("name"), str) and t["name"].strip():
-                    existing_tool_names.append(t["name"].strip())
-            
-            # 2. 使用AI提取新数据
-            logger.info("步骤2: 使用AI提取新数据...")
-            new_data = self.extract_tools_with_ai(
-                content=content,
-                use_all_providers=use_all_providers,
-                existing_tool_names=existing_tool_names
-            )
+            # 2. 使用AI提取新数据（已有工具名称用于让大模型侧过滤，避免重复生成）
+            if journal is not None and journal.is_stage_complete("extract"):
+                extracted = journal.stage_data("extract") or {}
+                new_data = extracted.get("tools") or []
+                self.round_stats = extracted.get("rounds") or []
+                engine.ingest(new_data)
+                logger.info("步骤2: 提取阶段已在运行日志中完成，直接恢复结果")
+            else:
+                logger.info("步骤2: 使用AI提取新数据...")
+                new_data = self.iterative_extract_tools(
+                    content=content,
+                    use_all_providers=use_all_providers,
+                    existing_tools=existing_data
+                )
+                # 因运行预算跳过了请求时不标记完成，下次以相同运行 ID 恢复时继续提取
+                if journal is not None and not self.budget.skipped_requests:
+                    journal.complete_stage("extract", {"tools": new_data, "rounds": self.round_stats})
             logger.info(f"提取到 {len(new_data)} 条新数据")
             
             # 3. 使用AI整合去重
             logger.info("步骤3: 本地整合去重（按工具名/URL，不使用AI）...")
-            merged_data = self.merge_datasets_locally(existing_data, new_data)
-            logger.info(f"整合后共 {len(merged_data)} 条数据")
+            # 已有目录与各批提取结果已在提取过程中写入同一个引擎，这里只取出结果
+            merged_data = self._collect_merge(engine, len(existing_data), len(new_data))
+            kept = self._record_kept_tools(merged_data)
+            merged = True
+            logger.info(f"整合后共 {len(merged_data)} 条数据，其中新工具 {kept} 条")
+            if journal is not None:
+                journal.complete_stage("merge", {"total": len(merged_data), "new_tools": kept})
             
             # 4. 保存数据
             logger.info("步骤4: 保存数据...")
             success = self.save_tools(merged_data)
+            log_cache_stats()
             
             if success:
+                if journal is not None:
+                    journal.complete_stage("save")
                 logger.info("数据提取和整合流程完成")
                 return True
             else:
@@ -860,6 +1982,33 @@ class DataFetcher:
         except Exception as e:
             logger.exception(f"执行流程失败: {str(e)}")
             return False
+        finally:
+            extra: Dict[str, Any] = {}
+            if self.round_stats:
+                extra["rounds"] = self.round_stats
+            if self.merge_stats:
+                extra["merge"] = self.merge_stats
+            if self.near_dup_stats:
+                extra["near_duplicates"] = self.near_dup_stats
+            self.merge_engine = None
+            route = self._routes.get(use_all_providers)
+            if route:
+                extra["routing"] = {"policy": self.router.policy, "providers": route}
+            # 计分板只吸收完整的新运行（恢复的运行中重放的响应不是真实请求）
+            if merged and (journal is None or not journal.resumed):
+                self._update_scoreboard()
+            if self.budget.enabled:
+                extra["budget"] = {
+                    "deadline_seconds": self.budget.deadline_seconds,
+                    "max_tokens": self.budget.max_tokens,
+                    "remaining_seconds": self.budget.remaining(),
+                    "skipped_requests": self.budget.skipped_requests
+                }
+            if journal is not None:
+                extra["journal"] = {"run_id": journal.run_id, "resumed": journal.resumed, "replayed": journal.replayed}
+                journal.close()
+                self.journal = None
+            self.meter.write_report(REPORT_FILE, extra=extra or None)
 
 
 if __name__ == "__main__":
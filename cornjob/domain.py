@@ -0,0 +1,229 @@
+"""
+注册域名模块
+使用随包分发的公共后缀列表（public_suffix.dat，离线，首次使用时一次性载入集合）把 URL 归约为
+注册域名（eTLD+1）+ 可选的产品路径，作为 URL 精确去重之外的二级去重键与 favicon 缓存键
+"""
+import logging
+import re
+import urllib.parse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, NamedTuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_SUFFIX_FILE = Path(__file__).parent / "public_suffix.dat"
+
+# 语言/地区代码路径段（/en、/zh-cn、/en-us）：跳过，取其后的路径段
+_LANGUAGE_SEGMENT = re.compile(r"^(?:en|zh|cn|ja|jp|ko|kr|fr|de|es|ru|pt|it|tw|hk)(?:[-_][a-z]{2,4})?$")
+# 带扩展名的页面（/clipdrop.html）：取文件名主干作为产品
+_PAGE_EXTENSION = re.compile(r"\.[a-z0-9]{2,5}$")
+# 首页类文件名：不算产品
+_INDEX_PAGES = {"index", "home", "default", "main"}
+# 通用容器路径段（/product/kling、/blog/llama-3）：作为前缀，与下一段一起构成产品
+_CONTAINER_SEGMENTS = {
+    "product", "products", "solution", "solutions", "platform", "platforms",
+    "service", "services", "feature", "features", "tools", "blog", "p"
+}
+_IPV4 = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+class PublicSuffixTable:
+    """公共后缀规则表
+
+    规则按公共后缀列表的语法分为三类：普通规则（com.cn）、通配规则（*.ck，存为 ck）与例外规则（!www.ck）；
+    查找时从最长的后缀开始逐级匹配，每个主机名只需 标签数 次集合查找
+    """
+
+    def __init__(self, rules: Iterable[str]):
+        """
+        编译规则
+
+        Args:
+            rules: 规则行（忽略注释与空行）
+        """
+        self._rules: Set[str] = set()
+        self._wildcards: Set[str] = set()
+        self._exceptions: Set[str] = set()
+        for line in rules:
+            rule = line.strip().split(" ", 1)[0].lower()
+            if not rule or rule.startswith("//"):
+                continue
+            for form in self._forms(rule.lstrip("!*.")):
+                if rule.startswith("!"):
+                    self._exceptions.add(form)
+                elif rule.startswith("*."):
+                    self._wildcards.add(form)
+                else:
+                    self._rules.add(form)
+
+    @staticmethod
+    def _forms(rule: str) -> Set[str]:
+        """规则的 Unicode 与 Punycode 两种写法（主机名可能以任一形式出现）"""
+        forms = {rule}
+        try:
+            forms.add(rule.encode("idna").decode("ascii"))
+        except UnicodeError:
+            pass
+        return forms
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PublicSuffixTable":
+        """从公共后缀列表文件载入"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f)
+
+    def __len__(self) -> int:
+        return len(self._rules) + len(self._wildcards) + len(self._exceptions)
+
+    def suffix_length(self, labels: list) -> int:
+        """
+        公共后缀占用的标签数
+
+        Args:
+            labels: 主机名按 . 拆分后的标签列表
+
+        Returns:
+            int: 公共后缀的标签数（未命中任何规则时按默认规则 * 计为 1）
+        """
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self._exceptions:
+                return len(labels) - i - 1
+            if candidate in self._rules:
+                return len(labels) - i
+            if i + 1 < len(labels) and ".".join(labels[i + 1:]) in self._wildcards:
+                return len(labels) - i
+        return 1
+
+    def registered_domain(self, host: str) -> str:
+        """
+        主机名的注册域名（公共后缀 + 一级标签）；主机名本身就是公共后缀、IP 或单标签时原样返回
+
+        Args:
+            host: 小写主机名
+
+        Returns:
+            str: 注册域名
+        """
+        if not host or _IPV4.match(host) or ":" in host:
+            return host
+        labels = host.split(".")
+        size = self.suffix_length(labels) + 1
+        return host if size > len(labels) else ".".join(labels[-size:])
+
+
+@lru_cache(maxsize=1)
+def get_public_suffix_table() -> PublicSuffixTable:
+    """载入随包分发的公共后缀列表（进程内只载入一次；文件缺失时退化为默认规则）"""
+    try:
+        table = PublicSuffixTable.from_file(PUBLIC_SUFFIX_FILE)
+        logger.debug(f"已载入公共后缀列表: {PUBLIC_SUFFIX_FILE}，规则 {len(table)} 条")
+        return table
+    except OSError as e:
+        logger.warning(f"无法读取公共后缀列表，注册域名按最后两级计算: {str(e)}")
+        return PublicSuffixTable(())
+
+
+@lru_cache(maxsize=65536)
+def registered_domain(host: str) -> str:
+    """主机名的注册域名（eTLD+1），结果按主机名缓存"""
+    return get_public_suffix_table().registered_domain(host.strip().rstrip(".").lower())
+
+
+class DomainKey(NamedTuple):
+    """二级去重键：注册域名 + 产品（子域名，或没有子域名时的 /首段路径；可为空）"""
+    domain: str
+    product: str
+
+    def __str__(self) -> str:
+        return f"{self.domain}|{self.product}" if self.product else self.domain
+
+
+@lru_cache(maxsize=65536)
+def domain_key(url: str) -> Optional[DomainKey]:
+    """
+    把 URL 归约为 注册域名 + 产品
+
+    产品为注册域名之下的子域名（去掉 www）加上路径产品（见 _path_product）：
+    https://www.wps.cn -> (wps.cn, "")，https://wps.cn/ai -> (wps.cn, "/ai")，
+    https://kimi.moonshot.cn -> (moonshot.cn, "kimi")，https://ai.meta.com/llama -> (meta.com, "ai/llama")
+
+    Args:
+        url: 工具 URL
+
+    Returns:
+        Optional[DomainKey]: 无法解析出主机名时为None
+    """
+    if not isinstance(url, str) or not url.strip():
+        return None
+    try:
+        parsed = urllib.parse.urlsplit(url.strip())
+        host = (parsed.hostname or "").rstrip(".")
+    except ValueError:
+        return None
+    if not host:
+        return None
+    domain = registered_domain(host)
+    sub = host[:-len(domain)].rstrip(".") if host != domain else ""
+    sub = ".".join(label for label in sub.split(".") if label and label != "www")
+    return DomainKey(domain, f"{sub}{_path_product(parsed.path)}")
+
+
+def _path_product(path: str) -> str:
+    """
+    路径中的产品：跳过语言代码段，带扩展名的页面取文件名主干（首页类不算），
+    通用容器段（/product、/blog 等）与下一段一起构成产品
+
+    /en-us/omniverse -> "/omniverse"，/clipdrop.html -> "/clipdrop"，/product/kling -> "/product/kling"，
+    /index.html -> ""
+    """
+    segments = [segment for segment in path.lower().split("/") if segment]
+    while segments and _LANGUAGE_SEGMENT.match(segments[0]):
+        segments.pop(0)
+    parts = []
+    for segment in segments:
+        stem = _PAGE_EXTENSION.sub("", segment)
+        if stem in _INDEX_PAGES:
+            break
+        parts.append(stem)
+        if stem not in _CONTAINER_SEGMENTS:
+            break
+    return f"/{'/'.join(parts)}" if parts else ""
+
+
+class DomainIndex:
+    """注册域名二级索引
+
+    命中规则：注册域名相同，且产品相同，或一方无产品而另一方为路径产品（www.wps.cn 与 wps.cn/ai）；
+    含子域名的产品（gemini.google.com、ai.meta.com/llama）只精确匹配，同一子域名下的不同路径不视为同一产品。
+    为避免多产品域名把不同产品串联合并，一方无产品的匹配只在该域名至多出现过一个路径产品时成立；
+    同一个键已登记时保留最先登记的记录
+    """
+
+    def __init__(self):
+        self._entries: Dict[DomainKey, Hashable] = {}
+        self._products: Dict[str, Set[str]] = {}
+
+    def find(self, key: Optional[DomainKey]) -> Optional[Hashable]:
+        """查找与 key 匹配的记录标识（不存在时为None）"""
+        if key is None:
+            return None
+        found = self._entries.get(key)
+        if found is not None:
+            return found
+        products = self._products.get(key.domain) or set()
+        if key.product:
+            if not key.product.startswith("/") or products:
+                # 子域名产品只精确匹配；域名下已有其他路径产品时，不再把新产品并入无产品的记录
+                return None
+            return self._entries.get(DomainKey(key.domain, ""))
+        return self._entries.get(DomainKey(key.domain, next(iter(products)))) if len(products) == 1 else None
+
+    def add(self, key: Optional[DomainKey], value: Hashable) -> None:
+        """登记 key 对应的记录标识（已登记的键保持指向最先登记的记录）"""
+        if key is None:
+            return
+        self._entries.setdefault(key, value)
+        if key.product.startswith("/"):
+            self._products.setdefault(key.domain, set()).add(key.product)
@@ -12,6 +12,7 @@ try:
     from .base import AIProvider
     from .config import ConfigManager
     from .providers import (
+        OpenAICompatibleProvider,
         DeepSeekProvider,
         SiliconFlowProvider,
         KimiProvider,
@@ -22,6 +23,7 @@ except (ImportError, ValueError):
     from base import AIProvider
     from config import ConfigManager
     from providers import (
+        OpenAICompatibleProvider,
         DeepSeekProvider,
         SiliconFlowProvider,
         KimiProvider,
@@ -37,13 +39,35 @@ class AIProviderFactory:
     """
     
     # 提供者类映射
+    # config.yaml 中其他条目可通过 type 字段指定实现类（如 type: openai_compatible）
     PROVIDER_CLASSES: Dict[str, type] = {
         "deepseek": DeepSeekProvider,
         "siliconflow": SiliconFlowProvider,
         "kimi": KimiProvider,
         "doubao": DoubaoProvider,
+        "openai_compatible": OpenAICompatibleProvider,
     }
     
+    @classmethod
+    def _resolve_provider_class(cls, provider_name: str) -> Optional[type]:
+        """
+        解析提供者对应的实现类
+        
+        优先按名称匹配内置类；否则读取 config.yaml 中该条目的 type 字段
+        
+        Args:
+            provider_name: 提供者名称（小写）
+        
+        Returns:
+            type: 实现类，无法解析时返回None
+        """
+        if provider_name in cls.PROVIDER_CLASSES:
+            return cls.PROVIDER_CLASSES[provider_name]
+        provider_yaml_config = ConfigManager._get_provider_config_from_yaml(provider_name)
+        if isinstance(provider_yaml_config, dict):
+            return cls.PROVIDER_CLASSES.get(str(provider_yaml_config.get("type", "")).lower())
+        return None
+    
     @classmethod
     def create_provider(
         cls, 
@@ -67,13 +91,16 @@ class AIProviderFactory:
         """
         provider_name = provider_name.lower()
         
-        if provider_name not in cls.PROVIDER_CLASSES:
+        provider_class = cls._resolve_provider_class(provider_name)
+        if provider_class is None:
             raise ValueError(
                 f"不支持的提供者: {provider_name}。"
-                f"支持的提供者: {', '.join(cls.PROVIDER_CLASSES.keys())}"
+                f"支持的提供者: {', '.join(cls.PROVIDER_CLASSES.keys())}，"
+                f"或在 config.yaml 中配置 type: openai_compatible 的条目"
             )
         
         # 如果没有提供api_key，尝试从配置中获取
+        require_api_key = True
         if api_key is None:
             config = ConfigManager.get_config(provider_name)
             if config is None:
@@ -84,14 +111,16 @@ class AIProviderFactory:
                     f"请设置环境变量 {env_key or '对应的环境变量'}"
                 )
             api_key = config.api_key
+            require_api_key = config.require_api_key
             if base_url is None:
                 base_url = config.base_url
         
-        if not api_key:
+        if not api_key and require_api_key:
             raise ValueError(f"{provider_name} 的API密钥不能为空")
         
-        # 获取提供者类并创建实例
-        provider_class = cls.PROVIDER_CLASSES[provider_name]
+        # 创建实例（OpenAI 兼容实现按条目名称读取各自的配置）
+        if issubclass(provider_class, OpenAICompatibleProvider):
+            return provider_class(api_key=api_key, base_url=base_url, provider_name=provider_name)
         return provider_class(api_key=api_key, base_url=base_url)
     
     @classmethod
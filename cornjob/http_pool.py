@@ -0,0 +1,66 @@
+"""
+HTTP连接池模块
+为AI提供者提供进程级共享的 keep-alive 连接池，避免每次请求都重新建立 TCP+TLS 连接
+"""
+import logging
+import threading
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 连接池默认参数（config.yaml 中 crawler.http_pool / providers.<name>.http_pool 可覆盖）
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 8
+
+# 进程级共享的 Session：键为 (提供者名称, 池参数)，同一进程内多次调用、多个 DataFetcher 复用
+_sessions: Dict[Tuple[str, int, int, bool], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(
+    name: str,
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    pool_block: bool = False
+) -> requests.Session:
+    """
+    获取（或创建）指定提供者的共享 Session
+
+    Args:
+        name: 提供者名称
+        pool_connections: 缓存的连接池数量（按 host 区分）
+        pool_maxsize: 每个连接池保留的最大连接数（应不小于并发线程数）
+        pool_block: 连接池满时是否阻塞等待空闲连接
+
+    Returns:
+        requests.Session: 线程间共享的 Session
+    """
+    key = (name, int(pool_connections), int(pool_maxsize), bool(pool_block))
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=key[1],
+                pool_maxsize=key[2],
+                pool_block=key[3]
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+            logger.debug(
+                f"创建 {name} 连接池，pool_connections: {key[1]}, "
+                f"pool_maxsize: {key[2]}, pool_block: {key[3]}"
+            )
+        return session
+
+
+def close_all_sessions() -> None:
+    """关闭所有共享 Session（进程退出前调用，释放连接）"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
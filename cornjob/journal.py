@@ -0,0 +1,167 @@
+"""
+运行日志模块
+以追加写入的 JSONL 记录一次运行的提示词、原始响应、解析出的工具与阶段完成情况，
+使用相同运行 ID 重跑时可从日志恢复：已应答的提供者请求直接重放，已完成的阶段直接跳过
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """追加写入的运行日志（线程安全）
+
+    每行一个事件：run（运行开始/恢复）、prompt、response、tools、stage。
+    打开已存在的日志时先重放全部事件，重建已应答请求与已完成阶段的索引
+    """
+
+    def __init__(self, path: Path, run_id: str):
+        """
+        初始化运行日志
+
+        Args:
+            path: 日志文件路径
+            run_id: 运行 ID
+        """
+        self.path = Path(path)
+        self.run_id = run_id
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._stages: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.replayed = 0  # 本次运行从日志重放的响应数
+        self.resumed = self.path.exists()
+        if self.resumed:
+            self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._append({"event": "run", "run_id": run_id, "resumed": self.resumed})
+        if self.resumed:
+            logger.info(
+                f"从运行日志恢复: {self.path}，已应答请求 {len(self._responses)} 个，"
+                f"已完成阶段: {list(self._stages) or '无'}"
+            )
+
+    def _load(self) -> None:
+        """重放已有日志；最后一行可能因进程中断而不完整，直接跳过"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过运行日志中不完整的行: {line[:100]}")
+                    continue
+                event = entry.get("event")
+                if event == "response" and entry.get("success"):
+                    self._responses[entry["key"]] = entry
+                elif event == "stage":
+                    self._stages[entry["stage"]] = entry.get("data")
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """追加一个事件并立即刷新到文件"""
+        entry["ts"] = round(time.time(), 3)
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    @staticmethod
+    def make_key(provider: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        生成请求键：提供者 + 提示词 + 其他请求参数（如续写的 messages）
+
+        Returns:
+            str: 请求键
+        """
+        raw = json.dumps(
+            {"provider": provider, "prompt": prompt, "options": options or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取已应答请求的响应记录（content / usage / model / finish_reason），不存在时返回None"""
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is not None:
+                self.replayed += 1
+            return entry
+
+    def record_prompt(self, key: str, provider: str, prompt: str) -> None:
+        """记录发出的提示词"""
+        self._append({"event": "prompt", "key": key, "provider": provider, "prompt": prompt})
+
+    def record_response(self, key: str, provider: str, response: Any) -> None:
+        """记录原始响应（AIResponse）"""
+        entry = {
+            "event": "response",
+            "key": key,
+            "provider": provider,
+            "success": response.success,
+            "content": response.content,
+            "usage": response.usage,
+            "model": response.model,
+            "finish_reason": response.finish_reason,
+            "error_message": response.error_message
+        }
+        self._append(entry)
+        if response.success:
+            with self._lock:
+                self._responses[key] = entry
+
+    def record_tools(self, provider: str, tools: List[Dict[str, Any]]) -> None:
+        """记录某次响应解析出的工具"""
+        self._append({"event": "tools", "provider": provider, "tools": tools})
+
+    def complete_stage(self, stage: str, data: Any = None) -> None:
+        """
+        记录阶段完成
+
+        Args:
+            stage: 阶段名称
+            data: 恢复该阶段所需的结果数据
+        """
+        self._append({"event": "stage", "stage": stage, "data": data})
+        with self._lock:
+            self._stages[stage] = data
+
+    def is_stage_complete(self, stage: str) -> bool:
+        """阶段是否已完成"""
+        with self._lock:
+            return stage in self._stages
+
+    def stage_data(self, stage: str) -> Any:
+        """已完成阶段记录的结果数据"""
+        with self._lock:
+            return self._stages.get(stage)
+
+    def close(self) -> None:
+        """关闭日志文件"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def prune_journals(directory: Path, keep: int) -> None:
+    """
+    只保留最近修改的 keep 个运行日志
+
+    Args:
+        directory: 日志目录
+        keep: 保留数量（<=0 表示不清理）
+    """
+    if keep <= 0 or not directory.exists():
+        return
+    journals = sorted(directory.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in journals[keep:]:
+        try:
+            path.unlink()
+        except OSError as e:
+            logger.warning(f"删除旧运行日志失败: {path}，{str(e)}")
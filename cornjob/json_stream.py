@@ -0,0 +1,137 @@
+"""
+增量 JSON 对象扫描模块
+从（可能被截断、夹杂代码块标记或说明文字的）模型输出中，逐个提取完整的顶层 JSON 对象
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 对象内部（字符串外）需要关注的字符
+_STRUCT_SPECIAL = re.compile(r'[{}"]')
+# 字符串内部需要关注的字符
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class JSONObjectStream:
+    """增量 JSON 对象扫描器
+
+    每次 feed 一段文本，返回其中新闭合的顶层对象（不嵌套在其他对象中的 {...}）。
+    数组括号、代码块标记和说明文字都被跳过，只跟踪对象深度与字符串状态，
+    因此整体是单遍线性扫描，且截断处之前的完整对象不会丢失。
+    """
+
+    def __init__(self):
+        self._depth = 0  # 当前对象的嵌套深度（0 表示不在对象内）
+        self._in_string = False
+        self._escape = False
+        self._parts: List[str] = []  # 当前未闭合对象已读入的文本片段
+        self.recovered = 0  # 成功解析的对象数
+        self.dropped = 0  # 无法解析或被截断的对象数
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        输入一段文本
+
+        Args:
+            chunk: 新到达的文本片段
+
+        Returns:
+            List[Dict[str, Any]]: 本次新闭合的对象列表
+        """
+        results: List[Dict[str, Any]] = []
+        if not chunk:
+            return results
+        pos = 0
+        n = len(chunk)
+        seg_start: Optional[int] = 0 if self._depth else None
+        while pos < n:
+            if self._depth == 0:
+                start = chunk.find("{", pos)
+                if start < 0:
+                    break
+                self._depth = 1
+                self._parts = []
+                seg_start = start
+                pos = start + 1
+                continue
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+            if self._in_string:
+                m = _STRING_SPECIAL.search(chunk, pos)
+                if m is None:
+                    break
+                pos = m.end()
+                if m.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+            m = _STRUCT_SPECIAL.search(chunk, pos)
+            if m is None:
+                break
+            pos = m.end()
+            ch = m.group()
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[seg_start:pos])
+                    seg_start = None
+                    obj = self._decode("".join(self._parts))
+                    self._parts = []
+                    if obj is not None:
+                        results.append(obj)
+        if self._depth and seg_start is not None:
+            self._parts.append(chunk[seg_start:])
+        return results
+
+    def close(self) -> None:
+        """结束输入；未闭合的对象计为丢弃（被截断）"""
+        if self._depth:
+            self.dropped += 1
+            logger.debug(f"丢弃被截断的对象，长度: {sum(len(p) for p in self._parts)}")
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._parts = []
+
+    @property
+    def pending(self) -> bool:
+        """是否存在尚未闭合的对象"""
+        return self._depth > 0
+
+    def _decode(self, text: str) -> Optional[Dict[str, Any]]:
+        """解析单个对象文本，失败时计为丢弃"""
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.dropped += 1
+            logger.debug(f"跳过无法解析的对象: {str(e)}")
+            return None
+        self.recovered += 1
+        return obj
+
+
+def iter_json_objects(chunks: Iterable[str], scanner: Optional[JSONObjectStream] = None) -> Iterator[Dict[str, Any]]:
+    """
+    从文本片段流中逐个产出完整的顶层 JSON 对象
+
+    Args:
+        chunks: 文本片段（例如流式响应的增量内容）
+        scanner: 可选的扫描器实例（用于在结束后读取统计信息）
+
+    Yields:
+        Dict[str, Any]: 每个闭合的对象
+    """
+    scanner = scanner or JSONObjectStream()
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    scanner.close()
@@ -0,0 +1,290 @@
+"""
+整合引擎模块
+单遍流式整合：一个身份索引同时覆盖 规范化 URL、注册域名 + 产品、规范化名称与近似重复（MinHash/LSH），
+已有记录与新批次按顺序增量写入，命中即就地合并（引擎拥有传入的记录，不做防御性拷贝），
+并按规则统计插入、合并与丢弃的数量；时间与内存均与记录数成线性关系
+"""
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .domain import DomainIndex, domain_key
+    from .near_dup import NearDuplicateIndex, host_of
+    from .normalize import KeyedRecord, canonical_url, key_record
+    from .tags import TagVocabulary
+except (ImportError, ValueError):
+    from domain import DomainIndex, domain_key
+    from near_dup import NearDuplicateIndex, host_of
+    from normalize import KeyedRecord, canonical_url, key_record
+    from tags import TagVocabulary
+
+logger = logging.getLogger(__name__)
+
+# 身份规则，按命中优先级排列
+MERGE_RULES = ("url", "domain", "name", "fuzzy")
+
+# 有效的分类 ID
+VALID_CATEGORY_IDS = range(1, 10)
+
+# 记录在统计中的近似重复样本数
+NEAR_DUP_SAMPLE_LIMIT = 50
+
+
+def _category_id(value: Any) -> Optional[int]:
+    """解析分类 ID（缺失或非法时为None）"""
+    try:
+        category_id = int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+    return category_id if category_id in VALID_CATEGORY_IDS else None
+
+
+def absorb_record(
+    target: Dict[str, Any],
+    incoming: Dict[str, Any],
+    tags: Optional[TagVocabulary] = None,
+    target_url_key: Optional[str] = None,
+    incoming_url_key: Optional[str] = None
+) -> bool:
+    """
+    把同一工具的另一条记录并入 target（就地修改），尽量保留更完整的信息
+
+    - 描述：更长者优先
+    - URL：规范化后更长（更具体）者优先
+    - categoryId：现有缺失/非法时使用新的
+    - tags：按词表合并去重，保持顺序
+    - developer / pricing：有值则补齐（不覆盖已有非空）
+
+    Args:
+        target: 保留的记录
+        incoming: 并入的记录
+        tags: 标签词表（为None时按原文去重）
+        target_url_key / incoming_url_key: 已算好的规范化 URL，为None时现算
+
+    Returns:
+        bool: target 是否改用了 incoming 的 URL
+    """
+    if len(str(incoming.get("description", "")).strip()) > len(str(target.get("description", "")).strip()):
+        target["description"] = incoming.get("description", "")
+
+    existing_url = canonical_url(str(target.get("url", ""))) if target_url_key is None else target_url_key
+    incoming_url = canonical_url(str(incoming.get("url", ""))) if incoming_url_key is None else incoming_url_key
+    url_changed = bool(incoming_url) and (not existing_url or len(incoming_url) >= len(existing_url))
+    if url_changed:
+        target["url"] = incoming.get("url", "")
+
+    if _category_id(target.get("categoryId")) is None:
+        incoming_category = _category_id(incoming.get("categoryId"))
+        if incoming_category is not None:
+            target["categoryId"] = incoming_category
+
+    if tags is not None:
+        target["tags"] = tags.merge(target.get("tags"), incoming.get("tags"))
+    else:
+        target["tags"] = list(dict.fromkeys(
+            tag.strip()
+            for tag_list in (target.get("tags"), incoming.get("tags")) if isinstance(tag_list, list)
+            for tag in tag_list if isinstance(tag, str) and tag.strip()
+        ))
+
+    for field in ("developer", "pricing"):
+        if not str(target.get(field, "")).strip() and str(incoming.get(field, "")).strip():
+            target[field] = incoming.get(field, "")
+    return url_changed
+
+
+class MergeEngine:
+    """单遍整合引擎
+
+    每条记录依次按 URL -> 注册域名 + 产品 -> 名称 -> 近似重复 查找已有记录，命中即并入（先出现的记录保留），
+    否则作为新记录插入；无论是否命中，记录的 URL / 名称键都登记到命中的位置，
+    之后出现的任一别名都能找到同一条记录
+
+    注册域名规则只用于新记录匹配已有目录（catalog=True 写入的记录），已有目录中的两条记录之间不按域名合并；
+    两条记录都带 URL 时，名称规则只在新记录匹配已有目录、或两者注册域名相同时成立
+    （已有目录中同名的 github.com/features/copilot 与 copilot.microsoft.com 不合并）
+    """
+
+    def __init__(
+        self,
+        tags: Optional[TagVocabulary] = None,
+        domain_dedupe: bool = False,
+        near_dup_mode: str = "off",
+        near_dup_index: Optional[NearDuplicateIndex] = None
+    ):
+        """
+        初始化整合引擎
+
+        Args:
+            tags: 标签词表（合并标签时使用）
+            domain_dedupe: 是否启用注册域名 + 产品规则
+            near_dup_mode: off（关闭）/ flag（只记录近似重复）/ merge（近似重复也合并）
+            near_dup_index: 近似重复索引（mode 不为 off 时使用，为None时按默认参数创建）
+        """
+        self.tags = tags
+        self.domain_dedupe = domain_dedupe
+        self.near_dup_mode = (near_dup_mode or "off").strip().lower()
+        if self.near_dup_mode not in {"flag", "merge"}:
+            self.near_dup_mode = "off"
+        self._near = None if self.near_dup_mode == "off" else (near_dup_index or NearDuplicateIndex())
+        self._records: List[KeyedRecord] = []
+        self._by_url: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+        self._by_domain = DomainIndex()  # 只登记已有目录中的记录
+        self._catalog_slots: Set[int] = set()
+        # 近似重复索引中的条目 -> 记录位置（合并进来的记录也登记特征，保证传递性）
+        self._fuzzy_slots: List[int] = []
+        self.ingested = 0
+        self.inserted = 0
+        self.merged: Counter = Counter()
+        self.dropped: Counter = Counter()
+        self.near_dup_pairs = 0
+        self.near_dup_samples: List[Dict[str, Any]] = []
+        self.seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def ingest(self, records: Iterable[Any], catalog: bool = False) -> int:
+        """
+        增量写入一批记录（记录会被就地修改，调用方不应再使用传入的字典）
+
+        Args:
+            records: 工具记录（非字典的条目计为丢弃）
+            catalog: 是否为已有目录中的记录（tools.json），应先于新记录写入
+
+        Returns:
+            int: 本批新插入的记录数
+        """
+        started = time.monotonic()
+        before = self.inserted
+        for record in records:
+            self.ingested += 1
+            if not isinstance(record, dict):
+                self.dropped["invalid"] += 1
+                continue
+            self.add(key_record(record), catalog)
+        self.seconds += time.monotonic() - started
+        return self.inserted - before
+
+    def add(self, item: KeyedRecord, catalog: bool = False) -> Optional[int]:
+        """
+        写入一条带键记录
+
+        Args:
+            item: 带键记录
+            catalog: 是否为已有目录中的记录
+
+        Returns:
+            Optional[int]: 记录所在（或并入）的位置；既没有 URL 也没有名称时丢弃并返回None
+        """
+        if not item.url_key and not item.name_key:
+            self.dropped["no_identity"] += 1
+            logger.warning("跳过无效工具（无可用URL且名称不可用）")
+            return None
+        key = domain_key(item.url_key) if self.domain_dedupe and item.url_key else None
+        slot, rule = self._find(item, key, catalog)
+
+        if self._near is not None and rule is None:
+            # 未精确命中的记录才做近似重复查询；查询的同时登记特征（并入的记录也登记，保证传递性）
+            matches = self._near.match(len(self._fuzzy_slots), item.name_key, host_of(item.url_key) or "")
+            if matches:
+                self.near_dup_pairs += 1
+                match_slot = self._fuzzy_slots[matches[0][0]]
+                if len(self.near_dup_samples) < NEAR_DUP_SAMPLE_LIMIT:
+                    self.near_dup_samples.append({
+                        "kept": self._records[match_slot].record.get("name"),
+                        "duplicate": item.record.get("name"),
+                        "similarity": round(matches[0][1], 4)
+                    })
+                if self.near_dup_mode == "merge":
+                    slot, rule = match_slot, "fuzzy"
+            self._fuzzy_slots.append(len(self._records) if slot is None else slot)
+
+        if slot is None:
+            slot = len(self._records)
+            self._records.append(item)
+            self.inserted += 1
+            if catalog:
+                self._catalog_slots.add(slot)
+        else:
+            self._absorb(slot, item)
+            self.merged[rule] += 1
+        self._register(item, key, slot)
+        return slot
+
+    def _find(self, item: KeyedRecord, key: Any, catalog: bool) -> Tuple[Optional[int], Optional[str]]:
+        """按 URL -> 注册域名 + 产品 -> 名称 的顺序查找已有记录（已有目录中的记录不走注册域名规则）"""
+        if item.url_key:
+            slot = self._by_url.get(item.url_key)
+            if slot is not None:
+                return slot, "url"
+            slot = None if catalog else self._by_domain.find(key)
+            if slot is not None:
+                return slot, "domain"
+        if item.name_key:
+            slot = self._by_name.get(item.name_key)
+            if slot is not None and self._name_match_allowed(item, slot, catalog):
+                return slot, "name"
+        return None, None
+
+    def _name_match_allowed(self, item: KeyedRecord, slot: int, catalog: bool) -> bool:
+        """名称命中是否成立：任一方没有 URL、新记录匹配已有目录、或两者注册域名相同"""
+        kept_url = self._records[slot].url_key
+        if not item.url_key or not kept_url:
+            return True
+        if not catalog and slot in self._catalog_slots:
+            return True
+        item_domain = domain_key(item.url_key)
+        kept_domain = domain_key(kept_url)
+        return item_domain is not None and kept_domain is not None and item_domain.domain == kept_domain.domain
+
+    def _absorb(self, slot: int, item: KeyedRecord) -> None:
+        """把记录并入 slot 处的记录（保留记录的名称键不变，URL 键随采用的 URL 更新）"""
+        kept = self._records[slot]
+        if absorb_record(kept.record, item.record, self.tags, kept.url_key, item.url_key):
+            self._records[slot] = kept._replace(url_key=item.url_key)
+
+    def _register(self, item: KeyedRecord, key: Any, slot: int) -> None:
+        """把记录的各个身份键指向 slot（已登记的键保持指向最先出现的记录）"""
+        if item.url_key:
+            self._by_url.setdefault(item.url_key, slot)
+            if slot in self._catalog_slots:
+                self._by_domain.add(key, slot)
+        if item.name_key:
+            self._by_name.setdefault(item.name_key, slot)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """整合结果（按首次出现的顺序）"""
+        return [item.record for item in self._records]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        整合统计
+
+        Returns:
+            Dict[str, Any]: ingested / inserted / merged（按规则）/ dropped（按原因）/ total / seconds
+        """
+        return {
+            "ingested": self.ingested,
+            "inserted": self.inserted,
+            "merged": {rule: self.merged.get(rule, 0) for rule in MERGE_RULES},
+            "dropped": dict(self.dropped),
+            "total": len(self._records),
+            "seconds": round(self.seconds, 3)
+        }
+
+    def near_dup_stats(self) -> Dict[str, Any]:
+        """近似重复检测结果（mode 为 off 时为空字典）"""
+        if self._near is None:
+            return {}
+        return {
+            "mode": self.near_dup_mode,
+            "threshold": self._near.threshold,
+            "pairs": self.near_dup_pairs,
+            "removed": self.merged.get("fuzzy", 0),
+            "seconds": round(self.seconds, 3),
+            "samples": self.near_dup_samples
+        }
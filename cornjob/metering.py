@@ -0,0 +1,238 @@
+"""
+用量计量模块
+按 提供者/模型 汇总请求数、token 用量、延迟、解析出的工具数与最终保留的新工具数，
+并根据 config.yaml 中的单价计算费用，生成每次运行的 JSON 报告
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 每个提供者保留的最近请求耗时样本数（用于延迟分位数）
+LATENCY_SAMPLE_LIMIT = 500
+
+
+@dataclass
+class ModelUsage:
+    """单个 提供者/模型 的累计用量"""
+    provider: str
+    model: str
+    requests: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    latency_seconds: float = 0.0
+    tools_parsed: int = 0
+    parsed_responses: int = 0
+    objects_dropped: int = 0
+    new_tools_kept: int = 0
+    cost: float = 0.0
+
+
+class UsageMeter:
+    """用量计量器（线程安全）"""
+
+    def __init__(self, pricing: Optional[Dict[str, Dict[str, Any]]] = None, currency: str = "CNY"):
+        """
+        初始化计量器
+
+        Args:
+            pricing: 提供者名称 -> {模型名或 default -> {input, output, cached_input}}，单价为每百万 token；
+                cached_input 为命中前缀缓存的输入单价，未配置时按 input 计
+            currency: 货币单位（仅用于报告展示）
+        """
+        self.pricing = pricing or {}
+        self.currency = currency
+        self.started_at = time.time()
+        self._usage: Dict[Tuple[str, str], ModelUsage] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: str, model: Optional[str]) -> ModelUsage:
+        """获取（或创建）累计项（调用方持有锁）"""
+        key = (provider, model or "unknown")
+        usage = self._usage.get(key)
+        if usage is None:
+            usage = ModelUsage(provider=key[0], model=key[1])
+            self._usage[key] = usage
+        return usage
+
+    def _sample_latency(self, provider: str, latency: float) -> None:
+        """记录一次实际请求的耗时样本（调用方持有锁）"""
+        samples = self._latencies.get(provider)
+        if samples is None:
+            samples = self._latencies[provider] = deque(maxlen=LATENCY_SAMPLE_LIMIT)
+        samples.append(latency)
+
+    def _price(self, provider: str, model: str) -> Dict[str, float]:
+        """查找单价：先按模型名，再按 default"""
+        table = self.pricing.get(provider) or {}
+        price = table.get(model) or table.get("default") or {}
+        return price if isinstance(price, dict) else {}
+
+    def record_response(self, provider: str, response: Any) -> None:
+        """
+        记录一次非流式请求的结果
+
+        Args:
+            provider: 提供者名称
+            response: AIResponse 对象
+        """
+        usage_info = response.usage or {}
+        prompt_tokens = int(usage_info.get("prompt_tokens") or 0)
+        completion_tokens = int(usage_info.get("completion_tokens") or 0)
+        with self._lock:
+            usage = self._get(provider, response.model)
+            usage.requests += 1
+            if not response.success:
+                usage.errors += 1
+            if response.latency:
+                usage.latency_seconds += response.latency
+            if response.from_cache:
+                # 缓存命中不产生费用，也不计入 token 用量与延迟样本
+                usage.cache_hits += 1
+                return
+            if response.latency:
+                self._sample_latency(provider, response.latency)
+            cached_tokens = min(int(getattr(response, "cached_tokens", 0) or 0), prompt_tokens)
+            usage.prompt_tokens += prompt_tokens
+            usage.cached_tokens += cached_tokens
+            usage.completion_tokens += completion_tokens
+            price = self._price(provider, usage.model)
+            input_price = float(price.get("input", 0))
+            usage.cost += (
+                (prompt_tokens - cached_tokens) * input_price
+                + cached_tokens * float(price.get("cached_input", input_price))
+                + completion_tokens * float(price.get("output", 0))
+            ) / 1_000_000
+
+    def record_stream(self, provider: str, model: Optional[str], latency: float, success: bool) -> None:
+        """记录一次流式请求（流式响应不返回 usage，只统计次数与耗时）"""
+        with self._lock:
+            usage = self._get(provider, model)
+            usage.requests += 1
+            usage.latency_seconds += latency
+            self._sample_latency(provider, latency)
+            if not success:
+                usage.errors += 1
+
+    def record_tools(self, provider: str, model: Optional[str], parsed: int, dropped: int = 0) -> None:
+        """记录某次响应解析出的有效工具数，以及因截断或格式错误丢弃的 JSON 对象数"""
+        with self._lock:
+            usage = self._get(provider, model)
+            usage.tools_parsed += parsed
+            if parsed:
+                usage.parsed_responses += 1
+            usage.objects_dropped += dropped
+
+    def record_kept(self, provider: str, model: Optional[str], count: int = 1) -> None:
+        """记录整合去重后最终保留的新工具数"""
+        with self._lock:
+            self._get(provider, model).new_tools_kept += count
+
+    def latency_samples(self, provider: str) -> List[float]:
+        """某个提供者本次运行的请求耗时样本（不含缓存命中）"""
+        with self._lock:
+            return list(self._latencies.get(provider, ()))
+
+    def provider_usage(self) -> Dict[str, Dict[str, Any]]:
+        """
+        按提供者汇总（合并各模型）的用量
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 提供者名称 -> 数值字段之和（字段同 ModelUsage）
+        """
+        with self._lock:
+            rows = [asdict(u) for u in self._usage.values()]
+        summary: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            provider = row.pop("provider")
+            row.pop("model")
+            total = summary.setdefault(provider, dict.fromkeys(row, 0))
+            for key, value in row.items():
+                total[key] += value
+        return summary
+
+    @property
+    def total_tokens(self) -> int:
+        """本次运行已消耗的总 token 数"""
+        with self._lock:
+            return sum(u.prompt_tokens + u.completion_tokens for u in self._usage.values())
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成报告
+
+        Returns:
+            Dict[str, Any]: 包含各 提供者/模型 明细与汇总的报告
+        """
+        with self._lock:
+            rows = [asdict(u) for u in self._usage.values()]
+        totals: Dict[str, Any] = {
+            "requests": 0, "errors": 0, "cache_hits": 0, "prompt_tokens": 0, "cached_tokens": 0,
+            "completion_tokens": 0, "tools_parsed": 0, "parsed_responses": 0, "objects_dropped": 0, "new_tools_kept": 0, "cost": 0.0
+        }
+        for row in rows:
+            latency = row["latency_seconds"]
+            row["total_tokens"] = row["prompt_tokens"] + row["completion_tokens"]
+            row["prompt_cache_hit_ratio"] = round(row["cached_tokens"] / row["prompt_tokens"], 4) if row["prompt_tokens"] else 0.0
+            row["avg_latency_seconds"] = round(latency / row["requests"], 3) if row["requests"] else 0.0
+            row["tokens_per_second"] = round(row["completion_tokens"] / latency, 2) if latency else 0.0
+            row["new_tools_per_second"] = round(row["new_tools_kept"] / latency, 4) if latency else 0.0
+            row["new_tools_per_unit_cost"] = round(row["new_tools_kept"] / row["cost"], 2) if row["cost"] else None
+            row["latency_seconds"] = round(latency, 3)
+            row["cost"] = round(row["cost"], 6)
+            for key in totals:
+                totals[key] += row[key]
+        totals["cost"] = round(totals["cost"], 6)
+        totals["prompt_cache_hit_ratio"] = (
+            round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+        )
+        finished_at = time.time()
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "finished_at": datetime.fromtimestamp(finished_at).isoformat(timespec="seconds"),
+            "duration_seconds": round(finished_at - self.started_at, 3),
+            "currency": self.currency,
+            "totals": totals,
+            "providers": rows
+        }
+
+    def write_report(self, path: Path, extra: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        将报告写入 JSON 文件
+
+        Args:
+            path: 报告文件路径
+            extra: 额外写入报告的字段
+
+        Returns:
+            bool: 是否写入成功
+        """
+        try:
+            report = self.report()
+            if extra:
+                report.update(extra)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            totals = report["totals"]
+            logger.info(
+                f"计量报告已写入 {path}：请求 {totals['requests']} 次，"
+                f"token {totals['prompt_tokens'] + totals['completion_tokens']}"
+                f"（前缀缓存命中 {totals['cached_tokens']}），"
+                f"新工具 {totals['new_tools_kept']} 个，费用 {totals['cost']} {self.currency}"
+            )
+            return True
+        except Exception as e:
+            logger.exception(f"写入计量报告失败: {str(e)}")
+            return False
@@ -0,0 +1,226 @@
+"""
+近似重复检测模块
+对规范化工具名的字符 n-gram 与 URL 主机名做 MinHash 签名，用 LSH 分桶找出候选对，
+再以精确 Jaccard 相似度复核；每条记录只与同桶记录比较，整体为近线性复杂度；
+既可全部加入后批量找出近似重复对（pairs），也可逐条增量查询（match）
+"""
+import hashlib
+import logging
+import struct
+from collections import defaultdict
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 一次 blake2b（64 字节摘要）产出 16 个 32 位哈希值
+_HASHES_PER_DIGEST = 16
+_DIGEST_FORMAT = struct.Struct("<16I")
+
+
+def make_shingles(name_key: str, host: str = "", ngram: int = 3) -> FrozenSet[str]:
+    """
+    生成记录的特征集合：规范化名称的字符 n-gram + 主机名
+
+    Args:
+        name_key: 规范化后的工具名
+        host: URL 主机名（不含 www.）
+        ngram: n-gram 长度（名称短于 n 时整个名称作为一个特征）
+
+    Returns:
+        FrozenSet[str]: 特征集合
+    """
+    shingles: Set[str] = set()
+    if name_key:
+        if len(name_key) <= ngram:
+            shingles.add(name_key)
+        else:
+            shingles.update(name_key[i:i + ngram] for i in range(len(name_key) - ngram + 1))
+    if host:
+        shingles.add(f"@{host}")
+    return frozenset(shingles)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """精确 Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH 近似重复索引
+
+    num_perm 个哈希函数组成签名，分成 bands 段（每段 num_perm / bands 行）；
+    任意一段完全相同的两条记录成为候选对。Jaccard 为 s 的两条记录成为候选的概率为
+    1 - (1 - s^r)^b，阈值附近约为 (1/b)^(1/r)
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 24,
+        bands: int = 6,
+        ngram: int = 3,
+        max_bucket: int = 64,
+        seed: int = 1
+    ):
+        """
+        初始化索引
+
+        Args:
+            threshold: 判定为近似重复的精确 Jaccard 相似度下限
+            num_perm: 签名长度（哈希函数个数），需为 bands 的整数倍
+            bands: LSH 分段数
+            ngram: 名称字符 n-gram 长度
+            max_bucket: 单个桶最多登记的记录数（防止常见片段导致平方级比较；桶满后新记录不再进入该桶，也不与其比较）
+            seed: 哈希参数的随机种子（保证多次运行结果一致）
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必须是 bands ({bands}) 的整数倍")
+        self.threshold = float(threshold)
+        self.num_perm = int(num_perm)
+        self.bands = int(bands)
+        self.rows = self.num_perm // self.bands
+        self.ngram = int(ngram)
+        self.max_bucket = int(max_bucket)
+        # 每 16 个哈希函数共用一个以 (种子, 序号) 为盐的 blake2b，保证多次运行结果一致
+        self._salts = [
+            f"{seed}:{i}".encode()[:16]
+            for i in range(-(-self.num_perm // _HASHES_PER_DIGEST))
+        ]
+        # 特征 -> 各哈希函数的取值（同一特征在大量记录中重复出现，只计算一次）
+        self._hash_memo: Dict[str, Tuple[int, ...]] = {}
+        self._shingles: Dict[Hashable, FrozenSet[str]] = {}
+        self._order: Dict[Hashable, int] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[Hashable]] = defaultdict(list)
+        self.overflowed = 0  # 因桶已满而没有登记的 (记录, 桶) 次数
+
+    def _hashes(self, shingle: str) -> Tuple[int, ...]:
+        """特征在全部哈希函数下的取值（带缓存）"""
+        values = self._hash_memo.get(shingle)
+        if values is None:
+            data = shingle.encode("utf-8")
+            values = ()
+            for salt in self._salts:
+                values += _DIGEST_FORMAT.unpack(hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+            values = values[:self.num_perm]
+            self._hash_memo[shingle] = values
+        return values
+
+    def signature(self, shingles: FrozenSet[str]) -> List[int]:
+        """MinHash 签名：每个哈希函数在所有特征上的最小值"""
+        memo = self._hash_memo
+        return list(map(min, zip(*[memo.get(s) or self._hashes(s) for s in shingles])))
+
+    def add(self, key: Hashable, name_key: str, host: str = "") -> bool:
+        """
+        加入一条记录
+
+        Args:
+            key: 记录标识（如在列表中的下标）
+            name_key: 规范化后的工具名
+            host: URL 主机名
+
+        Returns:
+            bool: 是否加入（没有任何特征时不加入）
+        """
+        shingles = make_shingles(name_key, host, self.ngram)
+        if not shingles:
+            return False
+        self._insert(key, shingles, self._bucket_keys(shingles))
+        return True
+
+    def _bucket_keys(self, shingles: FrozenSet[str]) -> List[Tuple[int, Tuple[int, ...]]]:
+        """把签名按 rows 个一组切成 bands 段，每段对应一个桶"""
+        return list(enumerate(zip(*[iter(self.signature(shingles))] * self.rows)))
+
+    def _insert(self, key: Hashable, shingles: FrozenSet[str], bucket_keys: List[Tuple[int, Tuple[int, ...]]]) -> None:
+        """登记记录的特征与所在桶（已满的桶不再追加，内存与比较次数都有上界）"""
+        self._shingles[key] = shingles
+        self._order.setdefault(key, len(self._order))
+        buckets = self._buckets
+        max_bucket = self.max_bucket
+        for bucket_key in bucket_keys:
+            members = buckets[bucket_key]
+            if len(members) < max_bucket:
+                members.append(key)
+            else:
+                self.overflowed += 1
+
+    def match(self, key: Hashable, name_key: str, host: str = "", add: bool = True) -> List[Tuple[Hashable, float]]:
+        """
+        增量查询：找出已加入的记录中与该记录近似重复的，再（可选）把它加入索引
+
+        Args:
+            key: 记录标识
+            name_key: 规范化后的工具名
+            host: URL 主机名
+            add: 查询后是否加入索引
+
+        Returns:
+            List[Tuple[Hashable, float]]: (已加入的记录, Jaccard 相似度)，按相似度从高到低、加入顺序排列
+        """
+        shingles = make_shingles(name_key, host, self.ngram)
+        if not shingles:
+            return []
+        bucket_keys = self._bucket_keys(shingles)
+        candidates: Set[Hashable] = set()
+        for bucket_key in bucket_keys:
+            members = self._buckets.get(bucket_key)
+            # 与 pairs 一致：桶内只登记前 max_bucket 条记录，已满的桶不再参与比较
+            if members and len(members) < self.max_bucket:
+                candidates.update(members)
+        found = []
+        size = len(shingles)
+        threshold = self.threshold
+        for other in candidates:
+            other_shingles = self._shingles[other]
+            # Jaccard 不超过 较小集合 / 较大集合，大小相差悬殊的候选直接跳过
+            other_size = len(other_shingles)
+            if min(size, other_size) < threshold * max(size, other_size):
+                continue
+            similarity = jaccard(shingles, other_shingles)
+            if similarity >= self.threshold:
+                found.append((other, similarity))
+        if len(found) > 1:
+            found.sort(key=lambda m: (-m[1], self._order[m[0]]))
+        if add:
+            self._insert(key, shingles, bucket_keys)
+        return found
+
+    def pairs(self) -> List[Tuple[Hashable, Hashable, float]]:
+        """
+        找出所有近似重复对
+
+        Returns:
+            List[Tuple[Hashable, Hashable, float]]: (先加入的记录, 后加入的记录, Jaccard 相似度)，按加入顺序排列
+        """
+        order = self._order
+        checked: Set[Tuple[Hashable, Hashable]] = set()
+        found: List[Tuple[Hashable, Hashable, float]] = []
+        for members in self._buckets.values():
+            if len(members) < 2:
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pair = (a, b) if order[a] < order[b] else (b, a)
+                    if pair in checked:
+                        continue
+                    checked.add(pair)
+                    similarity = jaccard(self._shingles[a], self._shingles[b])
+                    if similarity >= self.threshold:
+                        found.append((pair[0], pair[1], similarity))
+        if self.overflowed:
+            logger.debug(f"近似重复检测：{self.overflowed} 次因桶已满（{self.max_bucket} 条）未登记，这些组合不比较")
+        found.sort(key=lambda p: (order[p[0]], order[p[1]]))
+        return found
+
+
+def host_of(url: str) -> Optional[str]:
+    """从（已规范化的）URL 取主机名，去掉 www. 前缀与端口"""
+    if not url or "://" not in url:
+        return None
+    host = url.split("://", 1)[1].split("/", 1)[0].split("?", 1)[0]
+    host = host.rsplit("@", 1)[-1].split(":", 1)[0].lower()
+    return host[4:] if host.startswith("www.") else host or None
@@ -0,0 +1,112 @@
+"""
+规范化模块
+工具名去重键与 URL 规范化：预编译正则，非 ASCII 输入先做 NFKC 折叠（全角字母/数字/标点转半角）；
+单次调用走 LRU 缓存，批量处理时每条记录只计算一次，键随记录一起传递（KeyedRecord）
+"""
+import re
+import unicodedata
+import urllib.parse
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+# 单次调用缓存的条目数（覆盖十万级工具目录的名称与 URL）
+NORMALIZE_CACHE_SIZE = 262144
+
+# 保留字母数字与中文，其余视为分隔符（NFKC 折叠后全角标点已转为半角，中文标点仍需列出）
+_NAME_SEPARATORS = re.compile(r"[\s\-_·•\.\,，/\\\(\)\[\]\{\}<>:：;；'\"“”‘’`~!@#$%^&*+=?|]+")
+
+
+def fold_text(value: str) -> str:
+    """NFKC 折叠（全角字符转半角、兼容字符转标准形式）；纯 ASCII 文本原样返回"""
+    return value if value.isascii() else unicodedata.normalize("NFKC", value)
+
+
+def _compute_name_key(name: str) -> str:
+    """计算工具名去重键：NFKC 折叠、小写、去除空白与常见标点"""
+    value = fold_text(name.strip()).lower()
+    if not value:
+        return ""
+    return _NAME_SEPARATORS.sub("", value)
+
+
+def _compute_canonical_url(url: str) -> str:
+    """计算规范化 URL：NFKC 折叠、host 小写、去掉末尾 / 与 fragment（保留 query）"""
+    raw = fold_text(url.strip())
+    if not raw:
+        return ""
+    try:
+        parsed = urllib.parse.urlparse(raw)
+        if not parsed.scheme or not parsed.netloc:
+            return raw.rstrip("/")
+        # 保留 query（有些产品页区分 query），但去掉 fragment
+        return urllib.parse.urlunparse(
+            (parsed.scheme, parsed.netloc.lower(), parsed.path.rstrip("/"), "", parsed.query, "")
+        )
+    except Exception:
+        return raw.rstrip("/")
+
+
+_cached_name_key = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_compute_name_key)
+_cached_canonical_url = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_compute_canonical_url)
+
+
+def name_key(name: Any) -> str:
+    """
+    工具名去重键（带 LRU 缓存）
+
+    Args:
+        name: 工具名（非字符串时返回空字符串）
+
+    Returns:
+        str: 去重键，如 "Chat GPT" / "ＣｈａｔＧＰＴ" -> "chatgpt"
+    """
+    return _cached_name_key(name) if isinstance(name, str) else ""
+
+
+def canonical_url(url: Any) -> str:
+    """
+    规范化 URL（带 LRU 缓存），用于更稳定地比较 URL
+
+    Args:
+        url: 工具 URL（非字符串时返回空字符串；补全 scheme 不在这里处理，上游要求必须 https）
+
+    Returns:
+        str: 规范化后的 URL
+    """
+    return _cached_canonical_url(url) if isinstance(url, str) else ""
+
+
+def cache_info() -> Dict[str, Any]:
+    """两个 LRU 缓存的命中统计"""
+    return {"name_key": _cached_name_key.cache_info()._asdict(), "canonical_url": _cached_canonical_url.cache_info()._asdict()}
+
+
+def clear_cache() -> None:
+    """清空 LRU 缓存"""
+    _cached_name_key.cache_clear()
+    _cached_canonical_url.cache_clear()
+
+
+class KeyedRecord(NamedTuple):
+    """携带去重键的工具记录（键不写入记录本身，tools.json 的结构不变）"""
+    record: Dict[str, Any]
+    name_key: str
+    url_key: str
+
+
+def key_record(record: Dict[str, Any]) -> KeyedRecord:
+    """为单条记录计算去重键"""
+    return KeyedRecord(record, name_key(str(record.get("name", ""))), canonical_url(str(record.get("url", ""))))
+
+
+def key_records(records: Iterable[Any]) -> List[KeyedRecord]:
+    """
+    批量计算去重键（跳过非字典记录）；同一名称/URL 在本批或之前的阶段（如组装提示词）算过时直接命中缓存
+
+    Args:
+        records: 工具记录
+
+    Returns:
+        List[KeyedRecord]: 与输入顺序一致的带键记录
+    """
+    return [key_record(record) for record in records if isinstance(record, dict)]
@@ -0,0 +1,147 @@
+"""
+提示词组装模块
+按模型的 token 预算组装提取提示词：固定指令优先，其次是内容，剩余预算用于已有工具排除列表
+
+布局为 固定前缀 + 内容 + 已有工具列表，前缀原样输出（不做格式化），保证多次请求间逐字节相同，
+便于命中供应商的提示词前缀缓存
+"""
+import logging
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# 处理导入路径，支持直接运行和作为模块导入
+try:
+    # 先尝试相对导入（作为模块导入时）
+    from .tokens import estimate_tokens
+except (ImportError, ValueError):
+    # 相对导入失败时，使用绝对导入（直接运行时）
+    sys.path.insert(0, str(Path(__file__).parent))
+    from tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 未声明 token 预算时，排除列表最多包含的名称数（兼容旧行为）
+DEFAULT_MAX_NAMES = 300
+
+# 内容段落的标题
+CONTENT_HEADER = "\n# Content (内容)\n"
+
+# 排除列表的标题
+EXISTING_BLOCK_HEADER = (
+    "\n\n# Existing Tools (已有工具名称列表)\n"
+    "下面这些工具已经存在于 tools.json 中，请【不要】重复返回（name 相同或非常相似也算重复）：\n"
+)
+
+
+@dataclass
+class PromptStats:
+    """最近一次组装的统计信息"""
+    prompt_tokens: int = 0
+    prefix_tokens: int = 0
+    content_chars: int = 0
+    content_truncated: bool = False
+    names_included: int = 0
+    names_total: int = 0
+
+
+class PromptBuilder:
+    """按 token 预算组装提取提示词
+
+    预算为None时（模型未声明上下文窗口），内容按字符数截断、排除列表按固定数量截断；
+    否则内容与排除列表都按估算 token 数填充到预算为止
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        max_prompt_tokens: Optional[int] = None,
+        max_content_chars: Optional[int] = None,
+        max_names: Optional[int] = None
+    ):
+        """
+        初始化提示词组装器
+
+        Args:
+            count_tokens: token 计数函数
+            max_prompt_tokens: 提示词 token 预算（None 表示未声明）
+            max_content_chars: 内容的最大字符数
+            max_names: 排除列表的最大名称数（None 时：有预算则不限，无预算则为 DEFAULT_MAX_NAMES）
+        """
+        self.count_tokens = count_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_content_chars = max_content_chars
+        if max_names is None and max_prompt_tokens is None:
+            max_names = DEFAULT_MAX_NAMES
+        self.max_names = max_names
+        self.stats = PromptStats()
+
+    def _fit_text(self, text: str, limit: int) -> str:
+        """把文本截断到 limit 个 token 以内（按比例回退，通常一两次即可收敛）"""
+        if limit <= 0:
+            return ""
+        tokens = self.count_tokens(text)
+        while text and tokens > limit:
+            text = text[:max(0, int(len(text) * limit / tokens) - 1)]
+            tokens = self.count_tokens(text)
+        return text
+
+    def build(self, prefix: str, content: str = "", names: Optional[List[str]] = None) -> str:
+        """
+        组装提示词
+
+        Args:
+            prefix: 固定指令前缀（原样输出）
+            content: 内容
+            names: 已去重的已有工具名称（按优先级排序）
+
+        Returns:
+            str: 提示词
+        """
+        names = names or []
+        stats = PromptStats(names_total=len(names), prefix_tokens=self.count_tokens(prefix))
+        original_content = content or ""
+        content = original_content
+        if self.max_content_chars is not None:
+            content = content[:self.max_content_chars]
+
+        budget = self.max_prompt_tokens
+        used = 0
+        if budget is not None:
+            used = stats.prefix_tokens + self.count_tokens(CONTENT_HEADER + "\n")
+            reserve = self.count_tokens(EXISTING_BLOCK_HEADER) if names else 0
+            content = self._fit_text(content, budget - used - reserve)
+            used += self.count_tokens(content)
+
+        included: List[str] = []
+        if names and (budget is None or used < budget):
+            if budget is not None:
+                used += self.count_tokens(EXISTING_BLOCK_HEADER)
+            for n in names:
+                if self.max_names is not None and len(included) >= self.max_names:
+                    break
+                if budget is not None:
+                    cost = self.count_tokens(f"- {n}\n")
+                    if used + cost > budget:
+                        break
+                    used += cost
+                included.append(n)
+
+        prompt = prefix + CONTENT_HEADER + content + "\n"
+        if included:
+            prompt += EXISTING_BLOCK_HEADER + "\n".join([f"- {n}" for n in included]) + "\n"
+
+        stats.content_chars = len(content)
+        stats.content_truncated = len(content) < len(original_content)
+        stats.names_included = len(included)
+        stats.prompt_tokens = used if budget is not None else self.count_tokens(prompt)
+        self.stats = stats
+        if stats.content_truncated or stats.names_included < stats.names_total:
+            logger.info(
+                f"提示词按预算裁剪：预算 {budget if budget is not None else '未声明'} tokens，"
+                f"估算 {stats.prompt_tokens} tokens，内容 {stats.content_chars} 字符"
+                f"{'（已截断）' if stats.content_truncated else ''}，"
+                f"排除列表 {stats.names_included}/{stats.names_total} 个名称"
+            )
+        return prompt
@@ -7,6 +7,7 @@ from pathlib import Path
 # 处理导入路径，支持直接运行和作为模块导入
 try:
     # 先尝试相对导入（作为模块导入时）
+    from .openai_compatible import OpenAICompatibleProvider
     from .deepseek import DeepSeekProvider
     from .siliconflow import SiliconFlowProvider
     from .kimi import KimiProvider
@@ -17,12 +18,14 @@ except (ImportError, ValueError):
     parent_dir = str(Path(__file__).parent.parent)
     if parent_dir not in sys.path:
         sys.path.insert(0, parent_dir)
+    from openai_compatible import OpenAICompatibleProvider
     from deepseek import DeepSeekProvider
     from siliconflow import SiliconFlowProvider
     from kimi import KimiProvider
     from doubao import DoubaoProvider
 
 __all__ = [
+    "OpenAICompatibleProvider",
     "DeepSeekProvider",
     "SiliconFlowProvider",
     "KimiProvider",
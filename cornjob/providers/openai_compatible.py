@@ -0,0 +1,645 @@
+"""
+通用 OpenAI 兼容 API提供者实现
+配置驱动：config.yaml 中新增 providers.<name> 条目（type: openai_compatible）即可接入新的后端，
+包括本机部署的推理服务
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import requests
+import sys
+import time
+import urllib.parse
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
+from pathlib import Path
+
+# 处理导入路径，支持直接运行和作为模块导入
+try:
+    # 先尝试相对导入（作为模块导入时）
+    from ..base import AIProvider, AIResponse, StreamHandle
+    from ..batch import BATCH_TERMINAL_STATUSES, BatchError, build_batch_jsonl, parse_batch_output
+    from ..cache import ResponseCache
+    from ..config import ConfigManager
+    from ..retry import CircuitOpenError
+    from ..tokens import get_tokenizer
+except (ImportError, ValueError):
+    # 相对导入失败时，使用绝对导入（直接运行时）
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from base import AIProvider, AIResponse, StreamHandle
+    from batch import BATCH_TERMINAL_STATUSES, BatchError, build_batch_jsonl, parse_batch_output
+    from cache import ResponseCache
+    from config import ConfigManager
+    from retry import CircuitOpenError
+    from tokens import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# 上下文超长错误的特征（各供应商的错误信息不同，均以 4xx 返回）
+CONTEXT_LENGTH_ERROR = re.compile(
+    r"context[_ ]length|context window|maximum context|token limit|too many tokens|prompt is too long",
+    re.IGNORECASE
+)
+
+
+class OpenAICompatibleProvider(AIProvider):
+    """通用 OpenAI 兼容 AI提供者
+    
+    endpoint、请求头、默认请求参数和超时在构造时一次性从配置编译完成，
+    chat() 调用期间不再查询配置
+    """
+    
+    PROVIDER_NAME = "openai_compatible"
+    # 日志中显示的名称（可被配置中的 display_name 覆盖）
+    DISPLAY_NAME = "OpenAI兼容"
+    # 配置缺失时的兜底值（内置提供者子类覆盖）
+    DEFAULT_BASE_URL: Optional[str] = None
+    DEFAULT_MODEL: Optional[str] = None
+    
+    def __init__(self, api_key: str, base_url: Optional[str] = None, provider_name: Optional[str] = None):
+        """
+        初始化OpenAI兼容提供者
+        
+        Args:
+            api_key: API密钥（配置 require_api_key: false 的本地服务可为空）
+            base_url: API地址（可选，如果不提供则从配置文件读取）
+            provider_name: config.yaml 中 providers 下的条目名称（默认使用 PROVIDER_NAME）
+        """
+        self.provider_name = (provider_name or self.PROVIDER_NAME).lower()
+        options = ConfigManager._get_provider_config_from_yaml(self.provider_name) or {}
+        self.display_name = options.get("display_name") or self.DISPLAY_NAME
+        self.require_api_key = bool(options.get("require_api_key", True))
+        # 模型层级：按上下文从小到大排列，每次请求选用能容纳 提示词 + max_tokens 的层级
+        self.model_tiers = self._compile_model_tiers(options.get("model_tiers"))
+        self.default_model = (
+            options.get("default_model")
+            or (self.model_tiers[-1]["model"] if self.model_tiers else None)
+            or self.DEFAULT_MODEL
+        )
+        self._timeout = self._compile_timeout(options)
+        # 默认请求参数模板：每次请求只需合并 messages 与调用方覆盖的参数
+        self._payload_template: Dict[str, Any] = {
+            "model": self.default_model,
+            "temperature": options.get("temperature", 0.7),
+            "max_tokens": options.get("max_tokens", 2000),
+            **(options.get("extra_params") or {})
+        }
+        # 提示词 token 预算：显式 prompt_budget 优先，否则由 context_window - max_tokens - 安全余量 得出
+        self.max_tokens = int(self._payload_template["max_tokens"])
+        self.context_window = options.get("context_window")
+        self.prompt_budget = options.get("prompt_budget")
+        self._count_tokens = get_tokenizer(options.get("tokenizer"))
+        super().__init__(api_key, base_url or options.get("default_base_url") or self.DEFAULT_BASE_URL)
+        # 离线批处理（/files + /batches）配置
+        self._batch_options = ConfigManager.get_provider_section(self.provider_name, "batch")
+    
+    @staticmethod
+    def _compile_timeout(options: Dict[str, Any]) -> Union[float, Tuple[float, float]]:
+        """编译请求超时：提供者级 request_timeout 优先，其次是 crawler.request_timeout"""
+        try:
+            read_timeout = float(options.get("request_timeout") or ConfigManager.get_crawler_config("request_timeout", 120))
+        except (TypeError, ValueError):
+            read_timeout = 120.0  # 默认 120 秒
+        connect_timeout = options.get("connect_timeout")
+        if connect_timeout:
+            return (float(connect_timeout), read_timeout)
+        return read_timeout
+    
+    @staticmethod
+    def _compile_model_tiers(tiers: Any) -> List[Dict[str, Any]]:
+        """编译 model_tiers 配置：[{model, context, cost}]，按上下文从小到大排序（无效条目忽略）"""
+        compiled = []
+        for tier in tiers or []:
+            if not isinstance(tier, dict) or not tier.get("model") or not tier.get("context"):
+                logger.warning(f"忽略无效的模型层级配置: {tier}")
+                continue
+            compiled.append({
+                "model": str(tier["model"]),
+                "context": int(tier["context"]),
+                "cost": float(tier.get("cost", 0))
+            })
+        return sorted(compiled, key=lambda t: (t["context"], t["cost"]))
+    
+    def _select_tiers(self, payload: Dict[str, Any]) -> List[str]:
+        """
+        为请求选择模型层级
+        
+        在上下文能容纳 提示词 + max_tokens + 安全余量 的层级中取相对成本最低的（成本相同取上下文较小的），
+        其后依次为上下文更大的层级，供遇到上下文超长错误时升级
+        
+        Returns:
+            List[str]: 首选模型及可升级的模型（未配置层级时为空）
+        """
+        if not self.model_tiers:
+            return []
+        margin = int(ConfigManager.get_crawler_config("prompt_safety_margin", 256))
+        needed = self._estimate_request_tokens(payload) + margin
+        fitting = [t for t in self.model_tiers if t["context"] >= needed]
+        if not fitting:
+            return [self.model_tiers[-1]["model"]]
+        chosen = min(fitting, key=lambda t: (t["cost"], t["context"]))
+        return [chosen["model"]] + [t["model"] for t in self.model_tiers if t["context"] > chosen["context"]]
+    
+    @staticmethod
+    def _is_context_length_error(error: requests.exceptions.RequestException) -> bool:
+        """是否为上下文超长导致的请求错误"""
+        response = getattr(error, "response", None)
+        if response is None or response.status_code not in (400, 413, 422):
+            return False
+        try:
+            return bool(CONTEXT_LENGTH_ERROR.search(response.text[:4000]))
+        except Exception:
+            return False
+    
+    def _post_with_tiers(
+        self,
+        payload: Dict[str, Any],
+        tiers: List[str],
+        stream: bool = False,
+        estimated_tokens: int = 0,
+        deadline: Optional[float] = None
+    ) -> requests.Response:
+        """
+        发送请求，遇到上下文超长错误时换用下一个更大的模型层级（直接修改 payload["model"]）
+        
+        Args:
+            payload: 完整的请求体
+            tiers: _select_tiers() 选出的模型层级（为空时不升级）
+            stream: 是否以流式读取响应
+            estimated_tokens: 本次请求预计消耗的 token 数
+            deadline: 截止时间（time.monotonic() 时刻）
+        
+        Returns:
+            requests.Response: 成功（2xx）的响应
+        """
+        index = 0
+        while True:
+            try:
+                return self._post_with_retry(
+                    payload,
+                    self._timeout,
+                    stream=stream,
+                    estimated_tokens=estimated_tokens,
+                    deadline=deadline
+                )
+            except requests.exceptions.HTTPError as e:
+                if index + 1 >= len(tiers) or not self._is_context_length_error(e):
+                    raise
+                index += 1
+                logger.warning(
+                    f"{self.display_name} 模型 {payload['model']} 上下文不足，升级到 {tiers[index]}"
+                )
+                payload["model"] = tiers[index]
+    
+    def count_tokens(self, text: str) -> int:
+        """使用配置的分词器估算 token 数"""
+        return self._count_tokens(text)
+    
+    def get_prompt_budget(self) -> Optional[int]:
+        """提示词可用的 token 预算（None 表示未声明上下文窗口）"""
+        if self.prompt_budget:
+            return int(self.prompt_budget)
+        # 未声明上下文窗口时以最大的模型层级为准（小提示词仍会选用小层级）
+        context_window = self.context_window or (self.model_tiers[-1]["context"] if self.model_tiers else None)
+        if context_window:
+            margin = int(ConfigManager.get_crawler_config("prompt_safety_margin", 256))
+            return max(0, int(context_window) - self.max_tokens - margin)
+        return None
+    
+    def _validate_config(self) -> None:
+        """验证配置"""
+        if not self.base_url:
+            raise ValueError(f"{self.display_name} 未配置 default_base_url")
+        if self.require_api_key and not self.api_key:
+            raise ValueError(f"{self.display_name} API密钥不能为空")
+        if not self.default_model:
+            raise ValueError(f"{self.display_name} 未配置 default_model")
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """构建请求头（本地无鉴权服务不发送 Authorization）"""
+        headers = super()._build_headers()
+        if not self.api_key:
+            headers.pop("Authorization", None)
+        return headers
+    
+    def get_provider_name(self) -> str:
+        """获取提供者名称"""
+        return self.provider_name
+    
+    def get_default_model(self) -> str:
+        """获取默认模型"""
+        return self.default_model
+    
+    def _build_payload(self, prompt: str, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        """基于预编译的参数模板构建请求体（值为None的覆盖项沿用默认值）"""
+        payload = dict(self._payload_template)
+        payload["messages"] = [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        for key, value in overrides.items():
+            if value is not None:
+                payload[key] = value
+        return payload
+    
+    def chat(
+        self, 
+        prompt: str, 
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> AIResponse:
+        """
+        发送聊天请求
+        
+        Args:
+            prompt: 提示词
+            model: 模型名称（默认按 model_tiers 选择层级，未配置层级时使用 default_model；
+                显式指定时不做层级选择与升级）
+            temperature: 温度参数（默认使用配置值）
+            max_tokens: 最大token数（默认使用配置值）
+            timeout: 本次请求（含重试）可用的总时长（秒），None 表示只受单次超时限制
+            **kwargs: 其他请求参数
+        
+        Returns:
+            AIResponse: 响应对象
+        """
+        payload, tiers = self._prepare_chat(prompt, model, temperature, max_tokens, kwargs)
+        started = time.monotonic()
+        cache_key, cached = self._lookup_cache(payload, started)
+        if cached is not None:
+            return cached
+        deadline = None if timeout is None else started + timeout
+        response = self._send_chat(payload, deadline, tiers)
+        return self._finish_chat(response, cache_key, started)
+    
+    async def achat(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> AIResponse:
+        """
+        异步发送聊天请求（参数同 chat）
+        
+        请求体构建与缓存查找在事件循环中完成，缓存命中时不占用线程；
+        只有阻塞的 HTTP 请求（含重试与限流等待）放到线程池中执行，与同步调用共用同一个连接池
+        """
+        payload, tiers = self._prepare_chat(prompt, model, temperature, max_tokens, kwargs)
+        started = time.monotonic()
+        cache_key, cached = self._lookup_cache(payload, started)
+        if cached is not None:
+            return cached
+        deadline = None if timeout is None else started + timeout
+        response = await asyncio.to_thread(self._send_chat, payload, deadline, tiers)
+        return self._finish_chat(response, cache_key, started)
+    
+    def _prepare_chat(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        overrides: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """构建请求体并选择模型层级（显式指定 model 时不做层级选择与升级）"""
+        payload = self._build_payload(prompt, {"model": model, "temperature": temperature, "max_tokens": max_tokens, **overrides})
+        tiers = self._select_tiers(payload) if model is None else []
+        if tiers:
+            payload["model"] = tiers[0]
+        return payload, tiers
+    
+    def _lookup_cache(self, payload: Dict[str, Any], started: float) -> Tuple[Optional[str], Optional[AIResponse]]:
+        """
+        查找本地响应缓存
+        
+        Returns:
+            Tuple[Optional[str], Optional[AIResponse]]: (缓存键，未启用缓存时为 None；命中时的响应)
+        """
+        if self.response_cache is None:
+            return None, None
+        cache_key = self._make_cache_key(payload)
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        logger.info(f"{self.display_name} 响应缓存命中 - 模型: {payload['model']}")
+        response = self._create_success_response(
+            content=cached["content"],
+            usage=cached["usage"],
+            model=cached["model"],
+            finish_reason=cached.get("finish_reason")
+        )
+        response.from_cache = True
+        response.latency = time.monotonic() - started
+        return cache_key, response
+    
+    def _finish_chat(self, response: AIResponse, cache_key: Optional[str], started: float) -> AIResponse:
+        """记录耗时，并把成功的响应写入本地缓存"""
+        response.latency = time.monotonic() - started
+        if cache_key is not None and response.success:
+            self.response_cache.put(
+                cache_key,
+                provider=self.provider_name,
+                model=response.model,
+                content=response.content,
+                usage=response.usage,
+                finish_reason=response.finish_reason
+            )
+        return response
+    
+    def _make_cache_key(self, payload: Dict[str, Any]) -> str:
+        """根据请求体生成缓存键（提供者 + 模型 + 提示词哈希 + 采样参数）"""
+        params = {k: v for k, v in payload.items() if k not in ("model", "messages")}
+        prompt = json.dumps(payload["messages"], ensure_ascii=False, sort_keys=True)
+        return ResponseCache.make_key(self.provider_name, payload["model"], prompt, params)
+    
+    def _send_chat(
+        self,
+        payload: Dict[str, Any],
+        deadline: Optional[float] = None,
+        tiers: Optional[List[str]] = None
+    ) -> AIResponse:
+        """
+        发送（非流式）聊天请求并解析响应
+        
+        Args:
+            payload: 完整的请求体
+            deadline: 截止时间（time.monotonic() 时刻），超过后不再发起或重试
+            tiers: 可升级的模型层级（见 _select_tiers）
+        
+        Returns:
+            AIResponse: 响应对象
+        """
+        prompt_length = sum(len(str(m.get("content", ""))) for m in payload["messages"])
+        logger.info(f"{self.display_name} API 请求 - 模型: {payload['model']}, prompt长度: {prompt_length}")
+        try:
+            logger.debug(f"{self.display_name} API 请求URL: {self.base_url}, 超时时间: {self._timeout} 秒")
+            estimated_tokens = self._estimate_request_tokens(payload)
+            response = self._post_with_tiers(
+                payload,
+                tiers or [],
+                estimated_tokens=estimated_tokens,
+                deadline=deadline
+            )
+            logger.debug(f"{self.display_name} API 响应状态码: {response.status_code}")
+            
+            data = response.json()
+            # 用实际用量修正 TPM 余额
+            self.rate_limiter.reconcile(estimated_tokens, (data.get("usage") or {}).get("total_tokens"))
+            return self._response_from_body(data, payload["model"])
+                
+        except CircuitOpenError as e:
+            logger.warning(f"{self.display_name} API {str(e)}")
+            return self._create_error_response(str(e))
+        except requests.exceptions.Timeout as e:
+            logger.error(f"{self.display_name} API 请求超时: {str(e)}")
+            return self._create_error_response(f"请求超时: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"{self.display_name} API 请求失败: {str(e)}")
+            return self._create_error_response(f"请求失败: {str(e)}")
+        except Exception as e:
+            logger.exception(f"{self.display_name} API 处理响应时出错: {str(e)}")
+            return self._create_error_response(f"处理响应时出错: {str(e)}")
+    
+    def _response_from_body(self, data: Dict[str, Any], model: str) -> AIResponse:
+        """将 chat/completions 响应体解析为 AIResponse"""
+        if "choices" in data and len(data["choices"]) > 0:
+            choice = data["choices"][0]
+            return self._create_success_response(
+                content=choice["message"]["content"],
+                usage=data.get("usage", {}),
+                model=data.get("model", model),
+                finish_reason=choice.get("finish_reason")
+            )
+        logger.warning(f"{self.display_name} API 响应格式异常，未找到choices字段")
+        return self._create_error_response("API响应格式异常")
+    
+    def _batch_base_url(self) -> str:
+        """批处理接口根地址：环境变量 CRAWL_BATCH_BASE_URL > batch.base_url > 由对话接口地址推导"""
+        base = os.getenv("CRAWL_BATCH_BASE_URL") or self._batch_options.get("base_url")
+        if not base:
+            base = self.base_url.rsplit("/chat/completions", 1)[0]
+        return base.rstrip("/")
+    
+    def _batch_request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """发送批处理管理请求（上传/创建/轮询/下载），带重试与熔断，不占用对话限流配额"""
+        headers = {k: v for k, v in self._headers.items() if k != "Content-Type"}
+        if "json" in kwargs:
+            headers["Content-Type"] = "application/json"
+        return self._request_with_retry(
+            method,
+            f"{self._batch_base_url()}/{path}",
+            self._timeout,
+            rate_limited=False,
+            headers=headers,
+            **kwargs
+        )
+    
+    def chat_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> List[AIResponse]:
+        """
+        通过离线批处理接口发送多个聊天请求
+        
+        上传 JSONL 请求文件 -> 创建批处理任务 -> 轮询直到结束 -> 下载输出文件，按输入顺序返回响应；
+        未启用 batch.enabled 时逐个调用 chat()
+        
+        Args:
+            prompts: 提示词列表
+            model: 模型名称（默认按 model_tiers 选择能容纳最长请求的层级，未配置层级时使用 default_model）
+            temperature: 温度参数（默认使用配置值）
+            max_tokens: 最大token数（默认使用配置值）
+            timeout: 整个批处理可用的总时长（秒），会截断 batch.max_wait
+            **kwargs: 其他请求参数
+        
+        Returns:
+            List[AIResponse]: 与 prompts 一一对应的响应列表（批处理失败时均为错误响应）
+        """
+        overrides = {"model": model, "temperature": temperature, "max_tokens": max_tokens, **kwargs}
+        if not prompts:
+            return []
+        started = time.monotonic()
+        if not self._batch_options.get("enabled", False):
+            responses = []
+            for prompt in prompts:
+                left = None if timeout is None else timeout - (time.monotonic() - started)
+                if left is not None and left <= 0:
+                    responses.append(self._create_error_response("请求超时: 超过本次调用的截止时间"))
+                else:
+                    responses.append(self.chat(prompt, timeout=left, **overrides))
+            return responses
+        
+        payloads = [self._build_payload(prompt, overrides) for prompt in prompts]
+        if model is None and self.model_tiers:
+            # 同一批处理任务使用同一个模型：取能容纳最长请求的层级（批处理中不做升级）
+            batch_model = max(
+                (self._select_tiers(payload)[0] for payload in payloads),
+                key=lambda name: next(t["context"] for t in self.model_tiers if t["model"] == name)
+            )
+            for payload in payloads:
+                payload["model"] = batch_model
+        try:
+            results = self._run_batch(payloads, timeout)
+        except (BatchError, CircuitOpenError, requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"{self.display_name} 批处理失败: {str(e)}")
+            return [self._create_error_response(f"批处理失败: {str(e)}") for _ in prompts]
+        
+        # 批处理没有单次请求耗时，按请求数平摊总耗时
+        latency = (time.monotonic() - started) / len(payloads)
+        responses = []
+        for i, payload in enumerate(payloads):
+            item = results.get(i)
+            response_part = (item or {}).get("response") or {}
+            if item is None:
+                response = self._create_error_response("批处理输出中缺少该请求的结果")
+            elif item.get("error") or int(response_part.get("status_code", 200)) >= 400:
+                error = item.get("error") or response_part.get("body")
+                response = self._create_error_response(f"批处理请求失败: {error}")
+            else:
+                response = self._response_from_body(response_part.get("body") or {}, payload["model"])
+            response.latency = latency
+            responses.append(response)
+        return responses
+    
+    def _run_batch(self, payloads: List[Dict[str, Any]], timeout: Optional[float] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        执行一次批处理任务
+        
+        Args:
+            payloads: 请求体列表
+            timeout: 最长等待时间（秒），与 batch.max_wait 取较小值
+        
+        Returns:
+            Dict[int, Dict[str, Any]]: 请求序号 -> 输出行
+        
+        Raises:
+            BatchError: 任务失败、过期、被取消或等待超时
+        """
+        options = self._batch_options
+        endpoint = urllib.parse.urlparse(self.base_url).path or "/v1/chat/completions"
+        uploaded = self._batch_request(
+            "POST",
+            "files",
+            data={"purpose": "batch"},
+            files={"file": ("requests.jsonl", build_batch_jsonl(payloads, endpoint), "application/jsonl")}
+        ).json()
+        batch = self._batch_request(
+            "POST",
+            "batches",
+            json={
+                "input_file_id": uploaded["id"],
+                "endpoint": endpoint,
+                "completion_window": options.get("completion_window", "24h")
+            }
+        ).json()
+        logger.info(f"{self.display_name} 已提交批处理任务 {batch.get('id')}，共 {len(payloads)} 个请求")
+        
+        poll_interval = float(options.get("poll_interval", 30))
+        max_wait = float(options.get("max_wait", 86400))
+        if timeout is not None:
+            max_wait = min(max_wait, timeout)
+        deadline = time.monotonic() + max_wait
+        while batch.get("status") not in BATCH_TERMINAL_STATUSES:
+            if time.monotonic() >= deadline:
+                raise BatchError(f"批处理任务 {batch.get('id')} 等待超时（状态: {batch.get('status')}）")
+            time.sleep(poll_interval)
+            batch = self._batch_request("GET", f"batches/{batch['id']}").json()
+            logger.debug(f"{self.display_name} 批处理任务 {batch.get('id')} 状态: {batch.get('status')}")
+        if batch.get("status") != "completed":
+            raise BatchError(f"批处理任务 {batch.get('id')} 结束状态: {batch.get('status')}，错误: {batch.get('errors')}")
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        for key in ("error_file_id", "output_file_id"):
+            file_id = batch.get(key)
+            if file_id:
+                response = self._batch_request("GET", f"files/{file_id}/content")
+                response.encoding = "utf-8"
+                results.update(parse_batch_output(response.text))
+        logger.info(
+            f"{self.display_name} 批处理任务 {batch.get('id')} 完成，"
+            f"收到 {len(results)}/{len(payloads)} 个结果"
+        )
+        return results
+    
+    def chat_stream(
+        self, 
+        prompt: str, 
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        handle: Optional[StreamHandle] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        以流式（SSE）方式发送聊天请求
+        
+        Args:
+            prompt: 提示词
+            model: 模型名称（默认按 model_tiers 选择层级并在上下文超长时升级，未配置层级时使用 default_model）
+            temperature: 温度参数（默认使用配置值）
+            max_tokens: 最大token数（默认使用配置值）
+            timeout: 建立连接（含重试）可用的总时长（秒）；读取过程由调用方决定何时停止
+            handle: 取消句柄（其他线程调用 handle.cancel() 时关闭连接，流静默结束）
+            **kwargs: 其他请求参数
+        
+        Yields:
+            str: 增量返回的内容片段
+        
+        Raises:
+            CircuitOpenError: 熔断器处于打开状态
+            requests.exceptions.RequestException: 建立连接失败或读取中断（已产出的片段保留在调用方）
+        """
+        payload = self._build_payload(prompt, {"model": model, "temperature": temperature, "max_tokens": max_tokens, **kwargs})
+        payload["stream"] = True
+        tiers = self._select_tiers(payload) if model is None else []
+        if tiers:
+            payload["model"] = tiers[0]
+        logger.info(f"{self.display_name} API 流式请求 - 模型: {payload['model']}, prompt长度: {len(prompt)}")
+        try:
+            estimated_tokens = self._estimate_request_tokens(payload)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            with self._post_with_tiers(
+                payload,
+                tiers,
+                stream=True,
+                estimated_tokens=estimated_tokens,
+                deadline=deadline
+            ) as response:
+                if handle is not None and not handle.attach(response):
+                    return
+                pieces: List[str] = []
+                try:
+                    for piece in self._iter_sse_content(response):
+                        pieces.append(piece)
+                        yield piece
+                finally:
+                    # 流式响应不带 usage：按 提示词估算 + 已收到内容的 token 数修正 TPM 余额
+                    # （中途关闭的流只计已收到的部分）
+                    prompt_tokens = estimated_tokens - int(payload.get("max_tokens") or 0)
+                    self.rate_limiter.reconcile(estimated_tokens, prompt_tokens + self.count_tokens("".join(pieces)))
+        except CircuitOpenError as e:
+            logger.warning(f"{self.display_name} API {str(e)}")
+            raise
+        except Exception as e:
+            if handle is not None and handle.cancelled:
+                # 连接被取消方关闭，读取中断属于预期
+                logger.info(f"{self.display_name} API 流式请求已取消")
+                return
+            if isinstance(e, requests.exceptions.RequestException):
+                logger.error(f"{self.display_name} API 流式请求失败: {str(e)}")
+            raise
@@ -0,0 +1,163 @@
+"""
+客户端限流模块
+按提供者对每分钟请求数（RPM）与每分钟 token 数（TPM）做令牌桶限流，
+在请求发出前等待，避免触发服务端 429
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """线程安全的令牌桶
+
+    容量为每分钟配额，按秒匀速补充；余额允许为负（用于事后按实际用量补扣），
+    为负时后续请求会等待到余额恢复
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        初始化令牌桶
+
+        Args:
+            per_minute: 每分钟配额（同时作为桶容量）
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """按经过的时间补充令牌（调用方持有锁）"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, amount: float, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        获取指定数量的令牌，不足时阻塞等待
+
+        Args:
+            amount: 需要的令牌数（超过容量时按容量计，避免永远等待）
+            timeout: 最长等待秒数（None 表示不限）；预计等待超过剩余时间时立即放弃，不扣令牌
+
+        Returns:
+            Optional[float]: 实际等待的秒数；超时放弃时为None
+        """
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                wait = (amount - self._tokens) / self.rate
+            if timeout is not None and waited + wait > timeout:
+                return None
+            time.sleep(wait)
+            waited += wait
+
+    def adjust(self, delta: float) -> None:
+        """
+        按实际用量修正余额
+
+        Args:
+            delta: 正数表示补扣，负数表示退还
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - float(delta))
+
+
+class RateLimiter:
+    """RPM + TPM 限流器（配额为0表示不限制）"""
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0):
+        """
+        初始化限流器
+
+        Args:
+            name: 名称（提供者名称）
+            rpm: 每分钟请求数上限
+            tpm: 每分钟 token 数上限
+        """
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm and rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm and tpm > 0 else None
+
+    @property
+    def enabled(self) -> bool:
+        """是否配置了任何限额"""
+        return self.requests is not None or self.tokens is not None
+
+    def acquire(self, estimated_tokens: int = 0, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        在发送请求前获取配额
+
+        Args:
+            estimated_tokens: 本次请求预计消耗的 token 数（提示词 + max_tokens）
+            timeout: 最长等待秒数（None 表示不限，通常为请求截止时间前的剩余时间）
+
+        Returns:
+            Optional[float]: 总等待秒数；在 timeout 内拿不到配额时为None（不占用任何配额）
+        """
+        waited = 0.0
+        if self.requests is not None:
+            request_wait = self.requests.acquire(1, timeout)
+            if request_wait is None:
+                return None
+            waited += request_wait
+        if self.tokens is not None and estimated_tokens > 0:
+            token_wait = self.tokens.acquire(estimated_tokens, None if timeout is None else timeout - waited)
+            if token_wait is None:
+                if self.requests is not None:
+                    self.requests.adjust(-1)
+                return None
+            waited += token_wait
+        if waited > 0:
+            logger.info(f"{self.name} 客户端限流等待 {waited:.2f} 秒")
+        return waited
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """
+        用响应中的实际 usage 修正 TPM 余额
+
+        流式响应不带 usage，调用方传入 提示词估算 + 已收到内容的 token 数作为近似值
+
+        Args:
+            estimated_tokens: 请求前预扣的 token 数
+            actual_tokens: 响应 usage 中的实际总 token 数（未知时不修正）
+        """
+        if self.tokens is None or actual_tokens is None:
+            return
+        self.tokens.adjust(int(actual_tokens) - int(estimated_tokens))
+
+
+# 进程级共享：同一提供者的所有线程 / 协程共用一个限流器
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, options: Optional[Dict[str, Any]] = None) -> RateLimiter:
+    """
+    获取（或创建）指定提供者的共享限流器
+
+    Args:
+        name: 提供者名称
+        options: 限流配置（rpm、tpm，只在首次创建时生效）
+
+    Returns:
+        RateLimiter: 限流器实例
+    """
+    options = options or {}
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(name, rpm=options.get("rpm", 0), tpm=options.get("tpm", 0))
+            _limiters[name] = limiter
+        return limiter
@@ -0,0 +1,185 @@
+"""
+重试与熔断模块
+提供带抖动的指数退避重试策略（支持 Retry-After）以及按提供者共享的熔断器
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+@dataclass
+class RetryPolicy:
+    """重试策略：带抖动、有上限的指数退避"""
+    max_retries: int = 3  # 最大重试次数（不含首次请求）
+    base_delay: float = 1.0  # 首次重试的基础等待时间（秒）
+    max_delay: float = 30.0  # 单次等待上限（秒）
+    jitter: float = 0.5  # 抖动比例（0-1），等待时间在 [d*(1-jitter), d] 之间随机
+    max_retry_after: float = 120.0  # 服务端 Retry-After 的采纳上限（秒）
+    retry_on_timeout: bool = False  # 读超时是否重试（超时本身已很长，默认不重试）
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    @classmethod
+    def from_options(cls, options: Dict[str, Any]) -> "RetryPolicy":
+        """从配置字典构建（未配置的字段使用默认值）"""
+        policy = cls()
+        for key in ("max_retries", "base_delay", "max_delay", "jitter", "max_retry_after", "retry_on_timeout"):
+            if key in options:
+                setattr(policy, key, type(getattr(policy, key))(options[key]))
+        if "retry_statuses" in options:
+            policy.retry_statuses = tuple(int(code) for code in options["retry_statuses"])
+        return policy
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时间
+
+        Args:
+            attempt: 已失败的次数（从0开始）
+            retry_after: 服务端建议的等待时间（秒），优先采纳
+
+        Returns:
+            float: 等待秒数
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_retry_after)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        jitter = min(max(self.jitter, 0.0), 1.0)
+        return delay * (1 - jitter) + random.uniform(0, delay * jitter)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期）
+
+    Returns:
+        Optional[float]: 等待秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到阈值后打开，冷却期内直接拒绝请求；冷却结束后进入半开状态，
+    放行一次试探请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        """
+        初始化熔断器
+
+        Args:
+            name: 名称（提供者名称）
+            failure_threshold: 连续失败多少次后打开
+            recovery_timeout: 打开后多少秒进入半开状态
+        """
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = float(recovery_timeout)
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """当前是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+                logger.info(f"{self.name} 熔断器进入半开状态，放行试探请求")
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def release(self) -> None:
+        """放弃已放行但最终没有发出的请求（半开状态下归还试探名额）"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """记录一次成功"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} 熔断器恢复关闭")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """记录一次失败"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"{self.name} 熔断器打开（连续失败 {self._failures} 次），"
+                        f"{self.recovery_timeout} 秒内不再发送请求"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+# 进程级共享：同一提供者的所有实例共用一个熔断器
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, options: Optional[Dict[str, Any]] = None) -> CircuitBreaker:
+    """
+    获取（或创建）指定提供者的共享熔断器
+
+    Args:
+        name: 提供者名称
+        options: 熔断器配置（failure_threshold、recovery_timeout，只在首次创建时生效）
+
+    Returns:
+        CircuitBreaker: 熔断器实例
+    """
+    options = options or {}
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=options.get("failure_threshold", 5),
+                recovery_timeout=options.get("recovery_timeout", 60.0)
+            )
+            _breakers[name] = breaker
+        return breaker
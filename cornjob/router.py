@@ -0,0 +1,280 @@
+"""
+提供者路由模块
+跨运行持久化每个提供者的计分板（延迟分位数、错误率、解析成功率、每千 token 新工具数），
+据此为每次运行选择提供者并分配权重：慢的、错误多的或重复产出多的提供者自动获得更少的流量
+"""
+import json
+import logging
+import math
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 计分板中每个提供者保留的最近耗时样本数
+SCOREBOARD_SAMPLE_LIMIT = 200
+
+# 计分板累计的计数字段（每次更新先按衰减系数折旧，再加上本次运行的值）
+_COUNTERS = ("requests", "errors", "successes", "parsed_responses", "tokens", "new_tools")
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    """
+    最近秩法分位数
+
+    Args:
+        samples: 样本
+        q: 分位（0-100）
+
+    Returns:
+        Optional[float]: 分位数（无样本时为None）
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class ProviderScoreboard:
+    """持久化的提供者计分板（JSON 文件）"""
+
+    def __init__(self, path: Path, decay: float = 0.8):
+        """
+        初始化计分板
+
+        Args:
+            path: 计分板文件路径
+            decay: 每次更新时历史计数的保留比例（越小越偏重最近的运行；未参与的提供者同样折旧，
+                久未使用后会重新进入探索）
+        """
+        self.path = Path(path)
+        self.decay = min(1.0, max(0.0, float(decay)))
+        self.providers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """读取计分板文件（不存在或损坏时从空白开始）"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            providers = data.get("providers") if isinstance(data, dict) else None
+            if isinstance(providers, dict):
+                self.providers = {k: v for k, v in providers.items() if isinstance(v, dict)}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取提供者计分板失败，从空白开始: {self.path}，{str(e)}")
+
+    def update(self, usage: Dict[str, Dict[str, Any]], latencies: Dict[str, List[float]]) -> None:
+        """
+        合并一次运行的用量
+
+        Args:
+            usage: 提供者名称 -> 汇总用量（UsageMeter.provider_usage() 的返回值）
+            latencies: 提供者名称 -> 本次运行的请求耗时样本
+        """
+        with self._lock:
+            for entry in self.providers.values():
+                for key in _COUNTERS:
+                    entry[key] = round(float(entry.get(key, 0)) * self.decay, 4)
+            for name, row in usage.items():
+                # 缓存命中不是真实请求，不计入错误率与解析成功率
+                requests = row.get("requests", 0) - row.get("cache_hits", 0)
+                if requests <= 0 and not latencies.get(name):
+                    continue
+                entry = self.providers.setdefault(name, {})
+                errors = row.get("errors", 0)
+                run_values = {
+                    "requests": requests,
+                    "errors": errors,
+                    "successes": max(0, requests - errors),
+                    "parsed_responses": row.get("parsed_responses", 0),
+                    "tokens": row.get("prompt_tokens", 0) + row.get("completion_tokens", 0),
+                    "new_tools": row.get("new_tools_kept", 0)
+                }
+                for key, value in run_values.items():
+                    entry[key] = round(float(entry.get(key, 0)) + value, 4)
+                samples = list(entry.get("latencies") or []) + list(latencies.get(name) or [])
+                entry["latencies"] = [round(s, 3) for s in samples[-SCOREBOARD_SAMPLE_LIMIT:]]
+                entry["runs"] = int(entry.get("runs", 0)) + 1
+                entry["updated_at"] = datetime.now().isoformat(timespec="seconds")
+
+    def stats(self, name: str) -> Dict[str, Any]:
+        """
+        提供者的派生指标
+
+        Returns:
+            Dict[str, Any]: requests / error_rate / parse_rate / p50 / p90 / p99（秒）/
+                new_tools_per_1k_tokens（没有 token 用量时为None）
+        """
+        with self._lock:
+            entry = dict(self.providers.get(name) or {})
+        requests = float(entry.get("requests", 0))
+        successes = float(entry.get("successes", 0))
+        tokens = float(entry.get("tokens", 0))
+        samples = entry.get("latencies") or []
+        return {
+            "requests": round(requests, 2),
+            "error_rate": round(float(entry.get("errors", 0)) / requests, 4) if requests else 0.0,
+            "parse_rate": round(min(1.0, float(entry.get("parsed_responses", 0)) / successes), 4) if successes else 0.0,
+            "p50": percentile(samples, 50),
+            "p90": percentile(samples, 90),
+            "p99": percentile(samples, 99),
+            "new_tools_per_1k_tokens": round(float(entry.get("new_tools", 0)) * 1000 / tokens, 4) if tokens else None
+        }
+
+    def save(self) -> bool:
+        """
+        写回计分板文件（附带派生指标便于查看）
+
+        Returns:
+            bool: 是否写入成功
+        """
+        with self._lock:
+            names = sorted(self.providers)
+        data = {
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "providers": {name: {**self.providers[name], "summary": self.stats(name)} for name in names}
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            tmp_path.replace(self.path)
+            logger.info(f"提供者计分板已更新: {self.path}")
+            return True
+        except OSError as e:
+            logger.warning(f"写入提供者计分板失败: {self.path}，{str(e)}")
+            return False
+
+
+class ProviderRouter:
+    """根据计分板为提供者打分并分配权重
+
+    得分 = (1 - 错误率) × 解析成功率 × 相对产出 / (1 + p90 延迟 / latency_target)，
+    相对产出为每千 token 新工具数除以各提供者中的最大值；
+    得分在 0-1 之间；真实请求数不足 min_requests 的提供者按满分 1 计（优先探索）
+    """
+
+    def __init__(
+        self,
+        scoreboard: ProviderScoreboard,
+        policy: str = "adaptive",
+        min_requests: float = 3,
+        latency_target: float = 60,
+        min_weight: float = 0.05,
+        drop_below: float = 0.0
+    ):
+        """
+        初始化路由器
+
+        Args:
+            scoreboard: 计分板
+            policy: 路由策略（adaptive - 按得分排序与加权；static - 保持配置顺序，单提供者时取第一个）
+            min_requests: 参与打分所需的最少（折旧后的）请求数
+            latency_target: 延迟惩罚的基准（秒）
+            min_weight: 每个提供者的最低权重（保证少量探索流量）
+            drop_below: 使用全部提供者时，权重低于该值的提供者本次不参与（0 表示不剔除）
+        """
+        self.scoreboard = scoreboard
+        self.policy = (policy or "adaptive").strip().lower()
+        self.min_requests = float(min_requests)
+        self.latency_target = max(1e-6, float(latency_target))
+        self.min_weight = max(0.0, float(min_weight))
+        self.drop_below = max(0.0, float(drop_below))
+
+    def scores(self, names: List[str]) -> Dict[str, Optional[float]]:
+        """
+        计算各提供者的得分
+
+        Returns:
+            Dict[str, Optional[float]]: 提供者名称 -> 得分（数据不足时为None）
+        """
+        stats = {name: self.scoreboard.stats(name) for name in names}
+        yields = [s["new_tools_per_1k_tokens"] for s in stats.values() if s["new_tools_per_1k_tokens"]]
+        best_yield = max(yields) if yields else 0.0
+        scores: Dict[str, Optional[float]] = {}
+        for name, s in stats.items():
+            if s["requests"] < self.min_requests:
+                scores[name] = None
+                continue
+            # 没有 token 用量（如只走流式）时产出按中性处理
+            relative_yield = 1.0 if s["new_tools_per_1k_tokens"] is None or not best_yield else (
+                s["new_tools_per_1k_tokens"] / best_yield
+            )
+            latency_penalty = 1 + (s["p90"] or 0.0) / self.latency_target
+            scores[name] = (1 - s["error_rate"]) * s["parse_rate"] * relative_yield / latency_penalty
+        return scores
+
+    def weights(self, names: List[str]) -> Dict[str, float]:
+        """
+        计算各提供者的流量权重（和为1）
+
+        Returns:
+            Dict[str, float]: 提供者名称 -> 权重
+        """
+        if not names:
+            return {}
+        if self.policy == "static":
+            return {name: 1 / len(names) for name in names}
+        raw = {name: 1.0 if score is None else score for name, score in self.scores(names).items()}
+        total = sum(raw.values())
+        if total <= 0:
+            return {name: 1 / len(names) for name in names}
+        floored = {name: max(value / total, self.min_weight) for name, value in raw.items()}
+        total = sum(floored.values())
+        return {name: value / total for name, value in floored.items()}
+
+    def route(self, names: List[str], use_all: bool) -> Dict[str, float]:
+        """
+        为本次运行选择提供者
+
+        Args:
+            names: 候选提供者（配置顺序）
+            use_all: 是否使用全部提供者
+
+        Returns:
+            Dict[str, float]: 选中的提供者 -> 权重，按权重从高到低排列（权重相同时保持配置顺序）
+        """
+        if not names:
+            return {}
+        if self.policy == "static":
+            chosen = names if use_all else names[:1]
+            return {name: 1 / len(chosen) for name in chosen}
+        weights = self.weights(names)
+        ranked = sorted(names, key=lambda name: -weights[name])
+        if not use_all:
+            return {ranked[0]: 1.0}
+        kept = [name for name in ranked if weights[name] >= self.drop_below] or ranked[:1]
+        total = sum(weights[name] for name in kept)
+        return {name: weights[name] / total for name in kept}
+
+
+def assign_weighted(count: int, weights: Dict[str, float]) -> List[str]:
+    """
+    按权重把 count 个任务确定性地分配给提供者（平滑加权轮询）
+
+    Args:
+        count: 任务数
+        weights: 提供者名称 -> 权重
+
+    Returns:
+        List[str]: 每个任务分配到的提供者
+    """
+    if not weights:
+        return []
+    current = dict.fromkeys(weights, 0.0)
+    total = sum(weights.values())
+    assigned = []
+    for _ in range(count):
+        for name, weight in weights.items():
+            current[name] += weight
+        chosen = max(current, key=current.get)
+        current[chosen] -= total
+        assigned.append(chosen)
+    return assigned
@@ -0,0 +1,240 @@
+"""
+标签词表模块
+把自由文本标签规整为词表：每个标签驻留为一个整数 ID 与一个共享字符串（全库只保留一份），
+同义词/别名折叠到规范名称（如 AI绘画 -> 图像生成），按 ID 做保持顺序的线性去重合并；
+词表（ID、规范名称、别名、引用次数）写入与 tools.json 同目录的 tags.json，
+tools.json 中的 tags 仍是字符串数组（前端直接使用）
+"""
+import json
+import logging
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+try:
+    from .normalize import fold_text
+except (ImportError, ValueError):
+    from normalize import fold_text
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def tag_key(tag: str) -> str:
+    """标签的比较键：NFKC 折叠、去掉空白、小写（"AI 绘画" / "ＡＩ绘画" / "ai绘画" 为同一标签）"""
+    return _WHITESPACE.sub("", fold_text(tag)).lower()
+
+
+class TagVocabulary:
+    """标签词表
+
+    ID 在首次出现时按顺序分配；从 tags.json 载入时沿用已有 ID，新标签从最大 ID + 1 继续，跨运行保持稳定
+    """
+
+    def __init__(self, aliases: Optional[Mapping[str, Iterable[str]]] = None):
+        """
+        初始化词表
+
+        Args:
+            aliases: 规范名称 -> 别名列表（别名出现时替换为规范名称）
+        """
+        self._ids: Dict[str, int] = {}  # 比较键 -> ID（别名的比较键指向规范名称的 ID）
+        self._by_text: Dict[str, int] = {}  # 原始标签文本 -> ID（快速路径，免去折叠与正则）
+        self._names: Dict[int, str] = {}  # ID -> 规范名称（驻留字符串）
+        self._aliases: Dict[int, List[str]] = {}  # ID -> 别名（写入词表文件）
+        self._next_id = 1
+        self._lock = threading.Lock()
+        for canonical, names in (aliases or {}).items():
+            if isinstance(names, str):
+                names = [names]
+            self.add_aliases(canonical, names or [])
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _register(self, name: str, tag_id: Optional[int] = None) -> int:
+        """登记新的规范名称（调用方持有锁）"""
+        if tag_id is None:
+            tag_id = self._next_id
+        self._next_id = max(self._next_id, tag_id + 1)
+        self._names[tag_id] = sys.intern(name)
+        self._ids[tag_key(name)] = tag_id
+        return tag_id
+
+    def add_aliases(self, canonical: str, aliases: Iterable[str]) -> None:
+        """
+        登记别名：aliases 中的标签都折叠为 canonical
+
+        Args:
+            canonical: 规范名称
+            aliases: 别名
+        """
+        canonical = canonical.strip() if isinstance(canonical, str) else ""
+        if not canonical:
+            return
+        tag_id = self.intern(canonical)
+        with self._lock:
+            for alias in aliases:
+                alias = alias.strip() if isinstance(alias, str) else ""
+                key = tag_key(alias) if alias else ""
+                previous = self._ids.get(key) if key else tag_id
+                if previous == tag_id:
+                    continue
+                if previous is not None:
+                    # 别名此前是独立标签：之后出现时一律折叠为规范名称，原 ID 不再被引用，下次保存时从词表文件移除
+                    logger.debug(f"标签 {alias} 改为 {canonical} 的别名")
+                self._ids[key] = tag_id
+                self._by_text.clear()
+                self._aliases.setdefault(tag_id, [])
+                if alias not in self._aliases[tag_id]:
+                    self._aliases[tag_id].append(alias)
+
+    def intern(self, tag: Any) -> Optional[int]:
+        """
+        标签的 ID（新标签自动登记，别名返回规范名称的 ID）
+
+        Args:
+            tag: 标签文本
+
+        Returns:
+            Optional[int]: 标签 ID（非字符串或空标签为None）
+        """
+        if not isinstance(tag, str):
+            return None
+        tag_id = self._by_text.get(tag)
+        if tag_id is not None:
+            return tag_id
+        if not tag.strip():
+            return None
+        key = tag_key(tag)
+        with self._lock:
+            tag_id = self._ids.get(key)
+            if tag_id is None:
+                tag_id = self._register(tag.strip())
+            self._by_text[tag] = tag_id
+        return tag_id
+
+    def name(self, tag_id: int) -> str:
+        """ID 对应的规范名称"""
+        return self._names[tag_id]
+
+    def ids(self, *tag_lists: Any) -> List[int]:
+        """
+        把若干标签列表合并为去重后的 ID 列表（保持首次出现的顺序，线性时间）
+
+        Args:
+            tag_lists: 标签列表（非列表的参数忽略）
+
+        Returns:
+            List[int]: 标签 ID
+        """
+        lists = [tags for tags in tag_lists if isinstance(tags, list)]
+        get = self._by_text.get
+        try:
+            # 已见过的标签文本直接命中快速路径（ID 从 1 开始，不会与 None 混淆）
+            interned = [get(tag) or self.intern(tag) for tags in lists for tag in tags]
+        except TypeError:
+            # 标签中混有不可哈希的值（如模型返回的嵌套对象）
+            interned = [self.intern(tag) for tags in lists for tag in tags]
+        ordered = dict.fromkeys(interned)
+        ordered.pop(None, None)
+        return list(ordered)
+
+    def merge(self, *tag_lists: Any) -> List[str]:
+        """
+        合并若干标签列表：别名折叠为规范名称，按 ID 去重并保持顺序
+
+        Returns:
+            List[str]: 规范名称列表（驻留字符串，各记录共享同一对象）
+        """
+        names = self._names
+        return [names[tag_id] for tag_id in self.ids(*tag_lists)]
+
+    def normalize(self, tags: Any) -> List[str]:
+        """规整单条记录的标签（等同于只有一个列表的 merge）"""
+        return self.merge(tags)
+
+    @classmethod
+    def load(cls, path: Path, aliases: Optional[Mapping[str, Iterable[str]]] = None) -> "TagVocabulary":
+        """
+        从词表文件载入（沿用已有 ID；文件不存在或损坏时从空白开始），再登记配置中的别名
+
+        Args:
+            path: 词表文件路径
+            aliases: 配置中的别名（规范名称 -> 别名列表）
+
+        Returns:
+            TagVocabulary: 词表
+        """
+        vocabulary = cls()
+        path = Path(path)
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                entries = data.get("tags") if isinstance(data, dict) else None
+                with vocabulary._lock:
+                    for entry in entries or []:
+                        if not isinstance(entry, dict) or not isinstance(entry.get("name"), str) or not entry["name"].strip():
+                            continue
+                        try:
+                            tag_id = int(entry["id"])
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                        if tag_id in vocabulary._names or tag_key(entry["name"]) in vocabulary._ids:
+                            continue
+                        vocabulary._register(entry["name"].strip(), tag_id)
+                for entry in entries or []:
+                    if isinstance(entry, dict) and isinstance(entry.get("aliases"), list):
+                        vocabulary.add_aliases(entry.get("name", ""), entry["aliases"])
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取标签词表失败，从空白开始: {path}，{str(e)}")
+        for canonical, names in (aliases or {}).items():
+            vocabulary.add_aliases(canonical, [names] if isinstance(names, str) else names or [])
+        return vocabulary
+
+    def save(self, path: Path, tools: List[Dict[str, Any]]) -> bool:
+        """
+        写入词表文件：只保留目录中仍被引用或带别名的标签，附带引用次数
+
+        Args:
+            path: 词表文件路径
+            tools: 已保存的工具列表（用于统计引用次数）
+
+        Returns:
+            bool: 是否写入成功
+        """
+        counts = Counter(
+            tag_id
+            for tool in tools if isinstance(tool, dict)
+            for tag_id in self.ids(tool.get("tags"))
+        )
+        with self._lock:
+            entries = [
+                {
+                    "id": tag_id,
+                    "name": name,
+                    "count": counts.get(tag_id, 0),
+                    **({"aliases": self._aliases[tag_id]} if self._aliases.get(tag_id) else {})
+                }
+                for tag_id, name in sorted(self._names.items())
+                if counts.get(tag_id) or self._aliases.get(tag_id)
+            ]
+        data = {"updated_at": datetime.now().isoformat(timespec="seconds"), "count": len(entries), "tags": entries}
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            tmp_path.replace(path)
+            logger.info(f"标签词表已更新: {path}，{len(entries)} 个标签")
+            return True
+        except OSError as e:
+            logger.warning(f"写入标签词表失败: {path}，{str(e)}")
+            return False
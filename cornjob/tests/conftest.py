@@ -0,0 +1,11 @@
+"""
+测试公共配置
+与 benchmarks 一样把 cornjob 目录加入 sys.path，按直接运行的方式导入各模块；
+测试期间关闭本地响应缓存，避免读写 .cache/ai_responses.sqlite3
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ["RESPONSE_CACHE"] = "false"
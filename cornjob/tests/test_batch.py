@@ -0,0 +1,188 @@
+"""
+离线批处理测试
+用本地 HTTP 桩服务实现 /files、/batches、状态轮询与输出/错误文件下载，覆盖 OpenAICompatibleProvider.chat_batch 的完整流程
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from batch import CUSTOM_ID_PREFIX
+from providers.openai_compatible import OpenAICompatibleProvider
+
+
+class StubProvider(OpenAICompatibleProvider):
+    """指向桩服务的提供者（config.yaml 中没有对应条目，全部使用兜底值）"""
+    PROVIDER_NAME = "batch_stub"
+    DEFAULT_MODEL = "stub-model"
+
+
+class BatchStub:
+    """批处理桩服务的状态：收到的请求、任务状态与各文件内容"""
+
+    def __init__(self, polls_before_complete=2, failed_indices=(), never_complete=False):
+        self.polls_before_complete = polls_before_complete
+        self.failed_indices = set(failed_indices)
+        self.never_complete = never_complete
+        self.requests = []  # (方法, 路径)
+        self.uploaded_lines = []
+        self.batch_body = None
+        self.polls = 0
+        self.files = {}
+
+    def batch(self):
+        """当前任务状态（轮询够次数后完成，并生成输出/错误文件）"""
+        batch = {"id": "batch-1", "input_file_id": "file-input", "status": "in_progress"}
+        if self.never_complete or self.polls < self.polls_before_complete:
+            return batch
+        output, errors = [], []
+        # 输出文件按逆序写入，验证结果按 custom_id 而不是行序对应到输入
+        for line in reversed(self.uploaded_lines):
+            request = json.loads(line)
+            index = int(request["custom_id"][len(CUSTOM_ID_PREFIX):])
+            prompt = request["body"]["messages"][-1]["content"]
+            if index in self.failed_indices:
+                errors.append({
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 400, "body": {"error": {"message": f"bad request {index}"}}},
+                    "error": None
+                })
+            else:
+                output.append({
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": {
+                        "model": request["body"]["model"],
+                        "choices": [{"message": {"content": f"answer: {prompt}"}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+                    }},
+                    "error": None
+                })
+        self.files["file-output"] = "\n".join(json.dumps(item) for item in output)
+        batch.update(status="completed", output_file_id="file-output")
+        if errors:
+            self.files["file-errors"] = "\n".join(json.dumps(item) for item in errors)
+            batch["error_file_id"] = "file-errors"
+        return batch
+
+
+def make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, data, status=200):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            stub.requests.append(("POST", self.path))
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == "/v1/files":
+                # multipart 表单中的 JSONL 文件：取出每一行请求
+                stub.uploaded_lines = [
+                    line for line in body.decode("utf-8").splitlines() if line.startswith('{"custom_id"')
+                ]
+                self._send_json({"id": "file-input", "purpose": "batch"})
+            elif self.path == "/v1/batches":
+                stub.batch_body = json.loads(body)
+                self._send_json({"id": "batch-1", "input_file_id": "file-input", "status": "validating"})
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_GET(self):
+            stub.requests.append(("GET", self.path))
+            if self.path == "/v1/batches/batch-1":
+                stub.polls += 1
+                self._send_json(stub.batch())
+            elif self.path.startswith("/v1/files/") and self.path.endswith("/content"):
+                content = stub.files.get(self.path.split("/")[3])
+                if content is None:
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                body = content.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/jsonl")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+    return Handler
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """启动桩服务，返回指向它的已启用批处理的提供者"""
+    monkeypatch.delenv("CRAWL_BATCH_BASE_URL", raising=False)
+    servers = []
+
+    def start(stub, max_wait=5):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stub))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        provider = StubProvider("test-key", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions")
+        provider._batch_options = {"enabled": True, "poll_interval": 0.01, "max_wait": max_wait}
+        return provider
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_upload_create_poll_download(serve):
+    stub = BatchStub(polls_before_complete=3)
+    provider = serve(stub)
+
+    responses = provider.chat_batch(["first", "second", "third"])
+
+    assert [(method, path.split("/")[2]) for method, path in stub.requests[:2]] == [("POST", "files"), ("POST", "batches")]
+    assert stub.polls == 3
+    assert ("GET", "/v1/files/file-output/content") in stub.requests
+    assert stub.batch_body["input_file_id"] == "file-input"
+    assert stub.batch_body["endpoint"] == "/v1/chat/completions"
+    assert len(stub.uploaded_lines) == 3
+    assert all(response.success for response in responses)
+
+
+def test_results_follow_input_order_by_custom_id(serve):
+    stub = BatchStub(polls_before_complete=1)
+    provider = serve(stub)
+    prompts = [f"prompt {i}" for i in range(5)]
+
+    responses = provider.chat_batch(prompts)
+
+    # 输出文件是逆序的，结果仍与输入一一对应
+    assert [response.content for response in responses] == [f"answer: {prompt}" for prompt in prompts]
+    assert responses[0].usage["total_tokens"] == 5
+    assert responses[0].model == "stub-model"
+
+
+def test_error_file_marks_failed_requests(serve):
+    stub = BatchStub(polls_before_complete=1, failed_indices={1})
+    provider = serve(stub)
+
+    responses = provider.chat_batch(["ok 0", "bad 1", "ok 2"])
+
+    assert ("GET", "/v1/files/file-errors/content") in stub.requests
+    assert [response.success for response in responses] == [True, False, True]
+    assert "bad request 1" in responses[1].error_message
+    assert responses[2].content == "answer: ok 2"
+
+
+def test_max_wait_timeout_returns_errors(serve):
+    stub = BatchStub(never_complete=True)
+    provider = serve(stub, max_wait=0.1)
+
+    responses = provider.chat_batch(["a", "b"])
+
+    assert stub.polls >= 1
+    assert not any(request[1].endswith("/content") for request in stub.requests)
+    assert [response.success for response in responses] == [False, False]
+    assert all("等待超时" in response.error_message for response in responses)
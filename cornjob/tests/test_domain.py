@@ -0,0 +1,77 @@
+"""
+注册域名去重键测试
+"""
+import pytest
+
+from domain import DomainIndex, DomainKey, domain_key
+from merge_engine import MergeEngine
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.adobe.com/clipdrop.html", DomainKey("adobe.com", "/clipdrop")),
+    ("https://www.adobe.com/firefly", DomainKey("adobe.com", "/firefly")),
+    ("https://www.aliyun.com/product/kling", DomainKey("aliyun.com", "/product/kling")),
+    ("https://www.nvidia.com/en-us/omniverse", DomainKey("nvidia.com", "/omniverse")),
+    ("https://www.nvidia.com/en-us/ai/omega", DomainKey("nvidia.com", "/ai")),
+    ("https://ai.meta.com/blog/llama-3", DomainKey("meta.com", "ai/blog/llama-3")),
+    ("https://ai.meta.com/llama", DomainKey("meta.com", "ai/llama")),
+    ("https://www.wps.cn", DomainKey("wps.cn", "")),
+    ("https://wps.cn/ai", DomainKey("wps.cn", "/ai")),
+    ("https://x.com/index.html", DomainKey("x.com", "")),
+    ("https://kimi.moonshot.cn", DomainKey("moonshot.cn", "kimi")),
+])
+def test_domain_key(url, expected):
+    assert domain_key(url) == expected
+
+
+def test_different_pages_on_one_domain_stay_apart():
+    index = DomainIndex()
+    index.add(domain_key("https://www.adobe.com/firefly.html"), "firefly")
+    index.add(domain_key("https://www.aliyun.com/product/qwen-vl"), "qwen")
+    index.add(domain_key("https://ai.meta.com/llama"), "llama")
+
+    assert index.find(domain_key("https://www.adobe.com/clipdrop.html")) is None
+    assert index.find(domain_key("https://www.aliyun.com/product/kling")) is None
+    # 子域名相同不代表是同一产品
+    assert index.find(domain_key("https://ai.meta.com/blog/llama-3")) is None
+    assert index.find(domain_key("https://adobe.com/firefly")) == "firefly"
+
+
+def test_bare_domain_matches_single_path_product_and_keeps_first():
+    index = DomainIndex()
+    index.add(domain_key("https://www.wps.cn"), "wps")
+    index.add(domain_key("https://www.wps.cn/"), "later")
+
+    assert index.find(domain_key("https://wps.cn/ai")) == "wps"
+    assert index.find(domain_key("https://wps.cn")) == "wps"
+
+
+def test_domain_rule_only_matches_new_records_against_catalog():
+    engine = MergeEngine(domain_dedupe=True)
+    engine.ingest([
+        {"name": "WPS", "url": "https://www.wps.cn"},
+        {"name": "WPS AI", "url": "https://wps.cn/ai"}
+    ], catalog=True)
+    # 已有目录中的两条记录不按域名合并
+    assert len(engine) == 2
+
+    engine.ingest([
+        {"name": "WPS 灵犀", "url": "https://wps.cn/ai/"},
+        {"name": "Kimi", "url": "https://kimi.moonshot.cn"},
+        {"name": "Kimi Chat", "url": "https://kimi.moonshot.cn/chat"}
+    ])
+    assert engine.stats()["merged"] == {"url": 1, "domain": 0, "name": 0, "fuzzy": 0}
+    # 新记录之间也不按域名合并
+    assert len(engine) == 4
+
+    engine.ingest([{"name": "Notion", "url": "https://www.notion.so"}], catalog=True)
+    engine.ingest([{"name": "Notion 智能助手", "url": "https://notion.so/ai"}])
+    assert engine.stats()["merged"]["domain"] == 1
+    assert len(engine) == 5
+
+
+def test_domain_rule_is_off_by_default():
+    engine = MergeEngine()
+    engine.ingest([{"name": "WPS", "url": "https://www.wps.cn"}], catalog=True)
+    engine.ingest([{"name": "WPS AI", "url": "https://wps.cn/ai"}])
+    assert len(engine) == 2
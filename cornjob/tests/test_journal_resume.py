@@ -0,0 +1,205 @@
+"""
+运行日志恢复测试
+先完整跑一次写出运行日志，再截断成“进程中途退出”的部分日志，用同一个运行 ID 重跑，
+检查已应答的提示词不再请求提供者、已完成的阶段被跳过、已保存的运行直接返回
+"""
+import json
+
+import pytest
+
+import crawel
+from base import AIProvider, AIResponse
+from journal import RunJournal
+
+RUN_ID = "resume-test"
+
+CATALOG = [
+    {"id": 1, "name": "Existing Tool", "description": "已有工具", "url": "https://existing.example.com",
+     "categoryId": 1, "tags": ["写作"]}
+]
+
+
+class FakeProvider(AIProvider):
+    """按提供者名称返回固定工具的假提供者，记录实际收到的请求"""
+
+    def __init__(self, name: str, succeed: bool = True):
+        self.name = name
+        self.succeed = succeed
+        self.prompts = []
+        super().__init__("test-key")
+
+    def _validate_config(self) -> None:
+        pass
+
+    def get_provider_name(self) -> str:
+        return self.name
+
+    def get_default_model(self) -> str:
+        return f"{self.name}-model"
+
+    def chat(self, prompt: str, **kwargs) -> AIResponse:
+        self.prompts.append(prompt)
+        if not self.succeed:
+            return AIResponse(content="", success=False, error_message="服务不可用", model=self.get_default_model())
+        tools = [{
+            "name": f"{self.name} tool {i}",
+            "description": f"{self.name} 提供的工具 {i}",
+            "url": f"https://{self.name}-{i}.example.com",
+            "categoryId": 2,
+            "tags": ["测试"]
+        } for i in range(2)]
+        return AIResponse(
+            content=json.dumps(tools, ensure_ascii=False),
+            success=True,
+            usage={"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+            model=self.get_default_model(),
+            finish_reason="stop"
+        )
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """把数据文件、运行日志、计分板与报告都指向临时目录"""
+    tools_file = tmp_path / "tools.json"
+    tools_file.write_text(json.dumps(CATALOG, ensure_ascii=False), encoding="utf-8")
+    (tmp_path / "categories.json").write_text(
+        json.dumps([{"id": i, "name": f"分类{i}", "toolCount": 0} for i in range(1, 10)], ensure_ascii=False),
+        encoding="utf-8"
+    )
+    monkeypatch.setenv("CRAWL_RUN_ID", RUN_ID)
+    for name, value in {
+        "DATA_DIR": tmp_path,
+        "TOOLS_FILE": tools_file,
+        "CATEGORIES_FILE": tmp_path / "categories.json",
+        "TAGS_FILE": tmp_path / "tags.json",
+        "REPORT_FILE": tmp_path / "report.json",
+        "SCOREBOARD_FILE": tmp_path / "scoreboard.json",
+        "JOURNAL_DIR": tmp_path / "runs",
+        "JOURNAL_ENABLED": True,
+        "FETCH_ICONS": False,
+        "ROUTING_POLICY": "static",
+        "EXTRACT_MODE": "sequential",
+        "MAX_ROUNDS": 1,
+        "RUN_DEADLINE": 0.0,
+        "RUN_MAX_TOKENS": 0
+    }.items():
+        monkeypatch.setattr(crawel, name, value)
+    return tmp_path
+
+
+def make_fetcher(*providers: FakeProvider) -> "crawel.DataFetcher":
+    fetcher = crawel.DataFetcher(providers=[p.get_provider_name() for p in providers])
+    fetcher._provider_instances.update({p.get_provider_name(): p for p in providers})
+    return fetcher
+
+
+def journal_path(sandbox):
+    return sandbox / "runs" / f"{RUN_ID}.jsonl"
+
+
+def truncate_journal(sandbox, keep) -> None:
+    """只保留满足 keep 的事件，模拟进程在之后退出"""
+    path = journal_path(sandbox)
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    kept = []
+    for entry in entries:
+        if not keep(entry):
+            break
+        kept.append(entry)
+    path.write_text("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in kept), encoding="utf-8")
+
+
+def saved_names(sandbox):
+    return {tool["name"] for tool in json.loads((sandbox / "tools.json").read_text(encoding="utf-8"))}
+
+
+def test_replay_answered_prompts_and_retry_the_rest(sandbox):
+    catalog = (sandbox / "tools.json").read_text(encoding="utf-8")
+    first = make_fetcher(FakeProvider("alpha"), FakeProvider("beta", succeed=False))
+    assert first.run()
+
+    # 进程在提取阶段完成前退出：alpha 已应答，beta 的失败响应不算应答
+    truncate_journal(sandbox, lambda e: e.get("event") != "stage" or e.get("stage") == "route")
+    (sandbox / "tools.json").write_text(catalog, encoding="utf-8")
+
+    alpha, beta = FakeProvider("alpha"), FakeProvider("beta")
+    resumed = make_fetcher(alpha, beta)
+    assert resumed.run()
+
+    assert alpha.prompts == []
+    assert len(beta.prompts) == 1
+    assert {"alpha tool 0", "alpha tool 1", "beta tool 0", "beta tool 1"} <= saved_names(sandbox)
+    report = json.loads((sandbox / "report.json").read_text(encoding="utf-8"))
+    assert report["journal"] == {"run_id": RUN_ID, "resumed": True, "replayed": 1}
+
+
+def test_completed_extract_stage_is_not_rerun(sandbox):
+    catalog = (sandbox / "tools.json").read_text(encoding="utf-8")
+    assert make_fetcher(FakeProvider("alpha")).run()
+
+    # 进程在提取阶段完成之后、保存之前退出
+    truncate_journal(sandbox, lambda e: e.get("event") != "stage" or e.get("stage") in {"route", "extract"})
+    (sandbox / "tools.json").write_text(catalog, encoding="utf-8")
+
+    alpha = FakeProvider("alpha")
+    resumed = make_fetcher(alpha)
+    assert resumed.run()
+
+    assert alpha.prompts == []
+    assert {"Existing Tool", "alpha tool 0", "alpha tool 1"} == saved_names(sandbox)
+    assert resumed.merge_stats["inserted"] == 3
+
+
+def test_saved_run_returns_early(sandbox):
+    assert make_fetcher(FakeProvider("alpha")).run()
+    saved = (sandbox / "tools.json").read_text(encoding="utf-8")
+
+    alpha = FakeProvider("alpha")
+    assert make_fetcher(alpha).run()
+
+    assert alpha.prompts == []
+    assert (sandbox / "tools.json").read_text(encoding="utf-8") == saved
+
+
+def test_empty_stored_route_is_recomputed(sandbox):
+    journal = RunJournal(journal_path(sandbox), RUN_ID)
+    journal.complete_stage("route", {})
+    journal.close()
+
+    alpha = FakeProvider("alpha")
+    assert make_fetcher(alpha).run()
+
+    assert len(alpha.prompts) == 1
+    assert "alpha tool 0" in saved_names(sandbox)
+
+
+class AsyncFakeProvider(FakeProvider):
+    """记录经 achat 发出的请求的假提供者"""
+
+    def __init__(self, name: str, succeed: bool = True):
+        self.async_calls = 0
+        super().__init__(name, succeed)
+
+    async def achat(self, prompt: str, **kwargs) -> AIResponse:
+        self.async_calls += 1
+        return self.chat(prompt, **kwargs)
+
+
+def test_concurrent_mode_uses_achat_and_replays(sandbox, monkeypatch):
+    monkeypatch.setattr(crawel, "EXTRACT_MODE", "concurrent")
+    catalog = (sandbox / "tools.json").read_text(encoding="utf-8")
+    alpha, beta = AsyncFakeProvider("alpha"), AsyncFakeProvider("beta", succeed=False)
+    assert make_fetcher(alpha, beta).run()
+
+    assert (alpha.async_calls, beta.async_calls) == (1, 1)
+    entries = [json.loads(line) for line in journal_path(sandbox).read_text(encoding="utf-8").splitlines()]
+    assert sorted(e["provider"] for e in entries if e["event"] == "response") == ["alpha", "beta"]
+
+    truncate_journal(sandbox, lambda e: e.get("event") != "stage" or e.get("stage") == "route")
+    (sandbox / "tools.json").write_text(catalog, encoding="utf-8")
+
+    alpha, beta = AsyncFakeProvider("alpha"), AsyncFakeProvider("beta")
+    assert make_fetcher(alpha, beta).run()
+
+    assert (alpha.async_calls, beta.async_calls) == (0, 1)
+    assert {"alpha tool 0", "beta tool 0"} <= saved_names(sandbox)
@@ -0,0 +1,95 @@
+"""
+增量 JSON 对象扫描测试
+"""
+import json
+
+from json_stream import JSONObjectStream, iter_json_objects
+
+
+def scan(*chunks):
+    """把片段依次喂给新的扫描器，返回（对象列表, 扫描器）"""
+    scanner = JSONObjectStream()
+    objects = list(iter_json_objects(chunks, scanner))
+    return objects, scanner
+
+
+def test_code_fence_and_prose_are_skipped():
+    text = (
+        "以下是整理好的工具列表：\n```json\n"
+        '[{"name": "A", "url": "https://a.example"}, {"name": "B", "url": "https://b.example"}]\n'
+        "```\n共 2 个工具，如需更多请告诉我。"
+    )
+    objects, scanner = scan(text)
+    assert [obj["name"] for obj in objects] == ["A", "B"]
+    assert (scanner.recovered, scanner.dropped) == (2, 0)
+
+
+def test_bare_array_and_single_object():
+    objects, _ = scan('[{"name": "A"}, {"name": "B", "tags": ["x", "y"]}]')
+    assert objects == [{"name": "A"}, {"name": "B", "tags": ["x", "y"]}]
+
+    # 单个对象（含嵌套对象）作为一个顶层对象产出，嵌套对象不会单独产出
+    objects, scanner = scan('{"tools": [{"name": "A"}], "meta": {"count": 1}}')
+    assert objects == [{"tools": [{"name": "A"}], "meta": {"count": 1}}]
+    assert scanner.recovered == 1
+
+
+def test_braces_and_quotes_inside_strings():
+    tool = {
+        "name": "Brace {Tool}",
+        "description": 'uses "quotes", a } brace and a \\ backslash',
+        "url": "https://example.com/?q={x}"
+    }
+    objects, scanner = scan(f"[{json.dumps(tool)}, {{\"name\": \"next\"}}]")
+    assert objects == [tool, {"name": "next"}]
+    assert scanner.dropped == 0
+
+
+def test_escaped_quote_before_closing_brace():
+    # 字符串以转义引号结尾：\" 不结束字符串，其后的 } 仍在字符串内
+    text = '{"name": "say \\"hi}\\"", "n": 1}'
+    objects, _ = scan(text)
+    assert objects == [{"name": 'say "hi}"', "n": 1}]
+
+
+def test_truncated_object_is_dropped_and_earlier_ones_recovered():
+    text = '[{"name": "A"}, {"name": "B"}, {"name": "C", "descri'
+    objects, scanner = scan(text)
+    assert [obj["name"] for obj in objects] == ["A", "B"]
+    assert (scanner.recovered, scanner.dropped) == (2, 1)
+    assert not scanner.pending
+
+
+def test_invalid_object_counts_as_dropped():
+    objects, scanner = scan('[{"name": "A",}, {"name": "B"}]')
+    assert objects == [{"name": "B"}]
+    assert (scanner.recovered, scanner.dropped) == (1, 1)
+
+
+def test_deltas_split_across_chunks():
+    text = '```json\n[{"name": "A {1}", "desc": "x \\"y\\""}, {"name": "B", "nested": {"k": "}"}}]\n```'
+    expected, _ = scan(text)
+    assert len(expected) == 2
+
+    # 逐字符输入：对象、字符串、转义都可能在任意位置被切开
+    scanner = JSONObjectStream()
+    objects = []
+    for ch in text:
+        objects.extend(scanner.feed(ch))
+    scanner.close()
+    assert objects == expected
+
+    # 转义符恰好落在片段末尾
+    split = text.index('\\"y') + 1
+    objects, scanner = scan(text[:split], text[split:])
+    assert objects == expected
+    assert (scanner.recovered, scanner.dropped) == (2, 0)
+
+
+def test_feed_returns_objects_as_soon_as_they_close():
+    scanner = JSONObjectStream()
+    assert scanner.feed('[{"name": "A"') == []
+    assert scanner.pending
+    assert scanner.feed('}, {"name"') == [{"name": "A"}]
+    assert scanner.feed(': "B"}]') == [{"name": "B"}]
+    assert not scanner.pending
@@ -0,0 +1,151 @@
+"""
+整合引擎测试
+身份规则的优先级（URL -> 注册域名 -> 名称 -> 近似重复）、两条记录都带 URL 时名称规则的限制、
+注册域名规则只匹配已有目录、插入/合并/丢弃统计，以及运行级引擎逐批写入提取结果
+"""
+import pytest
+
+import crawel
+from merge_engine import MERGE_RULES, MergeEngine
+from near_dup import NearDuplicateIndex
+from normalize import key_record
+
+
+def catalog():
+    return [
+        {"name": "Alpha Writer", "url": "https://alpha.example.com/app", "description": "写作"},
+        {"name": "Beta Studio", "url": "https://www.beta.io", "description": "设计"},
+        {"name": "Stable Diffusion", "url": "https://stability.ai/sd", "description": "文生图"}
+    ]
+
+
+def full_engine():
+    """所有规则都启用的引擎，已写入 catalog()"""
+    engine = MergeEngine(
+        domain_dedupe=True, near_dup_mode="merge", near_dup_index=NearDuplicateIndex(threshold=0.8)
+    )
+    engine.ingest(catalog(), catalog=True)
+    return engine
+
+
+def merged_by(rule):
+    return {name: int(name == rule) for name in MERGE_RULES}
+
+
+@pytest.mark.parametrize("record, slot, rule", [
+    # URL 命中第一条，名称命中第二条：URL 优先
+    ({"name": "Beta Studio", "url": "https://alpha.example.com/app/"}, 0, "url"),
+    # 注册域名命中第二条，名称命中第一条：注册域名优先
+    ({"name": "Alpha Writer", "url": "https://beta.io/studio"}, 1, "domain"),
+    # 名称与近似重复都能命中第一条：名称优先
+    ({"name": "Alpha Writer", "url": "https://alpha-writer.net"}, 0, "name"),
+    # 只有近似重复命中
+    ({"name": "Stable Diffusion 3", "url": "https://stability.ai/sd3"}, 2, "fuzzy"),
+])
+def test_rule_precedence(record, slot, rule):
+    engine = full_engine()
+
+    assert engine.add(key_record(record)) == slot
+    assert engine.stats()["merged"] == merged_by(rule)
+    assert len(engine) == 3
+
+
+@pytest.mark.parametrize("first_catalog, second_catalog, second_url, merged", [
+    # 已有目录内部：注册域名不同不合并，相同才合并
+    (True, True, "https://copilot.microsoft.com", False),
+    (True, True, "https://docs.github.com/copilot", True),
+    # 新记录之间同理
+    (False, False, "https://copilot.microsoft.com", False),
+    (False, False, "https://docs.github.com/copilot", True),
+    # 新记录匹配已有目录时不看注册域名
+    (True, False, "https://copilot.microsoft.com", True),
+])
+def test_name_rule_with_urls_on_both_sides(first_catalog, second_catalog, second_url, merged):
+    engine = MergeEngine()
+    engine.ingest([{"name": "Copilot", "url": "https://github.com/features/copilot"}], catalog=first_catalog)
+    engine.ingest([{"name": "Copilot", "url": second_url}], catalog=second_catalog)
+
+    assert len(engine) == (1 if merged else 2)
+    assert engine.stats()["merged"]["name"] == int(merged)
+
+
+def test_name_rule_without_url_always_matches():
+    engine = MergeEngine()
+    engine.ingest([{"name": "Copilot", "url": "https://github.com/features/copilot"}])
+    engine.ingest([{"name": "Copilot", "url": "", "description": "代码补全"}])
+
+    assert len(engine) == 1
+    assert engine.records()[0]["description"] == "代码补全"
+
+
+def test_new_batch_matches_only_catalog_records_by_domain():
+    engine = MergeEngine(domain_dedupe=True)
+    engine.ingest([{"name": "WPS", "url": "https://www.wps.cn"}], catalog=True)
+
+    engine.ingest([
+        {"name": "WPS 灵犀", "url": "https://wps.cn/ai"},
+        {"name": "Kimi", "url": "https://kimi.moonshot.cn"}
+    ])
+    # 第二批中的同域名记录不与第一批新插入的记录合并
+    engine.ingest([{"name": "Kimi 助手", "url": "https://kimi.moonshot.cn/chat"}])
+
+    assert [t["name"] for t in engine.records()] == ["WPS", "Kimi", "Kimi 助手"]
+    assert engine.stats()["merged"] == merged_by("domain")
+
+
+def test_stats_count_inserted_merged_and_dropped():
+    engine = MergeEngine()
+    engine.ingest(catalog(), catalog=True)
+    engine.ingest([
+        {"name": "Alpha Writer", "url": "https://alpha.example.com/app"},
+        {"name": "Gamma", "url": "https://gamma.app"},
+        {"name": "gamma", "url": ""},
+        {"name": "", "url": ""},
+        "not a record"
+    ])
+
+    stats = engine.stats()
+    assert stats["ingested"] == 8
+    assert stats["inserted"] == 4
+    assert stats["merged"] == {"url": 1, "domain": 0, "name": 1, "fuzzy": 0}
+    assert stats["dropped"] == {"no_identity": 1, "invalid": 1}
+    assert stats["total"] == 4
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawel, "TAGS_FILE", tmp_path / "tags.json")
+    monkeypatch.setattr(crawel, "SCOREBOARD_FILE", tmp_path / "scoreboard.json")
+    monkeypatch.setattr(crawel, "NEAR_DUP_MODE", "off")
+    return crawel.DataFetcher(providers=[])
+
+
+def test_run_engine_ingests_batches_incrementally(fetcher):
+    engine = fetcher._start_merge(catalog())
+
+    first = [{"name": "Gamma", "url": "https://gamma.app", "description": "演示文稿"}]
+    assert fetcher._finish_extraction(first) == first
+    assert len(engine) == 4
+    # 后一批既有已有目录的重复，也有前一批的重复
+    fetcher._finish_extraction([
+        {"name": "Alpha Writer", "url": "https://alpha.example.com/app", "description": "AI 写作助手"},
+        {"name": "GAMMA", "url": "", "tags": ["演示"]},
+        {"name": "Delta", "url": "https://delta.dev"}
+    ])
+    assert fetcher._finish_extraction([]) == []
+
+    assert fetcher.merge_engine is engine
+    merged = fetcher._collect_merge(engine, 3, 4)
+    assert [t["name"] for t in merged] == ["Alpha Writer", "Beta Studio", "Stable Diffusion", "Gamma", "Delta"]
+    assert merged[0]["description"] == "AI 写作助手"
+    assert merged[3]["tags"] == ["演示"]
+    assert fetcher.merge_stats["ingested"] == 7
+    assert fetcher.merge_stats["merged"] == {"url": 1, "domain": 0, "name": 1, "fuzzy": 0}
+
+
+def test_extraction_without_run_starts_an_empty_engine(fetcher):
+    assert fetcher.merge_engine is None
+    fetcher._finish_extraction([{"name": "Gamma", "url": "https://gamma.app"}])
+
+    assert fetcher.merge_engine is not None
+    assert [t["name"] for t in fetcher.merge_engine.records()] == ["Gamma"]
@@ -0,0 +1,111 @@
+"""
+近似重复检测测试
+LSH 分桶给出候选、精确 Jaccard 复核；整合引擎的 flag / merge 两种模式
+"""
+from merge_engine import MergeEngine
+from near_dup import NearDuplicateIndex, jaccard, make_shingles
+from normalize import name_key
+
+
+def shared_bucket(index, a, b):
+    """两条已登记记录是否至少落在同一个桶"""
+    return any(a in members and b in members for members in index._buckets.values())
+
+
+def test_lsh_candidate_confirmed_by_exact_jaccard():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add("sd", name_key("Stable Diffusion"), "stability.ai")
+    index.add("other", name_key("Midjourney"), "midjourney.com")
+
+    matches = index.match("sd3", name_key("Stable Diffusion 3"), "stability.ai")
+
+    expected = jaccard(
+        make_shingles(name_key("Stable Diffusion"), "stability.ai"),
+        make_shingles(name_key("Stable Diffusion 3"), "stability.ai")
+    )
+    assert matches == [("sd", expected)]
+    assert 0.8 <= expected < 1.0
+    assert index.pairs() == [("sd", "sd3", expected)]
+
+
+def test_candidate_below_threshold_is_rejected():
+    index = NearDuplicateIndex(threshold=0.95)
+    index.add("sd", name_key("Stable Diffusion"), "stability.ai")
+    index.add("sd3", name_key("Stable Diffusion 3"), "stability.ai")
+
+    # 两条记录是 LSH 候选（同桶），但精确 Jaccard 低于阈值，不算近似重复
+    assert shared_bucket(index, "sd", "sd3")
+    assert index.pairs() == []
+    assert index.match("probe", name_key("Stable Diffusion 3"), "stability.ai", add=False) == [("sd3", 1.0)]
+
+
+def test_matches_sorted_by_similarity_then_order():
+    index = NearDuplicateIndex(threshold=0.7)
+    index.add(0, name_key("ChatGPT Plus Pro"), "chat.example.com")
+    index.add(1, name_key("ChatGPT Plus"), "chat.example.com")
+
+    matches = index.match(2, name_key("ChatGPT Plus"), "chat.example.com")
+
+    assert [key for key, _ in matches] == [1, 0]
+    assert matches[0][1] == 1.0
+
+
+def test_full_buckets_stop_growing():
+    index = NearDuplicateIndex(threshold=0.8, max_bucket=3)
+    for i in range(10):
+        index.add(i, name_key("Same Tool"), "same.example.com")
+
+    assert all(len(members) <= 3 for members in index._buckets.values())
+    assert index.overflowed == 7 * index.bands
+    # 只有登记进桶的前 3 条互相比较
+    assert index.pairs() == [(0, 1, 1.0), (0, 2, 1.0), (1, 2, 1.0)]
+    # 桶已满，新记录不再与其比较
+    assert index.match(10, name_key("Same Tool"), "same.example.com") == []
+
+
+def catalog():
+    return [
+        {"name": "Stable Diffusion", "url": "https://stability.ai/sd", "description": "文生图", "tags": ["图像"]},
+        {"name": "Midjourney", "url": "https://www.midjourney.com", "description": "", "tags": []}
+    ]
+
+
+def new_tools():
+    return [{"name": "Stable Diffusion 3", "url": "https://stability.ai/sd3", "description": "新一代文生图模型", "tags": ["开源"]}]
+
+
+def test_flag_mode_records_pairs_without_merging():
+    engine = MergeEngine(near_dup_mode="flag", near_dup_index=NearDuplicateIndex(threshold=0.8))
+    engine.ingest(catalog(), catalog=True)
+    engine.ingest(new_tools())
+
+    assert [t["name"] for t in engine.records()] == ["Stable Diffusion", "Midjourney", "Stable Diffusion 3"]
+    stats = engine.near_dup_stats()
+    assert stats["mode"] == "flag"
+    assert (stats["pairs"], stats["removed"]) == (1, 0)
+    assert stats["samples"][0]["kept"] == "Stable Diffusion"
+    assert stats["samples"][0]["duplicate"] == "Stable Diffusion 3"
+    assert engine.stats()["merged"]["fuzzy"] == 0
+
+
+def test_merge_mode_absorbs_near_duplicates():
+    engine = MergeEngine(near_dup_mode="merge", near_dup_index=NearDuplicateIndex(threshold=0.8))
+    engine.ingest(catalog(), catalog=True)
+    engine.ingest(new_tools())
+
+    records = engine.records()
+    assert [t["name"] for t in records] == ["Stable Diffusion", "Midjourney"]
+    # 并入的记录补全信息：更长的描述、合并后的标签
+    assert records[0]["description"] == "新一代文生图模型"
+    assert records[0]["tags"] == ["图像", "开源"]
+    assert engine.stats()["merged"]["fuzzy"] == 1
+    assert engine.near_dup_stats()["removed"] == 1
+
+
+def test_off_mode_skips_detection():
+    engine = MergeEngine(near_dup_mode="off")
+    engine.ingest(catalog(), catalog=True)
+    engine.ingest(new_tools())
+
+    assert len(engine) == 3
+    assert engine.near_dup_stats() == {}
@@ -0,0 +1,134 @@
+"""
+竞速提取测试
+用本地 SSE 桩服务模拟一个正常返回的提供者和一个卡住的提供者：产生胜者后落后的连接要被立即关闭，
+race_extract_tools 在返回前记录完所有用量，落后请求不写入运行日志
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import crawel
+from journal import RunJournal
+from providers.openai_compatible import OpenAICompatibleProvider
+
+TOOLS = [
+    {"name": f"Tool {i}", "description": f"工具 {i}", "url": f"https://tool{i}.example.com", "categoryId": 1}
+    for i in range(3)
+]
+
+
+class FastProvider(OpenAICompatibleProvider):
+    PROVIDER_NAME = "race_fast"
+    DEFAULT_MODEL = "fast-model"
+
+
+class StallProvider(OpenAICompatibleProvider):
+    PROVIDER_NAME = "race_stall"
+    DEFAULT_MODEL = "stall-model"
+
+
+def make_handler(released, closed, stall_headers):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.startswith("/stall") and stall_headers:
+                # 连响应头都不发
+                released.wait(30)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            if self.path.startswith("/stall"):
+                self.wfile.write(b'data: {"choices": [{"delta": {"content": "["}}]}\n\n')
+                self.wfile.flush()
+                # 发出第一段后卡住，直到客户端断开（或测试结束）
+                self.connection.settimeout(30)
+                try:
+                    if not self.rfile.read(1):
+                        closed.set()
+                except OSError:
+                    closed.set()
+                return
+            text = json.dumps(TOOLS, ensure_ascii=False)
+            for i in range(0, len(text), 40):
+                event = {"choices": [{"delta": {"content": text[i:i + 40]}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    return Handler
+
+
+@pytest.fixture
+def race(tmp_path, monkeypatch):
+    """启动桩服务，返回 (fetcher, released, closed) 构造函数"""
+    monkeypatch.setattr(crawel, "TAGS_FILE", tmp_path / "tags.json")
+    monkeypatch.setattr(crawel, "SCOREBOARD_FILE", tmp_path / "scoreboard.json")
+    servers, fetchers = [], []
+    released = threading.Event()
+
+    def start(stall_headers=False):
+        closed = threading.Event()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(released, closed, stall_headers))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        fetcher = crawel.DataFetcher(providers=["race_stall", "race_fast"])
+        fetcher._provider_instances["race_fast"] = FastProvider("test-key", base_url=f"{base}/fast")
+        fetcher._provider_instances["race_stall"] = StallProvider("test-key", base_url=f"{base}/stall")
+        # 卡住的提供者排在前面，先发出
+        fetcher._routes[True] = {"race_stall": 0.6, "race_fast": 0.4}
+        fetcher.journal = RunJournal(tmp_path / f"run{len(fetchers)}.jsonl", "race")
+        fetchers.append(fetcher)
+        return fetcher, closed
+
+    yield start
+    released.set()
+    for fetcher in fetchers:
+        fetcher.journal.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def journal_events(fetcher):
+    path = fetcher.journal.path
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_winner_closes_a_stalled_loser(race):
+    fetcher, closed = race()
+
+    started = time.monotonic()
+    tools = fetcher.race_extract_tools(hedge_delay=0, min_tools=2)
+
+    assert time.monotonic() - started < 5
+    assert [tool["name"] for tool in tools] == [tool["name"] for tool in TOOLS]
+    # 连接由协调线程关闭，而不是等下一段内容到达
+    assert closed.wait(5)
+    usage = fetcher.meter.provider_usage()
+    assert usage["race_fast"]["requests"] == 1
+    assert usage["race_stall"]["requests"] == 1
+    assert usage["race_stall"]["tools_parsed"] == 0
+    responses = [event["provider"] for event in journal_events(fetcher) if event["event"] == "response"]
+    assert responses == ["race_fast"]
+
+
+def test_loser_without_headers_is_recorded_after_bounded_join(race, monkeypatch):
+    monkeypatch.setattr(crawel, "RACE_JOIN_TIMEOUT", 0.2)
+    fetcher, _ = race(stall_headers=True)
+
+    started = time.monotonic()
+    tools = fetcher.race_extract_tools(hedge_delay=0, min_tools=2)
+
+    assert time.monotonic() - started < 5
+    assert len(tools) == len(TOOLS)
+    # 用量在返回前已记录；线程之后退出也不会重复记录
+    assert fetcher.meter.provider_usage()["race_stall"]["requests"] == 1
@@ -0,0 +1,163 @@
+"""
+请求重试与限流顺序测试
+熔断与截止时间先于限流检查；限流等待不超过截止时间，放弃时不占用配额；
+流式请求结束时按估算用量修正 TPM 余额
+"""
+import json
+import time
+
+import pytest
+import requests
+
+from base import AIProvider, AIResponse
+from providers.openai_compatible import OpenAICompatibleProvider
+from ratelimit import RateLimiter, TokenBucket
+from retry import CircuitBreaker, CircuitOpenError
+
+
+class OfflineProvider(AIProvider):
+    """不允许真正发出请求的提供者（session 被替换为会报错的桩）"""
+
+    def _validate_config(self) -> None:
+        pass
+
+    def get_provider_name(self) -> str:
+        return "offline"
+
+    def get_default_model(self) -> str:
+        return "offline-model"
+
+    def chat(self, prompt: str, **kwargs) -> AIResponse:
+        raise NotImplementedError
+
+
+class NoNetwork:
+    def request(self, *args, **kwargs):
+        raise AssertionError("不应发出请求")
+
+
+@pytest.fixture
+def provider():
+    provider = OfflineProvider("test-key", base_url="http://127.0.0.1:9/v1/chat/completions")
+    provider.session = NoNetwork()
+    provider.circuit_breaker = CircuitBreaker("offline", failure_threshold=1, recovery_timeout=60)
+    provider.rate_limiter = RateLimiter("offline", rpm=60, tpm=6000)
+    return provider
+
+
+def test_open_circuit_does_not_consume_rate_limit(provider):
+    provider.circuit_breaker.record_failure()
+    before = (provider.rate_limiter.requests._tokens, provider.rate_limiter.tokens._tokens)
+
+    with pytest.raises(CircuitOpenError):
+        provider._request_with_retry("POST", provider.base_url, 10, estimated_tokens=500)
+
+    after = (provider.rate_limiter.requests._tokens, provider.rate_limiter.tokens._tokens)
+    assert after[0] >= before[0] and after[1] >= before[1]
+
+
+def test_passed_deadline_does_not_consume_rate_limit(provider):
+    before = provider.rate_limiter.requests._tokens
+
+    with pytest.raises(requests.exceptions.Timeout):
+        provider._request_with_retry("POST", provider.base_url, 10, estimated_tokens=500, deadline=time.monotonic() - 1)
+
+    assert provider.rate_limiter.requests._tokens >= before
+
+
+def test_rate_limit_wait_is_bounded_by_deadline(provider):
+    provider.rate_limiter = RateLimiter("offline", rpm=1)
+    provider.rate_limiter.acquire()  # 用掉唯一的配额，下一个要等一分钟
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        provider._request_with_retry("POST", provider.base_url, 10, deadline=time.monotonic() + 0.2)
+
+    assert time.monotonic() - started < 0.5
+    # 放弃的请求没有扣减配额（余额不为负）
+    assert provider.rate_limiter.requests._tokens >= 0
+
+
+def test_half_open_trial_is_released_when_request_is_not_sent(provider):
+    breaker = CircuitBreaker("offline", failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    provider.circuit_breaker = breaker
+    provider.rate_limiter = RateLimiter("offline", rpm=1)
+    provider.rate_limiter.acquire()
+
+    with pytest.raises(requests.exceptions.Timeout):
+        provider._request_with_retry("POST", provider.base_url, 10, deadline=time.monotonic() + 0.1)
+
+    # 没有发出的试探请求归还了名额，下一次仍可放行
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_token_bucket_timeout_leaves_balance_untouched():
+    bucket = TokenBucket(60)
+    assert bucket.acquire(60) is not None
+    assert bucket.acquire(30, timeout=0.05) is None
+    assert bucket._tokens >= 0
+
+    limiter = RateLimiter("bounded", rpm=60, tpm=60)
+    limiter.tokens.acquire(60)
+    requests_before = limiter.requests._tokens
+    assert limiter.acquire(30, timeout=0.05) is None
+    # TPM 拿不到时归还已扣的 RPM 配额
+    assert limiter.requests._tokens >= requests_before - 0.01
+
+
+class SSEResponse:
+    """按给定内容片段产出 SSE 事件的响应桩"""
+
+    status_code = 200
+    encoding = None
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        for piece in self.pieces:
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": piece}}]})
+        yield "data: [DONE]"
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SSESession:
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def request(self, *args, **kwargs):
+        return SSEResponse(self.pieces)
+
+
+class StreamStubProvider(OpenAICompatibleProvider):
+    PROVIDER_NAME = "stream_stub"
+    DEFAULT_MODEL = "stub-model"
+
+
+@pytest.mark.parametrize("read_all", [True, False])
+def test_stream_reconciles_tpm_with_received_content(read_all):
+    pieces = ["[" + "x" * 400, "y" * 400, "]"]
+    provider = StreamStubProvider("test-key", base_url="http://127.0.0.1:9/v1/chat/completions")
+    provider.session = SSESession(pieces)
+    provider.rate_limiter = RateLimiter("stream_stub", tpm=60000)
+
+    stream = provider.chat_stream("hello")
+    received = list(stream) if read_all else [next(stream)]
+    stream.close()
+
+    # 预扣 提示词 + max_tokens，结束时改为 提示词 + 已收到内容
+    expected = provider.count_tokens("hello") + provider.count_tokens("".join(received))
+    assert provider.rate_limiter.tokens._tokens == pytest.approx(60000 - expected, abs=5)
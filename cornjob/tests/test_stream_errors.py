@@ -0,0 +1,92 @@
+"""
+流式请求错误测试
+提供者在流式读取中途失败时，错误要传到计量（计为错误请求）与运行日志（失败响应），已解析出的工具保留；
+被截断的对象计入丢弃数
+"""
+import json
+
+import pytest
+import requests
+
+import crawel
+from base import AIProvider, AIResponse
+from journal import RunJournal
+
+
+class BrokenStreamProvider(AIProvider):
+    """先产出一个完整工具，再以连接错误中断的流式提供者"""
+
+    def _validate_config(self) -> None:
+        pass
+
+    def get_provider_name(self) -> str:
+        return "broken"
+
+    def get_default_model(self) -> str:
+        return "broken-model"
+
+    def chat(self, prompt: str, **kwargs) -> AIResponse:
+        return AIResponse(content="", success=False, error_message="不支持")
+
+    def chat_stream(self, prompt: str, **kwargs):
+        yield '[{"name": "Partial Tool", "description": "只收到一半的流", "url": "https://partial.example.com", "categoryId": 1},'
+        raise requests.exceptions.ConnectionError("连接被重置")
+
+
+class TruncatedStreamProvider(BrokenStreamProvider):
+    """正常结束、但最后一个对象被截断的流式提供者"""
+
+    def chat_stream(self, prompt: str, **kwargs):
+        yield '[{"name": "Whole Tool", "description": "完整", "url": "https://whole.example.com", "categoryId": 1},'
+        yield ' {"name": "Cut Tool", "descr'
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawel, "TAGS_FILE", tmp_path / "tags.json")
+    monkeypatch.setattr(crawel, "SCOREBOARD_FILE", tmp_path / "scoreboard.json")
+    fetcher = crawel.DataFetcher(providers=["broken"])
+    fetcher._provider_instances["broken"] = BrokenStreamProvider("test-key")
+    fetcher.journal = RunJournal(tmp_path / "run.jsonl", "stream-error")
+    yield fetcher
+    fetcher.journal.close()
+
+
+def test_stream_error_reaches_meter_and_journal(fetcher, tmp_path):
+    tools = []
+    with pytest.raises(requests.exceptions.ConnectionError):
+        for tool in fetcher.stream_extract_tools("broken"):
+            tools.append(tool)
+
+    assert [tool["name"] for tool in tools] == ["Partial Tool"]
+    usage = fetcher.meter.provider_usage()["broken"]
+    assert usage["requests"] == 1
+    assert usage["errors"] == 1
+
+    entries = [json.loads(line) for line in (tmp_path / "run.jsonl").read_text(encoding="utf-8").splitlines()]
+    responses = [entry for entry in entries if entry["event"] == "response"]
+    assert len(responses) == 1
+    assert responses[0]["success"] is False
+    assert "连接被重置" in responses[0]["error_message"]
+
+
+def test_stream_mode_keeps_going_after_a_failed_provider(fetcher):
+    fetcher.extract_mode = "stream"
+    fetcher._routes[True] = {"broken": 1.0}
+
+    tools = fetcher._extract_new_tools(content="", use_all_providers=True, existing_tool_names=[])
+
+    assert [tool["name"] for tool in tools] == ["Partial Tool"]
+    assert fetcher.meter.provider_usage()["broken"]["errors"] == 1
+
+
+def test_race_mode_records_dropped_objects(fetcher):
+    fetcher._provider_instances["broken"] = TruncatedStreamProvider("test-key")
+    fetcher._routes[True] = {"broken": 1.0}
+
+    tools = fetcher.race_extract_tools(hedge_delay=0, min_tools=5)
+
+    assert [tool["name"] for tool in tools] == ["Whole Tool"]
+    usage = fetcher.meter.provider_usage()["broken"]
+    assert usage["tools_parsed"] == 1
+    assert usage["objects_dropped"] == 1
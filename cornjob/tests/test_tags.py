@@ -0,0 +1,76 @@
+"""
+标签词表测试
+"""
+import json
+
+from tags import TagVocabulary
+
+
+def test_intern_folds_variants_and_aliases():
+    tags = TagVocabulary(aliases={"图像生成": ["AI绘画"]})
+    image = tags.intern("图像生成")
+    assert tags.intern("AI 绘画") == image
+    assert tags.intern("ＡＩ绘画") == image
+    assert tags.intern("Chat") == tags.intern(" chat ")
+    assert tags.merge(["AI绘画", "Chat"], ["图像生成", "chat", "", None, {"x": 1}]) == ["图像生成", "Chat"]
+
+
+def test_ids_are_stable_across_save_and_load(tmp_path):
+    path = tmp_path / "tags.json"
+    tags = TagVocabulary(aliases={"编程助手": ["代码助手"]})
+    tools = [
+        {"name": "A", "tags": tags.normalize(["写作", "代码助手", "翻译"])},
+        {"name": "B", "tags": tags.normalize(["翻译", "视频"])}
+    ]
+    ids = {name: tags.intern(name) for name in ("编程助手", "写作", "翻译", "视频")}
+    assert tags.save(path, tools)
+
+    loaded = TagVocabulary.load(path)
+    assert {name: loaded.intern(name) for name in ids} == ids
+    assert loaded.intern("代码助手") == ids["编程助手"]  # 别名随词表文件保存
+    # 新标签从最大 ID + 1 继续，不会复用已有 ID
+    assert loaded.intern("新标签") == max(ids.values()) + 1
+
+    # 再保存、再载入一轮，ID 仍然不变；引用次数按目录统计
+    assert loaded.save(path, tools + [{"name": "C", "tags": ["新标签"]}])
+    reloaded = TagVocabulary.load(path)
+    assert {name: reloaded.intern(name) for name in ids} == ids
+    assert reloaded.intern("新标签") == max(ids.values()) + 1
+    entries = {entry["name"]: entry for entry in json.loads(path.read_text(encoding="utf-8"))["tags"]}
+    assert entries["翻译"]["count"] == 2
+    assert entries["编程助手"]["aliases"] == ["代码助手"]
+
+
+def test_unreferenced_tags_are_pruned_without_reusing_ids(tmp_path):
+    path = tmp_path / "tags.json"
+    tags = TagVocabulary()
+    old = tags.intern("旧标签")
+    kept = tags.intern("保留")
+    assert tags.save(path, [{"tags": ["保留"]}])
+
+    loaded = TagVocabulary.load(path)
+    assert loaded.intern("保留") == kept
+    # 未被引用的标签不写入词表文件；之后再出现时分配新 ID，不与仍在使用的 ID 冲突
+    assert loaded.intern("旧标签") == kept + 1
+    assert "旧标签" not in {entry["name"] for entry in json.loads(path.read_text(encoding="utf-8"))["tags"]}
+    assert old < kept
+
+
+def test_config_alias_turns_existing_tag_into_alias(tmp_path):
+    path = tmp_path / "tags.json"
+    tags = TagVocabulary()
+    video = tags.intern("视频生成")
+    tags.intern("AI视频")
+    assert tags.save(path, [{"tags": ["视频生成", "AI视频"]}])
+
+    loaded = TagVocabulary.load(path, aliases={"视频生成": ["AI视频"]})
+    assert loaded.intern("AI视频") == video
+    assert loaded.normalize(["AI视频", "视频生成"]) == ["视频生成"]
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "tags.json"
+    path.write_text("{not json", encoding="utf-8")
+    loaded = TagVocabulary.load(path)
+    assert len(loaded) == 0
+    assert loaded.intern("写作") == 1
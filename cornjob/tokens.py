@@ -0,0 +1,83 @@
+"""
+Token 估算模块
+在不依赖具体分词器的情况下快速估算文本的 token 数（中日韩字符与其他字符分别计算），
+并支持按名称注册/选择更精确的分词器
+"""
+import logging
+import re
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 中日韩文字与全角符号：大多数模型的分词器中约 1 字 ≈ 1 token
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+# 其他字符（英文、数字、标点、空白）：约 4 字符 ≈ 1 token
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    快速估算文本的 token 数（启发式，偏保守）
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+# 已注册的分词器：名称 -> 计数函数
+_TOKENIZERS: Dict[str, Callable[[str], int]] = {"heuristic": estimate_tokens}
+_TOKENIZERS_LOCK = threading.Lock()
+
+
+def register_tokenizer(name: str, counter: Callable[[str], int]) -> None:
+    """
+    注册自定义分词器
+
+    Args:
+        name: 分词器名称（config.yaml 中 providers.<name>.tokenizer 引用）
+        counter: 计数函数，输入文本返回 token 数
+    """
+    with _TOKENIZERS_LOCK:
+        _TOKENIZERS[name] = counter
+
+
+def get_tokenizer(name: Optional[str] = None) -> Callable[[str], int]:
+    """
+    获取分词器计数函数
+
+    支持 heuristic（默认）、已注册的自定义分词器，以及 tiktoken:<encoding>
+    （需安装 tiktoken，未安装时退回启发式估算）
+
+    Args:
+        name: 分词器名称
+
+    Returns:
+        Callable[[str], int]: 计数函数
+    """
+    name = (name or "heuristic").strip()
+    with _TOKENIZERS_LOCK:
+        counter = _TOKENIZERS.get(name)
+    if counter is not None:
+        return counter
+    if name.startswith("tiktoken"):
+        encoding_name = name.partition(":")[2] or "cl100k_base"
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning(f"无法加载分词器 {name}（{str(e)}），使用启发式估算")
+            return estimate_tokens
+        counter = lambda text: len(encoding.encode(text or "", disallowed_special=()))  # noqa: E731
+        register_tokenizer(name, counter)
+        return counter
+    logger.warning(f"未知的分词器 {name}，使用启发式估算")
+    return estimate_tokens